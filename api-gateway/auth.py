@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+
+import jwt
+
+logger = logging.getLogger("gateway.auth")
+
+# Cada cuánto se refrescan en segundo plano las claves públicas del servicio de
+# autenticación, y espera mínima entre descargas forzadas por un kid desconocido.
+JWKS_REFRESH_INTERVAL = float(os.getenv("GATEWAY_JWKS_REFRESH_INTERVAL", "300"))
+JWKS_MIN_REFRESH = float(os.getenv("GATEWAY_JWKS_MIN_REFRESH", "10"))
+
+# Debe coincidir con AUTH_TOKEN_ISSUER del servicio de autenticación.
+TOKEN_ISSUER = os.getenv("AUTH_TOKEN_ISSUER", "red-social-deportistas")
+
+# Redis donde el servicio de autenticación guarda la denylist. Sin él el
+# gateway no se entera de los logout y un token vale hasta que caduca.
+AUTH_REDIS_URL = os.getenv("GATEWAY_AUTH_REDIS_URL")
+
+# Tamaño del filtro de Bloom local: tokens revocados a la vez y tasa de falsos
+# positivos (cada falso positivo cuesta una consulta a Redis, no un rechazo).
+REVOCATION_CAPACITY = int(os.getenv("GATEWAY_REVOCATION_CAPACITY", "100000"))
+REVOCATION_FP_RATE = float(os.getenv("GATEWAY_REVOCATION_FP_RATE", "0.001"))
+
+# Cada cuánto se reconstruye el filtro desde Redis para olvidar los tokens que
+# ya caducaron (un filtro de Bloom no permite borrar).
+REVOCATION_REBUILD_INTERVAL = float(os.getenv("GATEWAY_REVOCATION_REBUILD_INTERVAL", "600"))
+
+# Servicios cuyas escrituras exigen token, p. ej. "data,notifications".
+AUTH_REQUIRED_SERVICES = {name.strip() for name in os.getenv("GATEWAY_AUTH_REQUIRED", "").split(",") if name.strip()}
+
+# Deben coincidir con tokens.py del servicio de autenticación.
+REVOCATION_CHANNEL = "auth:revocaciones"
+REVOKED_PREFIX = "auth:revocados:"
+
+ALGORITHM = "EdDSA"
+
+# Cabecera con el usuario autenticado que el gateway añade hacia los servicios.
+# La que mande el cliente se descarta siempre.
+USER_HEADER = b"x-usuario"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class BloomFilter:
+    """Conjunto aproximado de tamaño fijo: sin falsos negativos."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.size = max(int(-capacity * math.log(fp_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Doble hashing: k posiciones a partir de un solo digest.
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationCache:
+    """Denylist de tokens revocados, consultada sin salir del proceso.
+
+    El filtro de Bloom responde "no revocado" en O(1) para casi todos los
+    tokens; solo un positivo (revocado o falso positivo) se confirma en Redis.
+    El filtro se llena con un recorrido de Redis al arrancar y se mantiene al
+    día con el canal pub/sub por el que el servicio de autenticación avisa de
+    cada logout.
+    """
+
+    def __init__(self, redis_url: str = None):
+        self.client = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self.client = redis.from_url(redis_url, decode_responses=True)
+        self.bloom = BloomFilter(REVOCATION_CAPACITY, REVOCATION_FP_RATE)
+        self.rebuilding = None
+        self.tasks = []
+        self.stats = {"bloom_positives": 0, "revoked": 0, "rebuilds": 0}
+
+    def add(self, jti: str):
+        self.bloom.add(jti)
+        if self.rebuilding is not None:
+            self.rebuilding.add(jti)
+
+    async def rebuild(self):
+        bloom = BloomFilter(REVOCATION_CAPACITY, REVOCATION_FP_RATE)
+        self.rebuilding = bloom
+        try:
+            async for key in self.client.scan_iter(match=REVOKED_PREFIX + "*", count=1000):
+                bloom.add(key[len(REVOKED_PREFIX):])
+            self.bloom = bloom
+            self.stats["rebuilds"] += 1
+        finally:
+            self.rebuilding = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(REVOCATION_CHANNEL)
+                    # Lo revocado antes de suscribirse (o durante una caída) se lee de Redis.
+                    await self.rebuild()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.add(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error en la suscripción a revocaciones; se reintenta")
+                await asyncio.sleep(1)
+
+    async def _rebuild_periodically(self):
+        while True:
+            await asyncio.sleep(REVOCATION_REBUILD_INTERVAL)
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("No se pudo reconstruir el filtro de revocaciones")
+
+    def start(self):
+        if self.client is None:
+            logger.warning("Sin GATEWAY_AUTH_REDIS_URL: los tokens revocados valdrán hasta que caduquen")
+            return
+        self.tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._rebuild_periodically())]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def is_revoked(self, jti: str) -> bool:
+        if jti not in self.bloom:
+            return False
+        self.stats["bloom_positives"] += 1
+        try:
+            revoked = bool(await self.client.exists(REVOKED_PREFIX + jti))
+        except Exception:
+            # Sin poder confirmar, un positivo del filtro se trata como revocado.
+            logger.exception("No se pudo consultar la denylist")
+            return True
+        if revoked:
+            self.stats["revoked"] += 1
+        return revoked
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "backend": "redis" if self.client is not None else "none",
+            "bloom_entries": self.bloom.count,
+            "bloom_bytes": len(self.bloom.bits),
+        }
+
+
+class TokenVerifier:
+    """Verifica los tokens con las claves públicas del servicio de autenticación.
+
+    Las claves se descargan de /jwks y se guardan por kid: verificar una firma
+    no requiere ninguna llamada de red. Un kid desconocido (clave recién
+    rotada) fuerza una descarga, limitada a una cada JWKS_MIN_REFRESH segundos.
+    """
+
+    def __init__(self, fetch_jwks, revocations: RevocationCache):
+        self.fetch_jwks = fetch_jwks
+        self.revocations = revocations
+        self.keys = {}
+        self.fetched_at = 0.0
+        self.attempted_at = 0.0
+        self.refresh_lock = asyncio.Lock()
+        self.refresh_task = None
+        self.stats = {"verified": 0, "rejected": 0, "jwks_refreshes": 0}
+
+    async def refresh(self):
+        async with self.refresh_lock:
+            if time.monotonic() - self.attempted_at < JWKS_MIN_REFRESH:
+                return
+            self.attempted_at = time.monotonic()
+            jwks = await self.fetch_jwks()
+            self.keys = {jwk["kid"]: jwt.PyJWK(jwk).key for jwk in jwks.get("keys", [])}
+            self.fetched_at = time.monotonic()
+            self.stats["jwks_refreshes"] += 1
+
+    async def try_refresh(self):
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("No se pudieron descargar las claves públicas")
+
+    def _refresh_in_background(self):
+        if self.refresh_task is None or self.refresh_task.done():
+            self.refresh_task = asyncio.create_task(self.try_refresh())
+
+    async def _key_for(self, kid):
+        if kid not in self.keys:
+            await self.try_refresh()
+        elif time.monotonic() - self.fetched_at > JWKS_REFRESH_INTERVAL:
+            self._refresh_in_background()
+        return self.keys.get(kid)
+
+    async def verify(self, token: str) -> dict:
+        try:
+            claims = await self._verify(token)
+        except InvalidToken:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["verified"] += 1
+        return claims
+
+    async def _verify(self, token: str) -> dict:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+        key = await self._key_for(kid)
+        if key is None:
+            raise InvalidToken("Clave de firma desconocida")
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[ALGORITHM],
+                issuer=TOKEN_ISSUER,
+                options={"require": ["exp", "iat", "sub", "jti"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+        if await self.revocations.is_revoked(claims["jti"]):
+            raise InvalidToken("Token revocado")
+        return claims
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "keys": len(self.keys), "revocations": self.revocations.snapshot()}
+
+
+def requires_token(service_name: str, method: str) -> bool:
+    return service_name in AUTH_REQUIRED_SERVICES and method.upper() not in SAFE_METHODS
+
+
+class TokenAuthMiddleware:
+    """Middleware ASGI que verifica el token Bearer de las rutas /api/v1/.
+
+    Con un token válido añade la cabecera X-Usuario con su `sub` para que los
+    servicios sepan quién llama sin verificarlo de nuevo; con uno inválido,
+    caducado o revocado responde 401 sin llegar al servicio.
+    """
+
+    def __init__(self, app, verifier: TokenVerifier, prefix: str = "/api/v1/"):
+        self.app = app
+        self.verifier = verifier
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        headers = []
+        token = None
+        for key, value in scope["headers"]:
+            if key == USER_HEADER:
+                continue
+            if key == b"authorization":
+                value_text = value.decode("latin-1")
+                if value_text[:7].lower() == "bearer ":
+                    token = value_text[7:].strip()
+            headers.append((key, value))
+
+        service_name = scope["path"][len(self.prefix):].split("/", 1)[0]
+        if token:
+            try:
+                claims = await self.verifier.verify(token)
+            except InvalidToken as e:
+                await self._reject(send, f"Token inválido: {e}")
+                return
+            headers.append((USER_HEADER, claims["sub"].encode("utf-8")))
+        elif requires_token(service_name, scope["method"]):
+            await self._reject(send, "Se requiere un token de acceso")
+            return
+
+        await self.app({**scope, "headers": headers}, receive, send)
+
+    async def _reject(self, send, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"www-authenticate", b"Bearer"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,221 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+# Número máximo de respuestas guardadas en memoria (LRU).
+CACHE_MAX_ENTRIES = int(os.getenv("GATEWAY_CACHE_MAX_ENTRIES", "1024"))
+
+# Segundos durante los que una entrada caducada puede servirse mientras se
+# revalida en segundo plano (stale-while-revalidate).
+CACHE_STALE_SECONDS = float(os.getenv("GATEWAY_CACHE_STALE_SECONDS", "60"))
+
+# Si se define, las respuestas se guardan en Redis y se comparten entre workers.
+CACHE_REDIS_URL = os.getenv("GATEWAY_CACHE_REDIS_URL")
+
+# TTL en segundos por servicio y ruta. "*" aplica a cualquier ruta del servicio.
+# Las rutas que no aparecen aquí no se cachean.
+CACHE_TTLS = {
+    "data": {"estadisticas": 15},
+    "analytics": {"reportes": 30, "metricas": 10},
+}
+
+
+def cache_ttl(service_name: str, path: str) -> float:
+    """TTL configurado para la ruta, o 0 si la ruta no se cachea."""
+    rules = CACHE_TTLS.get(service_name, {})
+    return rules.get(path.strip("/"), rules.get("*", 0))
+
+
+def build_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class CacheEntry:
+    """Respuesta guardada en caché con su ETag y sus marcas de tiempo."""
+
+    __slots__ = ("status_code", "headers", "body", "etag", "stored_at", "ttl")
+
+    def __init__(self, status_code: int, headers: dict, body: bytes, etag: str, stored_at: float, ttl: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.stored_at = stored_at
+        self.ttl = ttl
+
+    @property
+    def cacheable(self) -> bool:
+        return self.status_code == 200
+
+    def age(self, now: float) -> float:
+        return now - self.stored_at
+
+    def is_fresh(self, now: float) -> bool:
+        return self.age(now) < self.ttl
+
+    def is_usable(self, now: float) -> bool:
+        return self.age(now) < self.ttl + CACHE_STALE_SECONDS
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "body": base64.b64encode(self.body).decode("ascii"),
+            "etag": self.etag,
+            "stored_at": self.stored_at,
+            "ttl": self.ttl,
+        })
+
+    @classmethod
+    def from_json(cls, raw) -> "CacheEntry":
+        data = json.loads(raw)
+        data["body"] = base64.b64decode(data["body"])
+        return cls(**data)
+
+
+class MemoryCacheBackend:
+    """Caché LRU acotada en memoria del proceso."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self):
+        self.entries.clear()
+
+    def size(self) -> int:
+        return len(self.entries)
+
+
+class RedisCacheBackend:
+    """Caché compartida en Redis; la expiración la gestiona el propio Redis."""
+
+    def __init__(self, url: str, prefix: str = "gateway:cache:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return CacheEntry.from_json(raw) if raw else None
+
+    async def set(self, key: str, entry: CacheEntry):
+        expire = max(int(entry.ttl + CACHE_STALE_SECONDS), 1)
+        await self.client.set(self.prefix + key, entry.to_json(), ex=expire)
+
+    async def clear(self):
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """Caché de respuestas GET con coalescencia de fallos y stale-while-revalidate.
+
+    Varias peticiones concurrentes a la misma clave que no encuentran entrada
+    esperan a una única llamada al microservicio. Una entrada caducada pero aún
+    dentro de la ventana stale se devuelve de inmediato y se refresca en
+    segundo plano.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.in_flight = {}
+        self.background_tasks = set()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "coalesced": 0,
+            "revalidations": 0,
+            "not_modified": 0,
+            "errors": 0,
+        }
+
+    async def get_or_fetch(self, key: str, fetch, ttl: float):
+        """Devuelve (entrada, estado) donde estado es HIT, STALE o MISS.
+
+        `fetch` es una corrutina sin argumentos que devuelve un CacheEntry.
+        """
+        now = time.time()
+        entry = await self.backend.get(key)
+        if entry is not None and entry.is_fresh(now):
+            self.stats["hits"] += 1
+            return entry, "HIT"
+        if entry is not None and entry.is_usable(now):
+            self.stats["stale"] += 1
+            if key not in self.in_flight:
+                self.stats["revalidations"] += 1
+                task = asyncio.create_task(self._fetch_shared(key, fetch, ttl))
+                task.add_done_callback(self._forget_task)
+                self.background_tasks.add(task)
+            return entry, "STALE"
+
+        self.stats["misses"] += 1
+        return await self._fetch_shared(key, fetch, ttl), "MISS"
+
+    async def _fetch_shared(self, key: str, fetch, ttl: float):
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            entry = await fetch()
+            entry.ttl = ttl
+            if entry.cacheable:
+                await self.backend.set(key, entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            self.stats["errors"] += 1
+            future.set_exception(e)
+            # Evita el aviso de "exception was never retrieved" si nadie esperaba.
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+    def _forget_task(self, task: asyncio.Task):
+        self.background_tasks.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        total = self.stats["hits"] + self.stats["stale"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "evictions": self.backend.evictions,
+            "entries": self.backend.size(),
+            "hit_ratio": round((self.stats["hits"] + self.stats["stale"]) / total, 4) if total else 0.0,
+            "backend": "redis" if isinstance(self.backend, RedisCacheBackend) else "memory",
+        }
+
+
+def build_response_cache() -> ResponseCache:
+    backend = RedisCacheBackend(CACHE_REDIS_URL) if CACHE_REDIS_URL else MemoryCacheBackend()
+    return ResponseCache(backend)
@@ -1,10 +1,226 @@
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
 from fastapi import FastAPI, APIRouter, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+import asyncio
+import httpx
+import json
 import os
+import time
+
+from auth import (
+    AUTH_REDIS_URL, USER_HEADER, InvalidToken, RevocationCache, TokenAuthMiddleware, TokenVerifier, requires_token,
+)
+from cache import CacheEntry, build_etag, build_response_cache, cache_ttl
+from resilience import Bulkhead, CircuitBreaker, backoff_delay
+
+
+def service_config(prefix: str, default_url: str) -> dict:
+    """Configuración de un microservicio: URL, pool, timeouts y resiliencia.
+
+    Cada valor puede ajustarse con variables de entorno que usan el prefijo
+    del servicio, por ejemplo DATA_MAX_CONNECTIONS o ANALYTICS_READ_TIMEOUT.
+    """
+    return {
+        "url": os.getenv(f"{prefix}_SERVICE_URL", default_url),
+        "max_connections": int(os.getenv(f"{prefix}_MAX_CONNECTIONS", "500")),
+        "max_keepalive": int(os.getenv(f"{prefix}_MAX_KEEPALIVE", "100")),
+        "keepalive_expiry": float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", "30")),
+        "connect_timeout": float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", "2")),
+        "read_timeout": float(os.getenv(f"{prefix}_READ_TIMEOUT", "10")),
+        "pool_timeout": float(os.getenv(f"{prefix}_POOL_TIMEOUT", "5")),
+        # Bulkhead: llamadas simultáneas permitidas y espera máxima por un hueco.
+        "max_concurrency": int(os.getenv(f"{prefix}_MAX_CONCURRENCY", "200")),
+        "queue_timeout": float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", "0.5")),
+        # Reintentos (solo GET/DELETE) con backoff exponencial y jitter.
+        "retries": int(os.getenv(f"{prefix}_RETRIES", "2")),
+        "retry_backoff": float(os.getenv(f"{prefix}_RETRY_BACKOFF", "0.1")),
+        # Circuit breaker.
+        "failure_threshold": int(os.getenv(f"{prefix}_FAILURE_THRESHOLD", "5")),
+        "recovery_timeout": float(os.getenv(f"{prefix}_RECOVERY_TIMEOUT", "15")),
+    }
+
+
+# Define los microservicios, sus URLs y los límites de su pool de conexiones.
+# La URL debe coincidir con el nombre del servicio definido en docker-compose.yml.
+# El puerto debe ser el del contenedor (ej. authentication-service:8001).
+SERVICES = {
+    "auth": service_config("AUTH", "http://authentication-service:8001"),
+    "data": service_config("DATA", "http://data-management-service:8002"),
+    "notifications": service_config("NOTIFICATIONS", "http://notifications-service:8003"),
+    "analytics": service_config("ANALYTICS", "http://analytics-service:8004"),
+}
+
+# Un cliente HTTP asíncrono por microservicio. Cada cliente mantiene su propio
+# pool de conexiones keep-alive, así un servicio lento no agota las conexiones
+# de los demás y no se abre una conexión TCP nueva en cada petición.
+HTTP_CLIENTS = {}
+
+# Circuit breaker y bulkhead por microservicio: un servicio lento o caído
+# falla rápido y no consume los recursos del resto.
+CIRCUIT_BREAKERS = {
+    name: CircuitBreaker(config["failure_threshold"], config["recovery_timeout"])
+    for name, config in SERVICES.items()
+}
+BULKHEADS = {
+    name: Bulkhead(config["max_concurrency"], config["queue_timeout"])
+    for name, config in SERVICES.items()
+}
+
+# Métodos idempotentes que se pueden reintentar sin efectos secundarios.
+RETRYABLE_METHODS = {"GET", "DELETE"}
+
+
+def build_client(config: dict) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(
+        config["read_timeout"],
+        connect=config["connect_timeout"],
+        pool=config["pool_timeout"],
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def get_service_client(service_name: str) -> httpx.AsyncClient:
+    """Devuelve el cliente del servicio o lanza 404 si el servicio no existe."""
+    if service_name not in SERVICES:
+        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
+    client = HTTP_CLIENTS.get(service_name)
+    if client is None or client.is_closed:
+        client = build_client(SERVICES[service_name])
+        HTTP_CLIENTS[service_name] = client
+    return client
+
+
+async def send_upstream(service_name: str, upstream_request: httpx.Request, stream: bool = False) -> httpx.Response:
+    """Envía la petición pasando por el circuit breaker, el bulkhead y los reintentos.
+
+    Con stream=True el hueco del bulkhead sigue ocupado hasta que se llama a
+    close_upstream, es decir, hasta terminar de transmitir el cuerpo.
+    Las respuestas 5xx cuentan como fallo del servicio pero se devuelven tal cual
+    cuando ya no quedan reintentos.
+    """
+    config = SERVICES[service_name]
+    client = get_service_client(service_name)
+    breaker = CIRCUIT_BREAKERS[service_name]
+    bulkhead = BULKHEADS[service_name]
+
+    # Primero el bulkhead: si no hay hueco, la petición no llega a ocupar el
+    # único intento de prueba del breaker semiabierto.
+    if not await bulkhead.acquire():
+        raise HTTPException(status_code=503, detail=f"Service '{service_name}' is overloaded.")
+    if not breaker.allow_request():
+        bulkhead.release()
+        raise HTTPException(status_code=503, detail=f"Service '{service_name}' is unavailable (circuit open).")
+
+    attempts = 1 + config["retries"] if upstream_request.method in RETRYABLE_METHODS else 1
+    # True mientras el breaker ha dejado pasar un intento que aún no tiene resultado.
+    pending = True
+    try:
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt - 1, config["retry_backoff"]))
+                if not breaker.allow_request():
+                    raise HTTPException(status_code=503, detail=f"Service '{service_name}' is unavailable (circuit open).")
+                pending = True
+            is_last = attempt == attempts - 1
+            try:
+                response = await client.send(upstream_request, stream=stream)
+            except httpx.PoolTimeout:
+                # Pool de conexiones del gateway lleno: es saturación local, no
+                # un fallo del servicio, así que no cuenta para el breaker.
+                pending = False
+                breaker.release_probe()
+                raise HTTPException(status_code=503, detail=f"Service '{service_name}' is overloaded.")
+            except httpx.TimeoutException as e:
+                pending = False
+                breaker.record_failure()
+                if is_last:
+                    raise HTTPException(status_code=504, detail=f"Timeout forwarding request to {service_name}: {e!r}")
+                continue
+            except httpx.HTTPError as e:
+                pending = False
+                breaker.record_failure()
+                if is_last:
+                    raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+                continue
+
+            pending = False
+            if response.status_code < 500:
+                breaker.record_success()
+                break
+            breaker.record_failure()
+            if is_last:
+                break
+            await response.aclose()
+    except BaseException:
+        # Cancelada (p. ej. el cliente se desconectó) sin resultado: el intento
+        # de prueba vuelve al breaker para no dejarlo semiabierto para siempre.
+        if pending:
+            breaker.release_probe()
+        bulkhead.release()
+        raise
+
+    if not stream:
+        bulkhead.release()
+    return response
+
+
+async def close_upstream(service_name: str, response: httpx.Response):
+    """Cierra una respuesta en streaming y libera su hueco del bulkhead."""
+    try:
+        await response.aclose()
+    finally:
+        BULKHEADS[service_name].release()
+
+
+async def fetch_jwks() -> dict:
+    # Llamada directa, sin reintentos ni circuit breaker: si auth no responde
+    # al arrancar, el arranque no se alarga y el breaker no se abre para el
+    # tráfico real (las claves se vuelven a pedir con el primer token).
+    response = await get_service_client("auth").get(f"{SERVICES['auth']['url']}/jwks")
+    response.raise_for_status()
+    return response.json()
+
+
+# Los tokens se verifican en el gateway con las claves públicas del servicio de
+# autenticación; ese servicio no interviene en cada petición.
+REVOCATIONS = RevocationCache(AUTH_REDIS_URL)
+TOKEN_VERIFIER = TokenVerifier(fetch_jwks, REVOCATIONS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abre los pools al arrancar y los cierra ordenadamente al apagar.
+    for service_name in SERVICES:
+        get_service_client(service_name)
+    REVOCATIONS.start()
+    # Si auth aún no responde, las claves se piden con el primer token.
+    await TOKEN_VERIFIER.try_refresh()
+    yield
+    await REVOCATIONS.stop()
+    for client in HTTP_CLIENTS.values():
+        await client.aclose()
+    HTTP_CLIENTS.clear()
+    if STREAM_CLIENT is not None:
+        await STREAM_CLIENT.aclose()
+
 
 # Define la instancia de la aplicación FastAPI.
-app = FastAPI(title="API Gateway Taller Microservicios")
+app = FastAPI(title="API Gateway Taller Microservicios", lifespan=lifespan)
+
+# Verifica los tokens Bearer antes de enrutar. Se registra antes que CORS para
+# que también los 401 lleven las cabeceras CORS.
+app.add_middleware(TokenAuthMiddleware, verifier=TOKEN_VERIFIER)
 
 # Configura CORS (Cross-Origin Resource Sharing).
 # Esto es esencial para permitir que el frontend se comunique con el gateway.
@@ -19,76 +235,299 @@ app.add_middleware(
 # Crea un enrutador para las peticiones de los microservicios.
 router = APIRouter(prefix="/api/v1")
 
-# Define los microservicios y sus URLs.
-# La URL debe coincidir con el nombre del servicio definido en docker-compose.yml.
-# El puerto debe ser el del contenedor (ej. authentication-service:8001).
-SERVICES = {
-    "auth": os.getenv("AUTH_SERVICE_URL", "http://authentication-service:8001"),
-    "data": os.getenv("DATA_SERVICE_URL", "http://data-management-service:8002"),
-    "notifications": os.getenv("NOTIFICATIONS_SERVICE_URL", "http://notifications-service:8003"),
-    "analytics": os.getenv("ANALYTICS_SERVICE_URL", "http://analytics-service:8004"),
+# Cabeceras hop-by-hop: describen la conexión entre dos nodos y no deben
+# reenviarse de un lado a otro del proxy.
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
 }
 
+# Métodos cuyo cuerpo se retransmite al microservicio.
+METHODS_WITH_BODY = {"POST", "PUT", "PATCH"}
+
+
+def filter_headers(raw_headers, exclude=()):
+    """Quita las cabeceras hop-by-hop (y las de `exclude`) de una lista de pares en bytes."""
+    skipped = HOP_BY_HOP_HEADERS.union(exclude)
+    return [(key, value) for key, value in raw_headers if key.decode("latin-1").lower() not in skipped]
+
+
+async def proxy_request(service_name: str, path: str, request: Request) -> StreamingResponse:
+    """Reenvía la petición al microservicio transmitiendo los bytes por bloques.
+
+    Ni el cuerpo de la petición ni el de la respuesta se cargan completos en
+    memoria ni se decodifican como JSON: el código de estado, las cabeceras y
+    el content-type del microservicio llegan intactos al cliente.
+    """
+    client = get_service_client(service_name)
+    service_url = f"{SERVICES[service_name]['url']}/{path}"
+
+    upstream_request = client.build_request(
+        request.method,
+        service_url,
+        params=request.query_params.multi_items(),
+        headers=filter_headers(request.headers.raw, exclude={"host"}),
+        content=request.stream() if request.method in METHODS_WITH_BODY else None,
+    )
+    upstream_response = await send_upstream(service_name, upstream_request, stream=True)
+
+    # aiter_raw() no descomprime: si el microservicio responde con gzip,
+    # el cliente recibe exactamente los mismos bytes y cabeceras.
+    response = StreamingResponse(
+        upstream_response.aiter_raw(),
+        status_code=upstream_response.status_code,
+        background=BackgroundTask(close_upstream, service_name, upstream_response),
+    )
+    response.raw_headers = filter_headers(upstream_response.headers.raw)
+    return response
+
+# Caché de respuestas para las rutas GET de lectura frecuente (ver cache.CACHE_TTLS).
+RESPONSE_CACHE = build_response_cache()
+
+# Cabeceras de la respuesta original que se guardan junto al cuerpo.
+CACHED_HEADERS = ("content-type",)
+
+
+def cache_key(service_name: str, path: str, params) -> str:
+    return f"{service_name}:{path.strip('/')}?{urlencode(sorted(params))}"
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+async def fetch_for_cache(service_name: str, path: str, params) -> CacheEntry:
+    client = get_service_client(service_name)
+    service_url = f"{SERVICES[service_name]['url']}/{path}"
+    response = await send_upstream(service_name, client.build_request("GET", service_url, params=params))
+
+    headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+    etag = response.headers.get("etag") or build_etag(response.content)
+    return CacheEntry(response.status_code, headers, response.content, etag, time.time(), 0)
+
+
+async def cached_get(service_name: str, path: str, request: Request, ttl: float) -> Response:
+    """Responde desde la caché, con soporte de If-None-Match (304)."""
+    params = request.query_params.multi_items()
+    entry, cache_status = await RESPONSE_CACHE.get_or_fetch(
+        cache_key(service_name, path, params),
+        lambda: fetch_for_cache(service_name, path, params),
+        ttl,
+    )
+    if not entry.cacheable:
+        return Response(entry.body, status_code=entry.status_code, headers=entry.headers)
+
+    age = entry.age(time.time())
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"max-age={max(int(entry.ttl - age), 0)}",
+        "Age": str(int(age)),
+        "X-Cache": cache_status,
+    }
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        RESPONSE_CACHE.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, status_code=entry.status_code, headers={**entry.headers, **headers})
+
+# Número máximo de sub-peticiones aceptadas en una sola llamada a /batch.
+MAX_BATCH_SIZE = int(os.getenv("GATEWAY_MAX_BATCH_SIZE", "25"))
+
+
+class BatchItem(BaseModel):
+    id: str
+    service: str
+    path: str
+    method: str = "GET"
+    params: Dict[str, Any] = {}
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+
+def decode_body(content_type: str, body: bytes):
+    if "json" in content_type:
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            pass
+    return body.decode("utf-8", errors="replace")
+
+
+async def run_batch_item(item: BatchItem, request: Request) -> dict:
+    """Ejecuta una sub-petición; los errores se devuelven en su propio resultado."""
+    method = item.method.upper()
+    path = item.path.lstrip("/")
+    params = [(key, str(value)) for key, value in item.params.items()]
+    try:
+        client = get_service_client(item.service)
+        usuario = request.headers.get(USER_HEADER.decode())
+        if requires_token(item.service, method) and not usuario:
+            return {"id": item.id, "status": 401, "body": {"detail": "Se requiere un token de acceso"}}
+        ttl = cache_ttl(item.service, path)
+        if method == "GET" and ttl and "authorization" not in request.headers:
+            entry, _ = await RESPONSE_CACHE.get_or_fetch(
+                cache_key(item.service, path, params),
+                lambda: fetch_for_cache(item.service, path, params),
+                ttl,
+            )
+            status_code, content_type, body = entry.status_code, entry.headers.get("content-type", ""), entry.body
+        else:
+            headers = {"authorization": request.headers["authorization"], "x-usuario": usuario} if usuario else None
+            upstream_request = client.build_request(
+                method,
+                f"{SERVICES[item.service]['url']}/{path}",
+                params=params,
+                headers=headers,
+                json=item.body if method in METHODS_WITH_BODY else None,
+            )
+            response = await send_upstream(item.service, upstream_request)
+            status_code, content_type, body = response.status_code, response.headers.get("content-type", ""), response.content
+    except HTTPException as e:
+        return {"id": item.id, "status": e.status_code, "body": {"detail": e.detail}}
+    return {"id": item.id, "status": status_code, "body": decode_body(content_type, body)}
+
+
+# Ejecuta varias peticiones a los microservicios en paralelo y devuelve todos
+# los resultados juntos, para que una página se resuelva con un solo viaje.
+@router.post("/batch")
+async def batch(payload: BatchRequest, request: Request):
+    if len(payload.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch accepts at most {MAX_BATCH_SIZE} requests.")
+    results = await asyncio.gather(*(run_batch_item(item, request) for item in payload.requests))
+    return {"responses": list(results)}
+
+# Conexiones Server-Sent Events que el gateway mantiene abiertas a la vez. Van
+# por un cliente propio sin timeout de lectura y no ocupan el bulkhead del
+# servicio: una conexión en vivo pasa casi todo el tiempo ociosa. Al llegar al
+# límite los streams nuevos reciben 503 antes de pedir conexión al pool.
+STREAM_MAX_CONNECTIONS = int(os.getenv("GATEWAY_STREAM_MAX_CONNECTIONS", "10000"))
+STREAM_CLIENT = None
+STREAM_STATS = {"active": 0, "total": 0, "rejected": 0}
+
+
+def get_stream_client() -> httpx.AsyncClient:
+    global STREAM_CLIENT
+    if STREAM_CLIENT is None or STREAM_CLIENT.is_closed:
+        config = SERVICES["notifications"]
+        STREAM_CLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=STREAM_MAX_CONNECTIONS, max_keepalive_connections=0),
+            timeout=httpx.Timeout(None, connect=config["connect_timeout"], pool=config["pool_timeout"]),
+        )
+    return STREAM_CLIENT
+
+
+async def relay_stream(upstream_response: httpx.Response):
+    """Transmite el stream y libera su hueco en STREAM_STATS al terminar."""
+    STREAM_STATS["total"] += 1
+    try:
+        async for chunk in upstream_response.aiter_raw():
+            yield chunk
+    finally:
+        STREAM_STATS["active"] -= 1
+        await upstream_response.aclose()
+
+
+async def open_stream(params, headers) -> httpx.Response:
+    """Abre la conexión con el servicio de notificaciones.
+
+    Solo los errores de red y los 5xx del servicio cuentan para el breaker; el
+    pool lleno o un cliente que se desconecta no son fallos del servicio.
+    """
+    breaker = CIRCUIT_BREAKERS["notifications"]
+    if not breaker.allow_request():
+        raise HTTPException(status_code=503, detail="Service 'notifications' is unavailable (circuit open).")
+    client = get_stream_client()
+    upstream_request = client.build_request(
+        "GET", f"{SERVICES['notifications']['url']}/stream", params=params, headers=headers,
+    )
+    try:
+        upstream_response = await client.send(upstream_request, stream=True)
+    except httpx.PoolTimeout:
+        breaker.release_probe()
+        raise HTTPException(status_code=503, detail="Too many open streams.")
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        raise HTTPException(status_code=502, detail=f"Error opening stream: {e!r}")
+    except BaseException:
+        breaker.release_probe()
+        raise
+    if upstream_response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return upstream_response
+
+
+# Notificaciones y contadores en vivo (text/event-stream) del servicio de notificaciones.
+@router.get("/stream")
+async def stream(request: Request):
+    """Retransmite el stream SSE del servicio de notificaciones.
+
+    EventSource no puede mandar cabeceras, así que el token también se admite
+    como parámetro `access_token`; sin token solo se sirven los temas públicos.
+    """
+    headers = filter_headers(request.headers.raw, exclude={"host"})
+    params = [(key, value) for key, value in request.query_params.multi_items() if key != "access_token"]
+    access_token = request.query_params.get("access_token")
+    if access_token:
+        try:
+            claims = await TOKEN_VERIFIER.verify(access_token)
+        except InvalidToken as e:
+            raise HTTPException(status_code=401, detail=f"Token inválido: {e}")
+        headers = [(key, value) for key, value in headers if key.lower() != USER_HEADER]
+        headers.append((USER_HEADER, claims["sub"].encode("utf-8")))
+
+    if STREAM_STATS["active"] >= STREAM_MAX_CONNECTIONS:
+        STREAM_STATS["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Too many open streams.")
+    # El hueco se reserva antes de conectar y lo libera relay_stream al cerrar.
+    STREAM_STATS["active"] += 1
+    try:
+        upstream_response = await open_stream(params, headers)
+    except BaseException:
+        STREAM_STATS["active"] -= 1
+        raise
+
+    response = StreamingResponse(relay_stream(upstream_response), status_code=upstream_response.status_code)
+    response.raw_headers = filter_headers(upstream_response.headers.raw)
+    return response
+
 # Ruta genérica para redirigir peticiones GET.
 @router.get("/{service_name}/{path:path}")
 async def forward_get(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    
-    service_url = f"{SERVICES[service_name]}/{path}"
-    
-    try:
-        response = requests.get(service_url, params=request.query_params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+    get_service_client(service_name)
+    ttl = cache_ttl(service_name, path)
+    # Las peticiones autenticadas pueden devolver datos privados: no se cachean.
+    if ttl and "authorization" not in request.headers:
+        return await cached_get(service_name, path, request, ttl)
+    return await proxy_request(service_name, path, request)
 
 # Ruta genérica para redirigir peticiones POST.
 @router.post("/{service_name}/{path:path}")
 async def forward_post(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    
-    service_url = f"{SERVICES[service_name]}/{path}"
-    
-    try:
-        # Pasa los datos JSON del cuerpo de la petición.
-        response = requests.post(service_url, json=await request.json())
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+    return await proxy_request(service_name, path, request)
 
 # Ruta genérica para redirigir peticiones PUT.
 @router.put("/{service_name}/{path:path}")
 async def forward_put(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-
-    service_url = f"{SERVICES[service_name]}/{path}"
-
-    try:
-        response = requests.put(service_url, json=await request.json())
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+    return await proxy_request(service_name, path, request)
 
 # Ruta genérica para redirigir peticiones DELETE.
 @router.delete("/{service_name}/{path:path}")
 async def forward_delete(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-
-    service_url = f"{SERVICES[service_name]}/{path}"
-
-    try:
-        response = requests.delete(service_url, params=request.query_params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+    return await proxy_request(service_name, path, request)
 
 # Incluye el router en la aplicación principal.
 app.include_router(router)
@@ -106,7 +545,24 @@ def gateway_root(request: Request):
     }
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Contadores de aciertos y fallos de la caché de respuestas."""
+    return RESPONSE_CACHE.snapshot()
+
+
 # Endpoint de salud para verificar el estado del gateway.
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "message": "API Gateway is running."}
+    services = {
+        name: {"circuit": CIRCUIT_BREAKERS[name].snapshot(), "bulkhead": BULKHEADS[name].snapshot()}
+        for name in SERVICES
+    }
+    degraded = any(info["circuit"]["state"] != "closed" for info in services.values())
+    return {
+        "status": "degraded" if degraded else "ok",
+        "message": "API Gateway is running.",
+        "services": services,
+        "streams": STREAM_STATS,
+        "auth": TOKEN_VERIFIER.snapshot(),
+    }
@@ -0,0 +1,104 @@
+import asyncio
+import random
+import time
+
+# Estados del circuit breaker.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker por servicio.
+
+    Tras `failure_threshold` fallos consecutivos el circuito se abre y las
+    peticiones fallan de inmediato durante `recovery_timeout` segundos. Después
+    pasa a semiabierto y deja pasar una petición de prueba: si responde bien el
+    circuito se cierra, si falla vuelve a abrirse. Cada allow_request() que
+    devuelve True debe terminar en record_success(), record_failure() o
+    release_probe().
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 15.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self.half_open_calls = 0
+        if self.state == HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = CLOSED
+        self.half_open_calls = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.half_open_calls = 0
+
+    def release_probe(self):
+        """Devuelve el hueco de una petición que terminó sin resultado (cancelada, p. ej.)."""
+        if self.state == HALF_OPEN and self.half_open_calls:
+            self.half_open_calls -= 1
+
+    def snapshot(self) -> dict:
+        # Refleja el paso a semiabierto aunque todavía no haya llegado una petición.
+        state = self.state
+        if state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            state = HALF_OPEN
+        return {"state": state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class Bulkhead:
+    """Limita las llamadas concurrentes a un servicio.
+
+    Si el límite está ocupado se espera como máximo `queue_timeout` segundos;
+    pasado ese tiempo la petición se rechaza en lugar de acumularse.
+    """
+
+    def __init__(self, max_concurrency: int, queue_timeout: float = 0.5):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def acquire(self) -> bool:
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {"in_flight": self.in_flight, "limit": self.max_concurrency, "rejected": self.rejected}
+
+
+def backoff_delay(attempt: int, base: float, cap: float = 2.0) -> float:
+    """Espera antes del reintento `attempt` (0, 1, ...) con jitter completo."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,139 @@
+"""Benchmark de login del servicio de autenticación.
+
+Levanta el servicio de autenticación con cada tipo de pool de hashing
+(procesos e hilos), registra unos usuarios y lanza logins concurrentes durante
+unos segundos mientras otra tarea consulta /health sin parar. Mide los logins
+por segundo (y por núcleo del pool) y la latencia p50/p99 del login y de
+/health, comparada con la de /health sin carga, para ver cuánto afecta el
+hashing al resto de rutas.
+
+Uso:
+    python benchmarks/auth_login.py --duration 10 --concurrency 16 --workers 4
+    python benchmarks/auth_login.py --time-cost 2 --memory-cost 19456
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from gateway_load import ROOT, percentile, start_server, wait_until_ready
+
+AUTH_PORT = 18105
+PASSWORD = "contraseña-de-prueba"
+
+
+async def register_users(base_url: str, count: int) -> list:
+    usernames = [f"atleta{index}" for index in range(count)]
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        for username in usernames:
+            response = await client.post(f"{base_url}/register", json={"username": username, "password": PASSWORD})
+            if response.status_code not in (200, 409):
+                raise RuntimeError(f"No se pudo registrar {username}: {response.text}")
+    return usernames
+
+
+async def probe(client: httpx.AsyncClient, url: str, stop: asyncio.Event, interval: float = 0.01) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run_logins(base_url: str, usernames: list, duration: float, concurrency: int) -> dict:
+    result = {"ok": 0, "saturated": 0, "errors": 0, "latencies": []}
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe(client, f"{base_url}/health", stop))
+        await asyncio.sleep(min(duration / 2, 3))
+        stop.set()
+        idle_latencies = await idle_probe
+
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset: int):
+            index = offset
+            while time.perf_counter() < deadline:
+                username = usernames[index % len(usernames)]
+                index += concurrency
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"{base_url}/login", json={"username": username, "password": PASSWORD})
+                except httpx.HTTPError:
+                    result["errors"] += 1
+                    continue
+                if response.status_code == 200:
+                    result["ok"] += 1
+                    result["latencies"].append((time.perf_counter() - started) * 1000)
+                elif response.status_code == 503:
+                    result["saturated"] += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    result["errors"] += 1
+
+        stop = asyncio.Event()
+        loaded_probe = asyncio.create_task(probe(client, f"{base_url}/health", stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        result["elapsed"] = time.perf_counter() - started
+        stop.set()
+        result["health_idle"] = idle_latencies
+        result["health_loaded"] = await loaded_probe
+    return result
+
+
+def summary(latencies: list) -> str:
+    if not latencies:
+        return "sin datos"
+    return f"p50 {statistics.median(latencies):>8.2f} ms   p99 {percentile(latencies, 99):>8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de carga por configuración")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Tamaño del pool de hashing")
+    parser.add_argument("--executors", default="process,thread")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--time-cost", type=int, default=3)
+    parser.add_argument("--memory-cost", type=int, default=65536, help="KiB por hash")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{AUTH_PORT}"
+    print(f"Argon2id t={args.time_cost} m={args.memory_cost} KiB, pool de {args.workers}, "
+          f"concurrencia {args.concurrency}, {args.duration:.0f} s por configuración\n")
+    for executor in args.executors.split(","):
+        env = {
+            "PASSWORD_HASH_EXECUTOR": executor,
+            "PASSWORD_HASH_WORKERS": str(args.workers),
+            "PASSWORD_TIME_COST": str(args.time_cost),
+            "PASSWORD_MEMORY_COST": str(args.memory_cost),
+            "PASSWORD_HASH_MAX_PENDING": str(max(args.concurrency * 2, 64)),
+            "REDIS_URL": "",
+        }
+        server = start_server(os.path.join(ROOT, "services", "authentication"), "main:app", AUTH_PORT, env)
+        try:
+            wait_until_ready(f"{base_url}/health", timeout=30.0)
+            usernames = asyncio.run(register_users(base_url, args.users))
+            result = asyncio.run(run_logins(base_url, usernames, args.duration, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+
+        rate = result["ok"] / result["elapsed"]
+        print(f"[{executor}]")
+        print(f"  logins       {rate:>8.1f} /s   {rate / args.workers:>8.1f} /s por núcleo   "
+              f"503 {result['saturated']}   errores {result['errors']}")
+        print(f"  login        {summary(result['latencies'])}")
+        print(f"  /health      {summary(result['health_idle'])}   (sin carga)")
+        print(f"  /health      {summary(result['health_loaded'])}   (durante los logins)\n")
+
+
+if __name__ == "__main__":
+    main()
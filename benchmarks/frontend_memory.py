@@ -0,0 +1,176 @@
+"""Benchmark de memoria de las publicaciones y eventos en memoria del frontend.
+
+Construye N publicaciones (con likes y comentarios) y N eventos (con
+asistentes) de dos formas: como los dicts con listas que se usaban antes y con
+los registros de frontend/records.py (__slots__, cadenas internadas y sets).
+Mide con tracemalloc los bytes que ocupa cada versión y el coste de comprobar
+si un usuario ya dio like o ya asiste (lista frente a set).
+
+Las cadenas se crean nuevas en cada registro, como cuando llegan de un
+formulario, para que la versión con dicts no se beneficie de cadenas
+compartidas por accidente.
+
+Uso:
+    python benchmarks/frontend_memory.py --publications 100000 --events 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "frontend"))
+
+from records import Comment, Event, Publication  # noqa: E402
+
+SPORTS = ["Running", "Ciclismo", "Natación", "Cross Training", "Yoga", "Fútbol", "Tenis", "Escalada"]
+PLACES = ["Parque Central", "Polideportivo Norte", "Por definir", "Playa", "Pista de atletismo"]
+
+
+def fresh(value: str) -> str:
+    # Copia nueva de la cadena (no la constante del código).
+    return "".join(list(value))
+
+
+def sample(rng: random.Random, users: int, count: int) -> list:
+    return [fresh(f"atleta{index}") for index in rng.sample(range(users), count)]
+
+
+def build_dicts(args, rng: random.Random):
+    publications = []
+    for index in range(args.publications):
+        owner = fresh(f"atleta{rng.randrange(args.users)}")
+        publications.append({
+            "titulo": f"Entrenamiento {index}",
+            "contenido": f"Sesión número {index} registrada desde el temporizador.",
+            "autor": owner,
+            "deporte": fresh(rng.choice(SPORTS)),
+            "fecha": fresh("2026-10-17 08:30"),
+            "likes": args.likes,
+            "comentarios": 0,
+            "es_mio": True,
+            "remote_id": index,
+            "liked_by": sample(rng, args.users, args.likes),
+            "duracion": fresh("45:00"),
+            "comments": [
+                {"autor": author, "texto": f"Comentario {n}", "fecha": fresh("2026-10-17 09:00")}
+                for n, author in enumerate(sample(rng, args.users, args.comments))
+            ],
+            "owner": owner,
+            "id": index,
+        })
+    events = []
+    for index in range(args.events):
+        owner = fresh(f"atleta{rng.randrange(args.users)}")
+        attendees = sample(rng, args.users, args.attendees)
+        events.append({
+            "nombre": f"Evento {index}",
+            "descripcion": f"Quedada número {index}",
+            "fecha": fresh("2026-11-02"),
+            "lugar": fresh(rng.choice(PLACES)),
+            "organizador": owner,
+            "es_mio": True,
+            "attendees": attendees,
+            "estado": "proximo",
+            "owner": owner,
+            "attendees_count": len(attendees),
+            "fecha_legible": fresh("02/11/2026"),
+            "id": index,
+        })
+    return publications, events
+
+
+def build_records(args, rng: random.Random):
+    publications = []
+    for index in range(args.publications):
+        publication = Publication(
+            owner=fresh(f"atleta{rng.randrange(args.users)}"),
+            titulo=f"Entrenamiento {index}",
+            contenido=f"Sesión número {index} registrada desde el temporizador.",
+            deporte=fresh(rng.choice(SPORTS)),
+            fecha=fresh("2026-10-17 08:30"),
+            duracion=fresh("45:00"),
+            likes=args.likes,
+            es_mio=True,
+            remote_id=index,
+        )
+        publication.id = index
+        for username in sample(rng, args.users, args.likes):
+            publication.add_like(username)
+        for n, author in enumerate(sample(rng, args.users, args.comments)):
+            publication.comments.append(Comment(author, f"Comentario {n}", fresh("2026-10-17 09:00")))
+        publications.append(publication)
+    events = []
+    for index in range(args.events):
+        event = Event(
+            owner=fresh(f"atleta{rng.randrange(args.users)}"),
+            nombre=f"Evento {index}",
+            descripcion=f"Quedada número {index}",
+            fecha=fresh("2026-11-02"),
+            lugar=fresh(rng.choice(PLACES)),
+            es_mio=True,
+        )
+        event.id = index
+        event.fecha_legible = fresh("02/11/2026")
+        for username in sample(rng, args.users, args.attendees):
+            event.add_attendee(username)
+        event.attendees_count = len(event.attendees)
+        events.append(event)
+    return publications, events
+
+
+def measure_memory(build, args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = build(args, random.Random(args.seed))
+    elapsed = time.perf_counter() - started
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, used, elapsed
+
+
+def membership_ns(items, key: str, users: int, iterations: int) -> float:
+    rng = random.Random(1)
+    probes = [(rng.choice(items)[key], f"atleta{rng.randrange(users)}") for _ in range(iterations)]
+    started = time.perf_counter()
+    for container, username in probes:
+        username in container  # noqa: B015
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--publications", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--likes", type=int, default=20, help="Likes por publicación")
+    parser.add_argument("--comments", type=int, default=3, help="Comentarios por publicación")
+    parser.add_argument("--attendees", type=int, default=15, help="Asistentes por evento")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{args.publications:,} publicaciones ({args.likes} likes, {args.comments} comentarios) y "
+          f"{args.events:,} eventos ({args.attendees} asistentes), {args.users:,} usuarios\n")
+    results = {}
+    for name, build in (("dicts", build_dicts), ("registros", build_records)):
+        (publications, events), used, elapsed = measure_memory(build, args)
+        per_item = used / (args.publications + args.events)
+        print(f"{name:<10} {used / 2**20:>8.1f} MiB   {per_item:>7.0f} B por elemento   (construido en {elapsed:.1f} s)")
+        results[name] = (publications, events, used)
+        del publications, events
+
+    saved = 1 - results["registros"][2] / results["dicts"][2]
+    print(f"\nAhorro de memoria: {saved:.0%}\n")
+
+    for name in ("dicts", "registros"):
+        publications, events, _ = results[name]
+        likes = membership_ns(publications, "liked_by", args.users, args.iterations)
+        attendees = membership_ns(events, "attendees", args.users, args.iterations)
+        print(f"{name:<10} ¿ya dio like? {likes:>7.0f} ns   ¿ya asiste? {attendees:>7.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Benchmark de carga del API Gateway.
+
+Levanta un microservicio falso con una latencia configurable, el gateway
+actual (cliente httpx asíncrono con pool por servicio) y una copia del
+gateway anterior (``requests`` bloqueante dentro de handlers ``async``), y
+lanza la misma carga concurrente contra ambos para comparar p50/p99 y
+peticiones por segundo.
+
+Uso:
+    python benchmarks/gateway_load.py --requests 1000 --concurrency 50 --delay 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+UPSTREAM_PORT = 18102
+LEGACY_PORT = 18100
+GATEWAY_PORT = 18101
+
+# ==================== Servicio falso ====================
+upstream_app = FastAPI()
+
+
+@upstream_app.get("/deportistas")
+async def fake_deportistas():
+    await asyncio.sleep(float(os.getenv("BENCH_UPSTREAM_DELAY", "0.05")))
+    return {"data": [{"id": i, "titulo": f"Publicación {i}"} for i in range(20)], "message": "ok"}
+
+
+# ==================== Gateway anterior ====================
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/api/v1/{service_name}/{path:path}")
+async def legacy_forward_get(service_name: str, path: str, request: Request):
+    service_url = f"http://127.0.0.1:{UPSTREAM_PORT}/{path}"
+    try:
+        response = requests.get(service_url, params=request.query_params)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+
+
+# ==================== Utilidades ====================
+def start_server(app_dir: str, target: str, port: int, env: dict) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", target,
+        "--app-dir", app_dir,
+        "--port", str(port),
+        "--log-level", "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, env={**os.environ, **env})
+
+
+def wait_until_ready(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"El servidor {url} no respondió a tiempo")
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_load(url: str, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "rps": total / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": statistics.fmean(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:<22} {result['rps']:>10.1f} req/s   "
+        f"p50 {result['p50']:>8.1f} ms   p99 {result['p99']:>8.1f} ms   "
+        f"media {result['mean']:>8.1f} ms   errores {result['errors']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="Latencia del servicio falso en segundos")
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{UPSTREAM_PORT}"
+    env = {
+        "BENCH_UPSTREAM_DELAY": str(args.delay),
+        "DATA_SERVICE_URL": upstream_url,
+    }
+    servers = [
+        start_server(BENCH_DIR, "gateway_load:upstream_app", UPSTREAM_PORT, env),
+        start_server(BENCH_DIR, "gateway_load:legacy_app", LEGACY_PORT, env),
+        start_server(os.path.join(ROOT, "api-gateway"), "main:app", GATEWAY_PORT, env),
+    ]
+    try:
+        for port in (UPSTREAM_PORT, LEGACY_PORT, GATEWAY_PORT):
+            wait_until_ready(f"http://127.0.0.1:{port}/docs")
+
+        print(f"{args.requests} peticiones, concurrencia {args.concurrency}, latencia del servicio {args.delay * 1000:.0f} ms\n")
+        for name, port in (("antes (requests)", LEGACY_PORT), ("después (httpx pool)", GATEWAY_PORT)):
+            url = f"http://127.0.0.1:{port}/api/v1/data/deportistas"
+            asyncio.run(run_load(url, min(args.concurrency, args.requests), args.concurrency))  # calentamiento
+            print_result(name, asyncio.run(run_load(url, args.requests, args.concurrency)))
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark del índice de búsqueda de data-management.
+
+Indexa documentos sintéticos (1M por defecto: publicaciones y un 10 % de
+eventos) con textos en español generados a partir de un vocabulario con
+frecuencias tipo Zipf, y mide el tiempo de indexado, la memoria que ocupa el
+índice y la latencia p50/p99 de distintos tipos de consulta, facetas incluidas.
+
+Uso:
+    python benchmarks/search_query.py --docs 1000000 --iterations 500
+"""
+import argparse
+import gc
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "data-management"))
+
+from search import SearchIndex, analyze  # noqa: E402
+
+SPORTS = ["Running", "Ciclismo", "Natación", "Cross Training", "Yoga", "Fútbol", "Tenis", "Escalada", "Trail", "Pádel"]
+COMMON = ["entrenamiento", "carrera", "sesión", "series", "rodaje", "montaña", "piscina", "bicicleta", "gimnasio",
+          "partido", "técnica", "fuerza", "resistencia", "velocidad", "recuperación", "equipo", "competición"]
+FILLER = ["hoy", "mañana", "muy", "buen", "ritmo", "suave", "duro", "con", "los", "amigos", "en", "el", "parque",
+          "por", "la", "tarde", "primera", "vez", "después", "de", "semana", "objetivo"]
+PLACES = ["Retiro", "Casa de Campo", "Montjuïc", "Sierra de Guadarrama", "Playa de la Concha", "Anillo Verde"]
+
+
+def vocabulary(size: int, rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyzáéíóúñ"
+    words = set(COMMON)
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return list(words)
+
+
+def synthetic_docs(count: int, vocab: list, rng: random.Random):
+    # Pesos Zipf: unas pocas palabras muy frecuentes y una cola larga de raras.
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    base = date(2024, 1, 1)
+    for doc_id in range(1, count + 1):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(8, 20)) + rng.sample(FILLER, 4)
+        rng.shuffle(words)
+        fecha = base + timedelta(days=doc_id * 1000 // count)
+        sport = rng.choice(SPORTS)
+        if doc_id % 10 == 0:
+            yield "evento", doc_id, {
+                "nombre": " ".join(words[:4]), "descripcion": " ".join(words[4:]),
+                "lugar": rng.choice(PLACES), "deporte": sport, "fecha": fecha,
+            }
+        else:
+            yield "publicacion", doc_id, {
+                "titulo": " ".join(words[:5]), "contenido": " ".join(words[5:]), "deporte": sport, "fecha": fecha,
+            }
+
+
+def rss_mb() -> float:
+    # ru_maxrss va en KiB en Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name: str, iterations: int, index: SearchIndex, make_query):
+    latencies = []
+    totals = []
+    for _ in range(iterations):
+        query = make_query()
+        started = time.perf_counter()
+        result = index.search(**query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        totals.append(result["total"])
+    latencies.sort()
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    print(f"{name:<34} p50 {statistics.median(latencies):>7.2f} ms   p99 {p99:>7.2f} ms   "
+          f"resultados (mediana) {int(statistics.median(totals)):>8,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = vocabulary(args.vocabulary, rng)
+    index = SearchIndex()
+
+    print(f"Indexando {args.docs:,} documentos...")
+    gc.collect()
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    for kind, doc_id, fields in synthetic_docs(args.docs, vocab, rng):
+        index.add(kind, doc_id, fields)
+        if doc_id % 100_000 == 0:
+            print(f"\r  {doc_id:>10,} / {args.docs:,}", end="", flush=True)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    stats = index.snapshot()
+    print(f"\n  {elapsed:.1f} s ({args.docs / elapsed:,.0f} docs/s), {stats['terminos']:,} términos, "
+          f"{stats['apariciones']:,} apariciones, ~{rss_mb() - rss_before:,.0f} MB de RSS\n")
+
+    # Términos por frecuencia para elegir consultas con listas cortas y largas.
+    by_size = sorted(
+        (word for word in vocab if analyze(word)),
+        key=lambda word: len(index.postings.get(analyze(word)[0], ())),
+    )
+    rare = by_size[: len(by_size) // 2]
+    common = by_size[-200:]
+    first_day = date(2024, 1, 1)
+
+    print(f"Consultas ({args.iterations} iteraciones, página de 20)")
+    measure("palabra rara", args.iterations, index, lambda: {"query": rng.choice(rare)})
+    measure("palabra frecuente", args.iterations, index, lambda: {"query": rng.choice(common)})
+    measure("dos palabras frecuentes", args.iterations, index,
+            lambda: {"query": f"{rng.choice(common)} {rng.choice(common)}"})
+    measure("frecuente + rara", args.iterations, index,
+            lambda: {"query": f"{rng.choice(common)} {rng.choice(rare)}"})
+    measure("frecuente + deporte", args.iterations, index,
+            lambda: {"query": rng.choice(common), "deporte": rng.choice(SPORTS)})
+
+    def events_in_quarter():
+        desde = first_day + timedelta(days=rng.randint(0, 900))
+        return {"query": rng.choice(common), "kind": "evento", "desde": desde, "hasta": desde + timedelta(days=90)}
+
+    measure("frecuente + eventos + 3 meses", args.iterations, index, events_in_quarter)
+    measure("frecuente, página 10", args.iterations, index, lambda: {"query": rng.choice(common), "offset": 180})
+
+
+if __name__ == "__main__":
+    main()
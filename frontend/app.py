@@ -1,54 +1,62 @@
 # /frontend/app.py
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, has_request_context
+from datetime import date, datetime
+from itertools import islice
+from sys import intern
 from threading import Lock
+import base64
+import json
 import os
 import requests
 
+from profiles import ProfileCache, to_api
+from records import Comment, Event, Publication, RecordView
+from sessions import build_session_interface
+from stores import DatedStore, IndexedStore
+
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
+# La sesión se guarda en el servidor (Redis si SESSION_REDIS_URL está definida,
+# si no en memoria del proceso) y la cookie solo lleva su id.
+app.session_interface = build_session_interface(os.getenv("SESSION_REDIS_URL"))
 
 # Obtén la URL del API Gateway desde las variables de entorno.
 API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:8000")
+# Stream de notificaciones y contadores en vivo, tal y como lo ve el navegador
+# (el gateway publicado en el host). Vacío desactiva las actualizaciones en vivo.
+PUSH_STREAM_URL = os.getenv("PUSH_STREAM_URL", "http://localhost:8000/api/v1/stream")
 
 # Almacenamiento en memoria para publicaciones/eventos compartidos entre sesiones.
-GLOBAL_PUBLICATIONS = []
-GLOBAL_EVENTS = []
+# Se recorren del más nuevo al más antiguo y se indexan por id y por dueño.
+# Guardan registros compactos con __slots__ (ver records.py), no dicts.
+GLOBAL_PUBLICATIONS = IndexedStore()
+# Los eventos además se ordenan por fecha para separar próximos y pasados.
+GLOBAL_EVENTS = DatedStore()
 PUBLICATION_SEQUENCE = 1
 EVENT_SEQUENCE = 1
 PUBLICATION_LOCK = Lock()
 EVENT_LOCK = Lock()
+# Ids en data-management de las publicaciones que ya están en GLOBAL_PUBLICATIONS,
+# para no mostrarlas dos veces al mezclar el feed local con el remoto.
+MIRRORED_REMOTE_IDS = set()
+# Eventos locales por su id en data-management, para reconocerlos en los
+# resultados de /eventos/cercanos.
+EVENTS_BY_REMOTE_ID = {}
 
+# Publicaciones por página en la lista completa y en el modo resumen.
+FEED_PAGE_SIZE = 20
+SUMMARY_PAGE_SIZE = 8
+# Eventos locales por página en /eventos.
+EVENTS_PAGE_SIZE = 20
 
-# ==================== Helpers ====================
-def get_default_profile(username: str) -> dict:
-    """Datos base para mostrar un perfil completo aunque no exista personalización."""
-    nice_name = username.capitalize() if username else "Deportista"
-    return {
-        "full_name": nice_name,
-        "headline": "Apasionado del deporte y la vida activa",
-        "sport": "Multideporte",
-        "level": "Aficionado",
-        "location": "Ciudad Global",
-        "bio": "Comparte tus logros, registra tus entrenamientos y conecta con otros atletas.",
-        "photo_url": "https://images.unsplash.com/photo-1521412644187-c49fa049e84d?auto=format&fit=crop&w=400&q=60",
-        "cover_url": "https://images.unsplash.com/photo-1500530855697-b586d89ba3ee?auto=format&fit=crop&w=1200&q=60",
-        "website": "",
-        "instagram": "",
-        "twitter": "",
-        "interests": ["Resistencia", "Trabajo en equipo", "Salud"]
-    }
-
-
-def get_profile_from_session(username: str) -> dict:
-    profile_data = session.get('profile_data')
-    if not profile_data:
-        profile_data = get_default_profile(username)
-        session['profile_data'] = profile_data
-    return profile_data
+# Perfiles públicos: se guardan una sola vez en data-management y se leen a
+# través de esta caché. Las publicaciones y comentarios solo llevan el usuario.
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "5000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
 
 
+# ==================== Helpers ====================
 def normalize_api_list(payload):
     if isinstance(payload, dict):
         data = payload.get("data")
@@ -57,6 +65,45 @@ def normalize_api_list(payload):
     return payload if isinstance(payload, list) else []
 
 
+def auth_headers(headers: dict = None) -> dict:
+    """Cabeceras hacia el API Gateway con el token de la sesión, si lo hay.
+
+    Con GATEWAY_AUTH_REQUIRED el gateway rechaza las escrituras sin token y
+    deduce el usuario (X-Usuario) del propio token.
+    """
+    headers = dict(headers or {})
+    token = session.get('token') if has_request_context() else None
+    if token and "Authorization" not in headers:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def gateway_batch(calls: dict) -> dict:
+    """Resuelve varias llamadas GET al API Gateway en un solo viaje (POST /api/v1/batch).
+
+    `calls` asocia un identificador a una tupla (servicio, ruta, params).
+    Devuelve el payload de cada llamada; las que fallan quedan como lista vacía.
+    """
+    sub_requests = [
+        {"id": key, "service": service, "path": path, "params": params or {}}
+        for key, (service, path, params) in calls.items()
+    ]
+    try:
+        response = requests.post(
+            f"{API_GATEWAY_URL}/api/v1/batch", json={"requests": sub_requests}, headers=auth_headers()
+        )
+        results = response.json().get("responses", []) if response.status_code == 200 else []
+    except Exception as e:
+        print(f"Error en la petición batch: {e}")
+        results = []
+
+    payloads = {key: [] for key in calls}
+    for result in results:
+        if result.get("id") in payloads and result.get("status") == 200:
+            payloads[result["id"]] = result.get("body")
+    return payloads
+
+
 def parse_event_date(value: str):
     if not value:
         return None
@@ -71,6 +118,30 @@ def parse_event_date(value: str):
     return None
 
 
+def annotate_event_date(evento: dict) -> dict:
+    """Parsea la fecha del evento una sola vez y guarda sus formas derivadas.
+
+    `fecha_date` es la fecha ya parseada (o None) y `fecha_legible` el texto a
+    mostrar; `fecha` queda normalizada a ISO cuando se pudo interpretar.
+    """
+    event_date = parse_event_date(evento.get("fecha"))
+    if event_date:
+        evento["fecha_date"] = event_date.date()
+        evento["fecha"] = intern(event_date.date().isoformat())
+        evento["fecha_legible"] = intern(event_date.strftime("%d/%m/%Y"))
+    else:
+        evento["fecha_date"] = None
+        evento["fecha_legible"] = evento.get("fecha") or "Por definir"
+    return evento
+
+
+def event_status(evento: dict, today) -> str:
+    event_date = evento.get("fecha_date")
+    if event_date is None:
+        return "sin_fecha"
+    return "proximo" if event_date >= today else "pasado"
+
+
 def format_duration(seconds: int) -> str:
     total_seconds = max(int(seconds or 0), 0)
     hours, remainder = divmod(total_seconds, 3600)
@@ -80,47 +151,201 @@ def format_duration(seconds: int) -> str:
     return f"{minutes:02d}:{sec:02d}"
 
 
-def register_publication(data: dict, owner: str):
+def register_publication(publication: Publication) -> Publication:
     global PUBLICATION_SEQUENCE
-    publication = dict(data)
-    publication.setdefault("likes", 0)
-    publication.setdefault("liked_by", [])
-    publication.setdefault("duracion", None)
-    publication.setdefault("comments", [])
-    publication["owner"] = owner
     with PUBLICATION_LOCK:
-        publication["id"] = PUBLICATION_SEQUENCE
+        publication.id = PUBLICATION_SEQUENCE
         PUBLICATION_SEQUENCE += 1
-        GLOBAL_PUBLICATIONS.insert(0, publication)
+        GLOBAL_PUBLICATIONS.add(publication)
+        if publication.remote_id is not None:
+            MIRRORED_REMOTE_IDS.add(publication.remote_id)
     return publication
 
 
-def register_event(data: dict, owner: str):
+def register_event(evento: Event) -> Event:
     global EVENT_SEQUENCE
-    evento = dict(data)
-    evento.setdefault("attendees", [])
-    evento.setdefault("estado", "proximo")
-    evento["owner"] = owner
-    evento["attendees_count"] = len(evento["attendees"])
+    annotate_event_date(evento)
     with EVENT_LOCK:
-        evento["id"] = EVENT_SEQUENCE
+        evento.id = EVENT_SEQUENCE
         EVENT_SEQUENCE += 1
-        GLOBAL_EVENTS.insert(0, evento)
+        GLOBAL_EVENTS.add(evento)
+        if evento.remote_id is not None:
+            EVENTS_BY_REMOTE_ID[evento.remote_id] = evento
     return evento
 
 
 def find_publication(pub_id: int):
-    for pub in GLOBAL_PUBLICATIONS:
-        if pub.get("id") == pub_id:
-            return pub
-    return None
+    return GLOBAL_PUBLICATIONS.get(pub_id)
 
 
 def find_event(event_id: int):
-    for evento in GLOBAL_EVENTS:
-        if evento.get("id") == event_id:
-            return evento
-    return None
+    return GLOBAL_EVENTS.get(event_id)
+
+
+def encode_feed_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_feed_cursor(value) -> dict:
+    if value:
+        try:
+            state = json.loads(base64.urlsafe_b64decode(value.encode()))
+            if isinstance(state, dict):
+                return state
+        except ValueError:
+            pass
+    return {"source": "local"}
+
+
+def apply_live_counters(posts_by_remote_id: dict, payload):
+    """Actualiza likes de publicaciones locales con los contadores de data-management."""
+    live = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(live, dict):
+        return
+    for remote_id, values in live.items():
+        post = posts_by_remote_id.get(remote_id)
+        if post is not None and "likes" in values:
+            post["likes"] = values["likes"]
+
+
+def gateway_call(method: str, path: str, **kwargs):
+    """Petición directa al API Gateway. Devuelve (status, payload) o (None, None) si falla."""
+    try:
+        kwargs["headers"] = auth_headers(kwargs.get("headers"))
+        response = requests.request(method, f"{API_GATEWAY_URL}/api/v1/{path}", **kwargs)
+        return response.status_code, response.json()
+    except Exception as e:
+        print(f"Error al llamar a {path}: {e}")
+        return None, None
+
+
+def fetch_profiles(usernames: list):
+    """Perfiles de varios usuarios en una sola petición a data-management (None si falla)."""
+    status, payload = gateway_call("GET", "data/perfiles", params={"usuarios": ",".join(usernames)})
+    return payload.get("data", {}) if status == 200 else None
+
+
+def page_profiles(posts) -> dict:
+    """Perfiles de los autores de una página y de sus comentarios, con una sola consulta."""
+    usernames = [post.get("autor") for post in posts]
+    usernames += [comment.get("autor") for post in posts for comment in post.get("comments") or ()]
+    return PROFILES.get_many(username for username in usernames if username)
+
+
+def notify(usuario: str, tipo: str, mensaje: str, idempotency_key: str, objeto: str = None, datos: dict = None):
+    """Encola una notificación in-app; el servicio la entrega en segundo plano.
+
+    La clave de idempotencia evita avisos repetidos si la acción se reintenta;
+    `objeto` permite al servicio agrupar las acciones sobre lo mismo.
+    """
+    if not usuario or usuario == session.get('user_id'):
+        return
+    gateway_call(
+        "POST", "notifications/enviar",
+        json={
+            "usuario": usuario, "tipo": tipo, "mensaje": mensaje, "datos": datos or {},
+            "actor": session.get('user_id'), "objeto": objeto,
+        },
+        headers={"Idempotency-Key": idempotency_key},
+    )
+
+
+def load_feed_page(cursor, page_size: int):
+    """Devuelve (publicaciones, siguiente_cursor) para una página del feed.
+
+    Primero se recorren las publicaciones locales (de la más nueva a la más
+    antigua) y, cuando se agotan, las remotas de data-management paginadas por
+    su propio cursor. Solo se materializa la página que se va a mostrar.
+    """
+    state = decode_feed_cursor(cursor)
+    if state.get("source") == "timeline":
+        state = {}
+    page = []
+    next_cursor = None
+    needs_remote = True
+    remote_cursor = state.get("remote")
+    if state.get("source") == "local":
+        page = list(islice(GLOBAL_PUBLICATIONS.iter_before(state.get("before")), page_size + 1))
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = encode_feed_cursor({"source": "local", "before": page[-1]["id"]})
+            needs_remote = False
+        elif len(page) == page_size:
+            next_cursor = encode_feed_cursor({"source": "remote"})
+            needs_remote = False
+
+    # Los contadores vivos de las publicaciones locales que también existen en
+    # data-management viajan en la misma petición batch que la página remota.
+    calls = {}
+    mirrored = {str(post["remote_id"]): post for post in page if post.get("remote_id") is not None}
+    if mirrored:
+        calls["contadores"] = ("data", "contadores", {"ids": ",".join(mirrored)})
+    if not needs_remote:
+        if calls:
+            apply_live_counters(mirrored, gateway_batch(calls)["contadores"])
+        return page, next_cursor
+
+    while True:
+        params = {"limit": page_size - len(page)}
+        if remote_cursor:
+            params["cursor"] = remote_cursor
+        calls["publicaciones"] = ("data", "deportistas", params)
+        payloads = gateway_batch(calls)
+        if "contadores" in calls:
+            apply_live_counters(mirrored, payloads["contadores"])
+        calls = {}
+        payload = payloads["publicaciones"]
+
+        for post in normalize_api_list(payload):
+            # El id remoto no identifica una publicación local: se guarda aparte para
+            # que los botones de like/comentario no apunten a otra publicación.
+            post["remote_id"] = post.pop("id", None)
+            if post["remote_id"] is not None and post["remote_id"] in MIRRORED_REMOTE_IDS:
+                continue
+            post.setdefault("likes", 0)
+            post.setdefault("comments", [])
+            page.append(post)
+
+        remote_cursor = payload.get("next_cursor") if isinstance(payload, dict) else None
+        # Si se descartaron publicaciones duplicadas, se completa la página.
+        if not remote_cursor or len(page) >= page_size:
+            break
+
+    next_cursor = encode_feed_cursor({"source": "remote", "remote": remote_cursor}) if remote_cursor else None
+    return page, next_cursor
+
+
+def load_timeline_page(username: str, cursor, page_size: int):
+    """Devuelve (publicaciones, siguiente_cursor, siguiendo) del timeline personalizado del usuario.
+
+    `siguiendo` es el número de usuarios que sigue, o None si no se pudo leer.
+    """
+    params = {"limit": page_size}
+    state = decode_feed_cursor(cursor)
+    # Un cursor del feed global (de cuando no seguía a nadie) empieza desde el principio.
+    if state.get("source") == "timeline" and state.get("remote"):
+        params["cursor"] = state["remote"]
+    payload = gateway_batch({"timeline": ("data", f"timeline/{username}", params)})["timeline"]
+
+    page = []
+    for post in normalize_api_list(payload):
+        post["remote_id"] = post.pop("id", None)
+        post["es_mio"] = post.get("autor") == username
+        post.setdefault("comments", [])
+        page.append(post)
+    if not isinstance(payload, dict):
+        return page, None, None
+    remote_cursor = payload.get("next_cursor")
+    next_cursor = encode_feed_cursor({"source": "timeline", "remote": remote_cursor}) if remote_cursor else None
+    return page, next_cursor, payload.get("siguiendo")
+
+
+PROFILES = ProfileCache(fetch_profiles, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+
+
+@app.context_processor
+def inject_push_stream():
+    return {"push_stream_url": PUSH_STREAM_URL}
 
 
 # ==================== PÁGINA PRINCIPAL ====================
@@ -133,77 +358,103 @@ def index():
 @app.route("/publicaciones")
 def lista_publicaciones():
     """Lista de publicaciones."""
-    try:
-        # Obtener publicaciones desde el microservicio de data management
-        response = requests.get(f"{API_GATEWAY_URL}/api/v1/data/deportistas")
-        payload = response.json() if response.status_code == 200 else []
-    except Exception as e:
-        print(f"Error al obtener publicaciones: {e}")
-        payload = []
-
-    remote_posts = normalize_api_list(payload)
-    for post in remote_posts:
-        post.setdefault("likes", 0)
-        post.setdefault("comments", [])
-
-    publicaciones_feed = list(GLOBAL_PUBLICATIONS) + remote_posts
+    # Publicaciones locales y, a continuación, las del microservicio de data management
+    publicaciones_feed, next_cursor = load_feed_page(request.args.get("cursor"), FEED_PAGE_SIZE)
     liked_posts = session.get('liked_publications', [])
 
     return render_template(
         "publicaciones/lista.html",
         publicaciones=publicaciones_feed,
+        perfiles=page_profiles(publicaciones_feed),
         liked_posts=liked_posts,
+        next_cursor=next_cursor,
     )
 
 @app.route("/publicaciones/feed")
 def feed_publicaciones():
     """Feed de publicaciones."""
-    try:
-        response = requests.get(f"{API_GATEWAY_URL}/api/v1/data/deportistas")
-        payload = response.json() if response.status_code == 200 else []
-    except Exception as e:
-        print(f"Error al obtener feed: {e}")
-        payload = []
+    # Con sesión iniciada el feed es el timeline personalizado (propias y de los
+    # usuarios seguidos); sin sesión, o mientras no sigue a nadie, se muestra
+    # la actividad global.
+    username = session.get('user_id')
+    siguiendo = None
+    if username:
+        publicaciones_feed, next_cursor, siguiendo = load_timeline_page(
+            username, request.args.get("cursor"), SUMMARY_PAGE_SIZE
+        )
+    if not siguiendo:
+        publicaciones_feed, next_cursor = load_feed_page(request.args.get("cursor"), SUMMARY_PAGE_SIZE)
+
+    return render_template(
+        "publicaciones/feed.html",
+        publicaciones=publicaciones_feed,
+        perfiles=page_profiles(publicaciones_feed),
+        next_cursor=next_cursor,
+        # En el timeline todos los autores ajenos son usuarios seguidos; en el
+        # feed global (sin seguimientos) ninguno lo es.
+        timeline=bool(siguiendo),
+    )
 
-    remote_posts = normalize_api_list(payload)
-    publicaciones_feed = list(GLOBAL_PUBLICATIONS) + remote_posts
 
-    return render_template("publicaciones/feed.html", publicaciones=publicaciones_feed)
+@app.post("/usuarios/<usuario>/seguir")
+def seguir_usuario(usuario: str):
+    """Seguir (o dejar de seguir, con accion=dejar) a otro usuario."""
+    username = session.get('user_id')
+    if not username:
+        flash("Debes iniciar sesión", "warning")
+        return redirect(url_for("login"))
+    if usuario == username:
+        return redirect(url_for("feed_publicaciones"))
+
+    if request.form.get("accion") == "dejar":
+        status, _ = gateway_call("DELETE", "data/seguimientos", params={"seguidor": username, "seguido": usuario})
+        mensaje = f"Has dejado de seguir a {usuario}"
+    else:
+        status, _ = gateway_call("POST", "data/seguimientos", json={"seguidor": username, "seguido": usuario})
+        mensaje = f"Ahora sigues a {usuario}"
+    if status == 200:
+        flash(mensaje, "success")
+    else:
+        flash("No se pudo actualizar el seguimiento", "danger")
+    return redirect(url_for("feed_publicaciones"))
 
 @app.route("/publicaciones/crear", methods=["GET", "POST"])
 def crear_publicacion():
     """Crear una nueva publicación."""
     if request.method == "POST":
+        owner = session.get('user_id', 'Invitado')
+        profile = PROFILES.get(owner)
         publicacion_data = {
             "titulo": request.form.get("titulo"),
             "contenido": request.form.get("contenido"),
+            # El autor permite a data-management repartir la publicación a sus seguidores.
+            "autor": owner,
+            "deporte": profile.get("sport"),
         }
 
         try:
             response = requests.post(
                 f"{API_GATEWAY_URL}/api/v1/data/deportistas",
-                json=publicacion_data
+                json=publicacion_data,
+                headers=auth_headers(),
             )
             success = response.status_code == 200
+            remote_id = response.json().get("data", {}).get("id") if success else None
         except Exception as e:
             print(f"Error al crear publicación: {e}")
             flash("Error al crear la publicación", "danger")
             success = False
-
-        profile = get_profile_from_session(session.get('user_id')) if session.get('user_id') else get_default_profile("Invitado")
-        owner = session.get('user_id', 'Invitado')
-        user_post = {
-            "titulo": publicacion_data.get("titulo") or "Publicación sin título",
-            "contenido": publicacion_data.get("contenido") or "",
-            "autor": profile.get("full_name") or owner,
-            "deporte": profile.get("sport"),
-            "imagen": profile.get("photo_url"),
-            "fecha": datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
-            "likes": 0,
-            "comentarios": 0,
-            "es_mio": True,
-        }
-        register_publication(user_post, owner)
+            remote_id = None
+
+        register_publication(Publication(
+            owner=owner,
+            titulo=publicacion_data.get("titulo") or "Publicación sin título",
+            contenido=publicacion_data.get("contenido") or "",
+            deporte=profile.get("sport"),
+            fecha=datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
+            es_mio=True,
+            remote_id=remote_id,
+        ))
         flash("Publicación creada exitosamente" if success else "Publicación guardada localmente", "success")
         return redirect(url_for("lista_publicaciones"))
 
@@ -230,25 +481,40 @@ def crear_publicacion_entrenamiento():
     descripcion = (payload.get("descripcion") or "Sesión registrada desde el temporizador.").strip()
     sensacion = (payload.get("sensacion") or "Sin comentarios").strip()
 
-    profile = get_profile_from_session(session.get('user_id'))
     formatted_duration = format_duration(duracion_segundos)
     contenido = f"Duración: {formatted_duration}\nDeporte: {deporte}\nSensación: {sensacion}\n\n{descripcion}"
 
-    nueva_publicacion = {
-        "titulo": f"Entrenamiento de {deporte}",
+    nueva_publicacion = Publication(
+        owner=session.get('user_id'),
+        titulo=f"Entrenamiento de {deporte}",
+        contenido=contenido,
+        deporte=deporte,
+        fecha=datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
+        es_mio=True,
+        duracion=formatted_duration,
+        tipo="entrenamiento",
+    )
+
+    # También se guarda en data-management para que llegue al timeline de los seguidores.
+    status, remote = gateway_call("POST", "data/deportistas", json={
+        "titulo": nueva_publicacion.titulo,
         "contenido": contenido,
-        "autor": profile.get("full_name") or session.get('user_id'),
+        "autor": session.get('user_id'),
         "deporte": deporte,
-        "imagen": profile.get("photo_url"),
-        "fecha": datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
-        "likes": 0,
-        "comentarios": 0,
-        "es_mio": True,
-        "duracion": formatted_duration,
         "tipo": "entrenamiento",
-    }
+        "duracion": formatted_duration,
+    })
+    nueva_publicacion.remote_id = remote.get("data", {}).get("id") if status == 200 else None
+
+    # Analytics guarda la sesión con campos tipados para las estadísticas de entrenamiento.
+    gateway_call("POST", "analytics/entrenamientos", json={
+        "usuario": session.get('user_id'),
+        "deporte": deporte,
+        "duracion_segundos": duracion_segundos,
+        "sensacion": sensacion,
+    })
 
-    register_publication(nueva_publicacion, session.get('user_id', 'Invitado'))
+    register_publication(nueva_publicacion)
     return jsonify({"success": True})
 
 @app.route("/publicaciones/<int:id>")
@@ -269,17 +535,30 @@ def like_publicacion(pub_id: int):
 
     username = session.get('user_id')
     liked_posts = session.get('liked_publications', [])
-    publication.setdefault("liked_by", [])
 
-    if pub_id in liked_posts or username in publication["liked_by"]:
+    if pub_id in liked_posts or username in publication.liked_by:
         return jsonify({"success": False, "message": "Ya te gusta esta publicación"}), 400
 
-    publication["likes"] = (publication.get("likes") or 0) + 1
-    publication["liked_by"].append(username)
+    # Si la publicación existe en data-management, el contador compartido vive
+    # en Redis y es el mismo para todos los workers.
+    remote_likes = None
+    if publication.remote_id is not None:
+        status, payload = gateway_call(
+            "POST", f"data/deportistas/{publication.remote_id}/likes", json={"usuario": username}
+        )
+        if status == 409:
+            return jsonify({"success": False, "message": "Ya te gusta esta publicación"}), 400
+        if status == 200:
+            remote_likes = payload.get("data", {}).get("likes")
+
+    publication.likes = remote_likes if remote_likes is not None else publication.likes + 1
+    publication.add_like(username)
     liked_posts.append(pub_id)
     session['liked_publications'] = liked_posts
     session.modified = True
-    return jsonify({"success": True, "likes": publication["likes"]})
+    notify(publication.owner, "like", f"A {username} le gusta tu publicación", f"like:{pub_id}:{username}",
+           f"publicacion:{pub_id}", {"publicacion_id": pub_id})
+    return jsonify({"success": True, "likes": publication.likes})
 
 
 @app.post("/publicaciones/<int:pub_id>/comentarios")
@@ -296,81 +575,133 @@ def comentar_publicacion(pub_id: int):
     if not comentario:
         return jsonify({"success": False, "message": "Escribe un comentario"}), 400
 
-    comment = {
-        "autor": session.get('user_id'),
-        "perfil": get_profile_from_session(session.get('user_id')).get("photo_url"),
-        "texto": comentario,
-        "fecha": datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
-    }
-    publication.setdefault("comments", []).append(comment)
-    return jsonify({"success": True, "comment": comment, "total": len(publication["comments"])})
+    comment = Comment(session.get('user_id'), comentario, datetime.utcnow().strftime("%Y-%m-%d %H:%M"))
+    publication.comments.append(comment)
+    total = len(publication.comments)
+    if publication.remote_id is not None:
+        status, payload = gateway_call(
+            "POST",
+            f"data/deportistas/{publication.remote_id}/comentarios",
+            json={"autor": comment.autor, "texto": comment.texto},
+        )
+        if status == 200:
+            total = payload.get("total", total)
+    notify(publication.owner, "comentario", f"{comment.autor} comentó tu publicación",
+           f"comentario:{pub_id}:{comment.autor}:{total}", f"publicacion:{pub_id}", {"publicacion_id": pub_id})
+    autor = PROFILES.get(comment.autor).get("full_name")
+    return jsonify({"success": True, "comment": {**comment.to_dict(), "nombre": autor}, "total": total})
 
 # ==================== EVENTOS ====================
-@app.route("/eventos")
-def lista_eventos():
-    """Lista de eventos."""
-    try:
-        response = requests.get(f"{API_GATEWAY_URL}/api/v1/analytics/metricas")
-        payload = response.json() if response.status_code == 200 else []
-    except Exception as e:
-        print(f"Error al obtener eventos: {e}")
-        payload = []
-
-    local_events = []
-    for ev in GLOBAL_EVENTS:
-        event_copy = dict(ev)
-        event_copy.setdefault("attendees", [])
-        event_copy["attendees_count"] = len(event_copy["attendees"])
-        local_events.append(event_copy)
+def load_events_page(filtro: str, username, today, cursor, page_size: int):
+    """Devuelve (eventos_locales, siguiente_cursor) para una página de /eventos.
+
+    Los grupos salen de la bisección por fecha y del índice por dueño; solo se
+    recorren los eventos de la página. El cursor guarda la posición del último
+    evento mostrado: su id, o su (fecha, id) en próximos y pasados.
+    """
+    state = decode_feed_cursor(cursor)
+    position = None
+    if "fecha" in state:
+        try:
+            position = (date.fromisoformat(state["fecha"]), int(state["id"]))
+        except (KeyError, TypeError, ValueError):
+            position = None
+    if filtro == "proximos":
+        events = GLOBAL_EVENTS.iter_on_or_after(today, position)
+    elif filtro == "pasados":
+        events = GLOBAL_EVENTS.iter_before_date(today, position)
+    elif filtro == "mios":
+        events = GLOBAL_EVENTS.iter_owned_by(username, state.get("before"))
+    elif filtro == "cercanos":
+        # Los cercanos salen del índice geográfico de data-management.
+        events = iter(())
+    else:
+        events = GLOBAL_EVENTS.iter_before(state.get("before"))
 
-    remote_events = normalize_api_list(payload)
-    for ev in remote_events:
-        ev.setdefault("attendees_count", 0)
+    page = list(islice(events, page_size + 1))
+    if len(page) <= page_size:
+        return page, None
+    page = page[:page_size]
+    last = page[-1]
+    if filtro in ("proximos", "pasados"):
+        return page, encode_feed_cursor({"fecha": last.fecha_date.isoformat(), "id": last.id})
+    return page, encode_feed_cursor({"before": last.id})
 
-    eventos_feed = local_events + remote_events
 
+@app.route("/eventos")
+def lista_eventos():
+    """Lista de eventos."""
+    filtro = request.args.get("filtro", "todos")
+    if filtro not in ("todos", "proximos", "pasados", "mios", "cercanos"):
+        filtro = "todos"
     today = datetime.utcnow().date()
-    annotated_events = []
-    for ev in eventos_feed:
-        event_copy = dict(ev)
-        event_date = parse_event_date(event_copy.get("fecha"))
-        if event_date:
-            event_copy["fecha_legible"] = event_date.strftime("%d/%m/%Y")
-            event_copy["estado"] = "proximo" if event_date.date() >= today else "pasado"
+    username = session.get('user_id')
+    local_events, next_cursor = load_events_page(filtro, username, today, request.args.get("cursor"), EVENTS_PAGE_SIZE)
+
+    calls = {}
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    radio = request.args.get("radio", 10, type=float)
+    if filtro == "cercanos" and lat is not None and lon is not None:
+        calls["cercanos"] = ("data", "eventos/cercanos", {"lat": lat, "lon": lon, "radio": radio})
+    # Asistentes compartidos de los eventos locales de la página, en el mismo viaje.
+    # Van por el id de data-management: el id local cambia entre workers y reinicios.
+    remote_ids = ",".join(str(ev.remote_id) for ev in local_events if ev.remote_id is not None)
+    if remote_ids:
+        calls["asistentes"] = ("data", "eventos/asistentes", {"ids": remote_ids})
+    payloads = gateway_batch(calls) if calls else {}
+    asistentes = payloads.get("asistentes")
+    asistentes = asistentes.get("data", {}) if isinstance(asistentes, dict) else {}
+
+    # Los eventos locales se comparten entre peticiones y workers: los valores de
+    # esta petición (asistentes compartidos, estado) van en una vista por encima.
+    attending_events = []
+    local_views = []
+    for local in local_events:
+        overlay = {"estado": event_status(local, today)}
+        shared = asistentes.get(str(local.remote_id)) if local.remote_id is not None else None
+        if shared:
+            overlay["attendees_count"] = shared.get("asistentes", local.attendees_count)
+            attending = shared.get("asistiendo", False)
         else:
-            event_copy["fecha_legible"] = event_copy.get("fecha", "Por definir")
-            event_copy["estado"] = "sin_fecha"
-        annotated_events.append(event_copy)
-    eventos_feed = annotated_events
-
-    filtro = request.args.get("filtro", "todos")
-
-    def is_future(ev):
-        event_date = parse_event_date(ev.get("fecha"))
-        return event_date.date() >= today if event_date else False
-
-    def is_past(ev):
-        event_date = parse_event_date(ev.get("fecha"))
-        return event_date.date() < today if event_date else False
-
-    eventos_mios = [ev for ev in eventos_feed if ev.get("owner") == session.get('user_id') or ev.get("es_mio")]
-
-    eventos_por_filtro = {
-        "todos": eventos_feed,
-        "proximos": [ev for ev in eventos_feed if is_future(ev)],
-        "pasados": [ev for ev in eventos_feed if is_past(ev)],
-        "mios": eventos_mios,
+            attending = username in local.attendees
+        if attending:
+            attending_events.append(local.id)
+        local_views.append(RecordView(local, **overlay))
+
+    cercanos = []
+    for ev in normalize_api_list(payloads.get("cercanos")):
+        local = EVENTS_BY_REMOTE_ID.get(ev.get("id"))
+        if local is not None:
+            ev = RecordView(local, distancia_km=ev.get("distancia_km"), estado=event_status(local, today))
+            if username in local.attendees:
+                attending_events.append(local.id)
+        else:
+            ev["remote_id"] = ev.pop("id", None)
+            ev.setdefault("attendees_count", 0)
+            annotate_event_date(ev)
+            ev["estado"] = event_status(ev, today)
+        cercanos.append(ev)
+
+    # Los cercanos vienen del índice geográfico de data-management, no de la página local.
+    eventos_seleccionados = cercanos if filtro == "cercanos" else local_views
+
+    counts = {
+        "todos": len(GLOBAL_EVENTS),
+        "proximos": GLOBAL_EVENTS.count_on_or_after(today),
+        "pasados": GLOBAL_EVENTS.count_before(today),
+        "mios": GLOBAL_EVENTS.count_owned_by(username),
+        "cercanos": len(cercanos),
     }
 
-    eventos_seleccionados = eventos_por_filtro.get(filtro, eventos_feed)
-    counts = {clave: len(valor) for clave, valor in eventos_por_filtro.items()}
-
     return render_template(
         "eventos/lista.html",
         eventos=eventos_seleccionados,
         filtro=filtro,
         counts=counts,
-        attending_events=session.get('attending_events', []),
+        ubicacion={"lat": lat, "lon": lon, "radio": radio} if "cercanos" in calls else None,
+        attending_events=attending_events,
+        next_cursor=next_cursor,
     )
 
 @app.route("/eventos/crear", methods=["GET", "POST"])
@@ -382,12 +713,17 @@ def crear_evento():
             "descripcion": request.form.get("descripcion"),
             "fecha": request.form.get("fecha"),
             "lugar": request.form.get("lugar") or "Por definir",
+            "deporte": request.form.get("deporte") or None,
+            # Coordenadas opcionales (botón "Usar mi ubicación"): el evento aparece en "Cerca de mí".
+            "latitud": request.form.get("latitud", type=float),
+            "longitud": request.form.get("longitud", type=float),
         }
 
         try:
             response = requests.post(
                 f"{API_GATEWAY_URL}/api/v1/analytics/analizar",
-                json=evento_data
+                json=evento_data,
+                headers=auth_headers(),
             )
             success = response.status_code == 200
         except Exception as e:
@@ -396,16 +732,24 @@ def crear_evento():
             success = False
 
         owner = session.get('user_id', 'Invitado')
-        user_event = {
-            "nombre": evento_data.get("nombre") or "Evento deportivo",
-            "descripcion": evento_data.get("descripcion") or "",
-            "fecha": evento_data.get("fecha") or datetime.utcnow().strftime("%Y-%m-%d"),
-            "lugar": evento_data.get("lugar"),
-            "organizador": owner,
-            "es_mio": True,
-            "attendees": [],
-        }
-        register_event(user_event, owner)
+        user_event = Event(
+            owner=owner,
+            nombre=evento_data.get("nombre") or "Evento deportivo",
+            descripcion=evento_data.get("descripcion") or "",
+            fecha=evento_data.get("fecha") or datetime.utcnow().strftime("%Y-%m-%d"),
+            lugar=evento_data.get("lugar"),
+            deporte=evento_data.get("deporte"),
+            latitud=evento_data.get("latitud"),
+            longitud=evento_data.get("longitud"),
+            es_mio=True,
+        )
+        # data-management guarda el evento para que aparezca en las búsquedas.
+        status, remote = gateway_call("POST", "data/eventos", json={
+            key: user_event.get(key)
+            for key in ("nombre", "descripcion", "fecha", "lugar", "deporte", "organizador", "latitud", "longitud")
+        })
+        user_event.remote_id = remote.get("data", {}).get("id") if status == 200 else None
+        register_event(user_event)
         flash("Evento creado exitosamente" if success else "Evento guardado localmente", "success")
         return redirect(url_for("lista_eventos"))
 
@@ -427,27 +771,33 @@ def asistir_evento(event_id: int):
         return jsonify({"success": False, "message": "Evento no encontrado"}), 404
 
     username = session.get('user_id')
-    attending_events = session.get('attending_events', [])
-    evento.setdefault("attendees", [])
-
-    if event_id in attending_events:
-        attending_events.remove(event_id)
-        if username in evento["attendees"]:
-            evento["attendees"].remove(username)
-        attending = False
+    # El navegador manda el estado que quiere (asistir o no), no un "alternar":
+    # repetir la petición deja el mismo resultado.
+    payload = request.get_json(silent=True) or {}
+    attending = payload.get("asistiendo")
+    if not isinstance(attending, bool):
+        attending = username not in evento.attendees
+
+    # Primero data-management (el total compartido entre workers vive en Redis):
+    # si falla, el estado local no cambia y la interfaz no se desincroniza.
+    shared_total = None
+    if evento.remote_id is not None:
+        status, payload = gateway_call(
+            "PUT", f"data/eventos/{evento.remote_id}/asistentes", json={"asistiendo": attending}
+        )
+        if status != 200:
+            return jsonify({"success": False, "message": "No se pudo actualizar la asistencia"}), 503
+        shared_total = payload.get("data", {}).get("asistentes")
+
+    if attending:
+        evento.add_attendee(username)
     else:
-        attending_events.append(event_id)
-        if username not in evento["attendees"]:
-            evento["attendees"].append(username)
-        attending = True
-
-    evento["attendees_count"] = len(evento["attendees"])
-    session['attending_events'] = attending_events
-    session.modified = True
+        evento.remove_attendee(username)
+    evento.attendees_count = shared_total if shared_total is not None else len(evento.attendees)
     return jsonify({
         "success": True,
         "attending": attending,
-        "attendees": evento["attendees_count"],
+        "attendees": evento.attendees_count,
     })
 
 # ==================== USUARIOS ====================
@@ -467,6 +817,8 @@ def login():
             )
             if response.status_code == 200:
                 data = response.json()
+                # Id de sesión nuevo al autenticarse (evita la fijación de sesión).
+                session.regenerate()
                 session['user_id'] = credentials['username']
                 session['token'] = data.get('token', '')
                 flash("Inicio de sesión exitoso", "success")
@@ -497,6 +849,8 @@ def registro():
             if response.status_code == 200:
                 flash("Registro exitoso. Por favor inicia sesión.", "success")
                 return redirect(url_for("login"))
+            elif response.status_code in (400, 409):
+                flash(response.json().get("detail", "Error al registrar usuario"), "danger")
             else:
                 flash("Error al registrar usuario", "danger")
         except Exception as e:
@@ -508,7 +862,12 @@ def registro():
 @app.route("/logout")
 def logout():
     """Cerrar sesión."""
+    token = session.get('token')
+    if token:
+        # Revoca el token para que el gateway deje de aceptarlo antes de que caduque.
+        gateway_call("POST", "auth/logout", headers={"Authorization": f"Bearer {token}"})
     session.clear()
+    session.regenerate()
     flash("Sesión cerrada exitosamente", "success")
     return redirect(url_for("index"))
 
@@ -520,9 +879,9 @@ def perfil_usuario():
         return redirect(url_for("login"))
 
     username = session.get('user_id')
-    profile_data = get_profile_from_session(username)
-    user_publications = [pub for pub in GLOBAL_PUBLICATIONS if pub.get("owner") == username]
-    user_events = [ev for ev in GLOBAL_EVENTS if ev.get("owner") == username]
+    profile_data = PROFILES.get(username)
+    user_publications = GLOBAL_PUBLICATIONS.owned_by(username)
+    user_events = GLOBAL_EVENTS.owned_by(username)
 
     stats = {
         "publicaciones": len(user_publications),
@@ -546,7 +905,7 @@ def editar_perfil():
         return redirect(url_for("login"))
 
     username = session.get('user_id')
-    profile_data = get_profile_from_session(username)
+    profile_data = PROFILES.get(username)
 
     if request.method == "POST":
         profile_data = {
@@ -563,8 +922,11 @@ def editar_perfil():
             "twitter": request.form.get("twitter") or "",
             "interests": [tag.strip() for tag in request.form.get("interests", "").split(",") if tag.strip()] or profile_data.get("interests", []),
         }
-        session['profile_data'] = profile_data
-        session.modified = True
+        status, _ = gateway_call("PUT", f"data/perfiles/{username}", json=to_api(profile_data))
+        if status != 200:
+            flash("No se pudo guardar el perfil, inténtalo de nuevo", "danger")
+            return render_template("usuarios/editar_perfil.html", profile=profile_data)
+        PROFILES.invalidate(username)
         flash("Perfil actualizado exitosamente", "success")
         return redirect(url_for("perfil_usuario"))
 
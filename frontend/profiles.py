@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Campos del perfil en data-management y su nombre en las plantillas.
+API_FIELDS = {
+    "nombre": "full_name",
+    "titular": "headline",
+    "deporte": "sport",
+    "nivel": "level",
+    "ubicacion": "location",
+    "bio": "bio",
+    "foto_url": "photo_url",
+    "portada_url": "cover_url",
+    "web": "website",
+    "instagram": "instagram",
+    "twitter": "twitter",
+    "intereses": "interests",
+}
+
+
+def default_profile(username: str) -> dict:
+    """Datos base para mostrar un perfil completo aunque no exista personalización."""
+    nice_name = username.capitalize() if username else "Deportista"
+    return {
+        "full_name": nice_name,
+        "headline": "Apasionado del deporte y la vida activa",
+        "sport": "Multideporte",
+        "level": "Aficionado",
+        "location": "Ciudad Global",
+        "bio": "Comparte tus logros, registra tus entrenamientos y conecta con otros atletas.",
+        "photo_url": "https://images.unsplash.com/photo-1521412644187-c49fa049e84d?auto=format&fit=crop&w=400&q=60",
+        "cover_url": "https://images.unsplash.com/photo-1500530855697-b586d89ba3ee?auto=format&fit=crop&w=1200&q=60",
+        "website": "",
+        "instagram": "",
+        "twitter": "",
+        "interests": ["Resistencia", "Trabajo en equipo", "Salud"]
+    }
+
+
+def from_api(username: str, data: dict) -> dict:
+    """Perfil de data-management con las claves de las plantillas; los huecos, por defecto."""
+    profile = default_profile(username)
+    for api_field, field in API_FIELDS.items():
+        value = data.get(api_field)
+        if value not in (None, "", []):
+            profile[field] = value
+    return profile
+
+
+def to_api(profile: dict) -> dict:
+    return {api_field: profile.get(field) for api_field, field in API_FIELDS.items()}
+
+
+class ProfileCache:
+    """Caché LRU de lectura a través de los perfiles de data-management.
+
+    `fetch_many(usernames)` trae de una vez los perfiles que falten y devuelve
+    un dict {usuario: datos} (los usuarios sin perfil no aparecen) o None si
+    falla. Los usuarios sin perfil se guardan con el perfil por defecto para no
+    volver a pedirlos en cada página; un fallo no se guarda.
+
+    La caché es del proceso: quien edita un perfil la invalida en su worker y
+    en los demás la copia vieja dura como mucho `ttl` segundos.
+
+    Los perfiles devueltos se comparten entre peticiones: no deben modificarse.
+    """
+
+    def __init__(self, fetch_many, max_entries: int = 5000, ttl: float = 60.0):
+        self.fetch_many = fetch_many
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0}
+
+    def _lookup(self, username: str):
+        entry = self.entries.get(username)
+        if entry is None:
+            return None
+        profile, expires_at = entry
+        if expires_at < time.monotonic():
+            del self.entries[username]
+            return None
+        self.entries.move_to_end(username)
+        return profile
+
+    def put(self, username: str, profile: dict):
+        with self.lock:
+            self.entries[username] = (profile, time.monotonic() + self.ttl)
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self.lock:
+            self.entries.pop(username, None)
+
+    def get_many(self, usernames) -> dict:
+        """Perfiles de varios usuarios; los que no están en caché, en una sola petición."""
+        found = {}
+        missing = []
+        with self.lock:
+            for username in dict.fromkeys(usernames):
+                profile = self._lookup(username)
+                if profile is None:
+                    missing.append(username)
+                else:
+                    found[username] = profile
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(missing)
+        if not missing:
+            return found
+
+        self.stats["fetches"] += 1
+        fetched = self.fetch_many(missing)
+        for username in missing:
+            if fetched is None:
+                found[username] = default_profile(username)
+                continue
+            profile = from_api(username, fetched.get(username) or {})
+            self.put(username, profile)
+            found[username] = profile
+        return found
+
+    def get(self, username: str) -> dict:
+        return self.get_many([username])[username]
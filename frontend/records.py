@@ -0,0 +1,153 @@
+from sys import intern
+
+
+# Los registros sin likes ni asistentes comparten este set vacío; el suyo propio
+# se crea con el primero.
+EMPTY = frozenset()
+
+
+def _intern(value):
+    # Dueños, autores, deportes y fechas se repiten en miles de registros: una
+    # sola copia de cada cadena para todos.
+    return intern(value) if type(value) is str else value
+
+
+class Record:
+    """Base de los registros en memoria del frontend.
+
+    Los atributos viven en __slots__ (sin un dict por objeto). También admiten
+    el acceso tipo dict (`registro["id"]`, `registro.get("autor")`) porque se
+    mezclan con las publicaciones y eventos que llegan como dicts de la API.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key) -> bool:
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+
+class Comment(Record):
+    __slots__ = ("autor", "texto", "fecha")
+
+    def __init__(self, autor: str, texto: str, fecha: str):
+        self.autor = _intern(autor)
+        self.texto = texto
+        self.fecha = _intern(fecha)
+
+
+class Publication(Record):
+    """Publicación local. `liked_by` es un set: comprobar un like es O(1)."""
+
+    __slots__ = (
+        "id", "owner", "autor", "titulo", "contenido", "deporte", "fecha", "tipo", "duracion",
+        "likes", "liked_by", "comments", "es_mio", "remote_id",
+    )
+
+    def __init__(self, owner: str, titulo: str, contenido: str, autor: str = None, deporte: str = None,
+                 fecha: str = None, tipo: str = None, duracion: str = None, likes: int = 0, es_mio: bool = False,
+                 remote_id: int = None):
+        self.id = None
+        self.owner = _intern(owner)
+        self.autor = _intern(autor or owner)
+        self.titulo = titulo
+        self.contenido = contenido
+        self.deporte = _intern(deporte)
+        self.fecha = _intern(fecha)
+        self.tipo = _intern(tipo)
+        self.duracion = _intern(duracion)
+        self.likes = likes
+        self.liked_by = EMPTY
+        self.comments = []
+        self.es_mio = es_mio
+        self.remote_id = remote_id
+
+    def add_like(self, username: str):
+        if self.liked_by is EMPTY:
+            self.liked_by = set()
+        self.liked_by.add(_intern(username))
+
+
+class Event(Record):
+    """Evento local. `attendees` es un set: comprobar una asistencia es O(1)."""
+
+    __slots__ = (
+        "id", "owner", "nombre", "descripcion", "fecha", "fecha_date", "fecha_legible", "lugar", "deporte",
+        "organizador", "latitud", "longitud", "attendees", "attendees_count", "estado", "es_mio", "remote_id",
+    )
+
+    def __init__(self, owner: str, nombre: str, descripcion: str, fecha: str, lugar: str = None, deporte: str = None,
+                 organizador: str = None, latitud: float = None, longitud: float = None, es_mio: bool = False,
+                 remote_id: int = None):
+        self.id = None
+        self.owner = _intern(owner)
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.fecha = _intern(fecha)
+        self.fecha_date = None
+        self.fecha_legible = None
+        self.lugar = _intern(lugar)
+        self.deporte = _intern(deporte)
+        self.organizador = _intern(organizador or owner)
+        self.latitud = latitud
+        self.longitud = longitud
+        self.attendees = EMPTY
+        self.attendees_count = 0
+        self.estado = "proximo"
+        self.es_mio = es_mio
+        self.remote_id = remote_id
+
+    def add_attendee(self, username: str):
+        if self.attendees is EMPTY:
+            self.attendees = set()
+        self.attendees.add(_intern(username))
+
+    def remove_attendee(self, username: str):
+        if username in self.attendees:
+            self.attendees.remove(username)
+
+
+class RecordView:
+    """Un registro compartido más los campos propios de una petición.
+
+    Los registros se comparten entre peticiones, así que los valores que solo
+    valen para quien pide la página (estado, distancia, asistentes en vivo) van
+    en un dict pequeño por encima en lugar de en una copia del registro.
+    """
+
+    __slots__ = ("record", "overlay")
+
+    def __init__(self, record: Record, **overlay):
+        self.record = record
+        self.overlay = overlay
+
+    def __getattr__(self, name):
+        try:
+            return self.overlay[name]
+        except KeyError:
+            return getattr(self.record, name)
+
+    def __getitem__(self, key):
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.record[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.overlay or key in self.record
+
+    def get(self, key, default=None):
+        return self.overlay[key] if key in self.overlay else self.record.get(key, default)
@@ -0,0 +1,188 @@
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+
+# Mismo formato que la sesión en cookie de Flask: admite tuplas (los mensajes
+# flash), bytes, fechas, etc.
+serializer = TaggedJSONSerializer()
+
+# Momento de la última escritura, guardado dentro de la propia sesión.
+RENEWED_KEY = "_renovada"
+
+
+class ServerSideSession(SessionMixin):
+    """Sesión cuyo contenido vive en el servidor; la cookie solo lleva el id.
+
+    Los datos se leen del almacén la primera vez que se accede a la sesión,
+    así que las peticiones que no la usan no hacen ninguna consulta.
+    """
+
+    def __init__(self, store, sid: str = None):
+        self.store = store
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+        self._data = None
+        self._raw = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self.accessed = True
+            self._raw = self.store.load(self.sid) if self.sid else None
+            self._data = serializer.loads(self._raw) if self._raw else {}
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        if self.data:
+            self.data.clear()
+            self.modified = True
+
+    def regenerate(self):
+        """Cambia el id conservando los datos (tras iniciar sesión, contra la fijación de sesión)."""
+        self.accessed = True
+        self._data = dict(self.data)
+        if self.sid and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.new = True
+        self.modified = True
+
+    def serialized(self) -> str:
+        return serializer.dumps(self.data)
+
+    def changed(self) -> bool:
+        """Compara con lo leído: detecta también listas o dicts modificados en el sitio."""
+        if self._data is None:
+            return False
+        return self.modified or self.serialized() != (self._raw or serializer.dumps({}))
+
+
+class MemorySessionStore:
+    """Sesiones en memoria del proceso (LRU con caducidad). Solo para un único worker."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def load(self, sid: str):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            raw, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[sid]
+                return None
+            self.entries.move_to_end(sid)
+            return raw
+
+    def save(self, sid: str, raw: str, ttl: int):
+        with self.lock:
+            self.entries[sid] = (raw, time.time() + ttl)
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, sid: str):
+        with self.lock:
+            self.entries.pop(sid, None)
+
+
+class RedisSessionStore:
+    """Sesiones en Redis, compartidas entre workers y réplicas del frontend."""
+
+    def __init__(self, url: str, prefix: str = "frontend:sesion:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def load(self, sid: str):
+        return self.client.get(self.prefix + sid)
+
+    def save(self, sid: str, raw: str, ttl: int):
+        self.client.set(self.prefix + sid, raw, ex=ttl)
+
+    def delete(self, sid: str):
+        self.client.delete(self.prefix + sid)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Guarda la sesión en un almacén del servidor y solo el id en la cookie.
+
+    Solo se escribe cuando el contenido ha cambiado. Una sesión que solo se
+    lee se reescribe (renovando su caducidad) cuando ha consumido la mitad de
+    su vida, en lugar de en cada petición.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        return ServerSideSession(self.store, sid or None)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+        if not session.accessed:
+            return
+        if not session.data:
+            if session.sid and not session.new:
+                self.store.delete(session.sid)
+            if session.modified or session.previous_sid:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = int(time.time())
+        if not session.changed() and session.data.get(RENEWED_KEY, 0) + ttl // 2 > now:
+            return
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.data[RENEWED_KEY] = now
+        self.store.save(session.sid, session.serialized(), ttl)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def build_session_interface(redis_url: str = None) -> ServerSideSessionInterface:
+    return ServerSideSessionInterface(RedisSessionStore(redis_url) if redis_url else MemorySessionStore())
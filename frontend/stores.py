@@ -0,0 +1,130 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+from operator import itemgetter
+
+
+class IndexedStore:
+    """Almacén en memoria para publicaciones o eventos.
+
+    Guarda los elementos en orden de llegada (append O(1)) y mantiene un
+    índice por id y otro por dueño. Al iterar se recorren del más nuevo al más
+    antiguo, el mismo orden que tenía la antigua lista con insert(0, ...).
+
+    Las escrituras deben hacerse con el lock del llamador; las lecturas no
+    necesitan lock porque solo se añaden elementos al final. Los ids deben
+    añadirse en orden creciente (los asigna una secuencia bajo ese lock).
+    """
+
+    def __init__(self):
+        self._items = []
+        self._by_id = {}
+        self._by_owner = defaultdict(list)
+
+    def add(self, item: dict):
+        self._items.append(item)
+        self._by_id[item["id"]] = item
+        self._by_owner[item.get("owner")].append(item)
+        return item
+
+    def get(self, item_id):
+        return self._by_id.get(item_id)
+
+    def iter_before(self, item_id=None):
+        """Itera del más nuevo al más antiguo empezando justo antes de `item_id`.
+
+        Sirve para paginar por cursor: solo se recorren los elementos que se
+        consumen del iterador.
+        """
+        end = len(self._items)
+        if item_id is not None:
+            end = bisect_left(self._items, item_id, key=itemgetter("id"))
+        return (self._items[index] for index in range(end - 1, -1, -1))
+
+    def owned_by(self, owner) -> list:
+        """Elementos de un dueño, del más nuevo al más antiguo."""
+        return list(reversed(self._by_owner.get(owner, ())))
+
+    def iter_owned_by(self, owner, item_id=None):
+        """Como iter_before, pero solo con los elementos de `owner`."""
+        items = self._by_owner.get(owner, ())
+        end = len(items)
+        if item_id is not None:
+            end = bisect_left(items, item_id, key=itemgetter("id"))
+        return (items[index] for index in range(end - 1, -1, -1))
+
+    def count_owned_by(self, owner) -> int:
+        return len(self._by_owner.get(owner, ()))
+
+    def __iter__(self):
+        return reversed(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DatedStore(IndexedStore):
+    """IndexedStore que además mantiene los elementos ordenados por fecha.
+
+    La fecha se lee de `date_key` (un objeto date ya parseado). Los elementos
+    sin fecha quedan aparte. Las consultas por rango usan bisección, así que
+    separar próximos y pasados no recorre toda la colección.
+
+    Una inserción ordenada desplaza elementos, así que la lista por fecha no
+    se modifica nunca en sitio: add() inserta en una copia y la sustituye
+    (bajo el lock del llamador). Cada lectura toma la lista una sola vez y
+    trabaja sobre esa versión, sin lock; las altas posteriores no le afectan.
+    """
+
+    def __init__(self, date_key: str = "fecha_date"):
+        super().__init__()
+        self._date_key = date_key
+        # Tuplas (fecha, id, elemento): el id desempata y evita comparar dicts.
+        # Una sola lista para que un lector nunca vea índices desalineados.
+        self._by_date = []
+        self._undated = []
+
+    def add(self, item: dict):
+        super().add(item)
+        value = item.get(self._date_key)
+        if value is None:
+            self._undated.append(item)
+        else:
+            by_date = list(self._by_date)
+            insort(by_date, (value, item["id"], item))
+            self._by_date = by_date
+        return item
+
+    @staticmethod
+    def _split(entries: list, value) -> int:
+        return bisect_left(entries, (value,))
+
+    def iter_on_or_after(self, value, after=None):
+        """Itera los elementos con fecha >= `value`, del más cercano al más lejano.
+
+        `after` es la pareja (fecha, id) del último elemento ya mostrado: la
+        iteración sigue justo después, para paginar por cursor.
+        """
+        entries = self._by_date
+        start = self._split(entries, value)
+        if after is not None:
+            # (fecha, id + 1) queda justo detrás de la entrada (fecha, id, elemento).
+            start = max(start, bisect_left(entries, (after[0], after[1] + 1)))
+        return (entries[index][2] for index in range(start, len(entries)))
+
+    def iter_before_date(self, value, before=None):
+        """Itera los elementos con fecha < `value`, del más reciente al más antiguo.
+
+        `before` es la pareja (fecha, id) del último elemento ya mostrado.
+        """
+        entries = self._by_date
+        end = self._split(entries, value)
+        if before is not None:
+            end = min(end, bisect_left(entries, tuple(before)))
+        return (entries[index][2] for index in range(end - 1, -1, -1))
+
+    def count_on_or_after(self, value) -> int:
+        entries = self._by_date
+        return len(entries) - self._split(entries, value)
+
+    def count_before(self, value) -> int:
+        return self._split(self._by_date, value)
@@ -0,0 +1,43 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import os
+
+from models import Base
+
+# Obtiene la URL de la base de datos de las variables de entorno.
+# Si no está definida se construye con las variables DB_* de docker-compose.yml.
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"postgresql://{os.getenv('DB_USER', 'deportistas_user')}:{os.getenv('DB_PASSWORD', 'deportistas_pass')}"
+    f"@{os.getenv('DB_HOST', 'db')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'deportistas_db')}"
+)
+
+# La ingesta vuelca lotes con COPY, que en asyncpg está disponible sin bloquear el event loop.
+# Cualquier URL de PostgreSQL (postgres://, postgresql+psycopg2://...) se pasa a ese driver.
+_url = make_url(DATABASE_URL)
+if _url.drivername.split("+")[0] in ("postgres", "postgresql"):
+    DATABASE_URL = _url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+# Pool de conexiones. La ingesta usa una sola conexión por volcado; el resto
+# queda para las consultas.
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "5"))
+SQL_MAX_OVERFLOW = int(os.getenv("SQL_MAX_OVERFLOW", "10"))
+
+engine_options = {"pool_pre_ping": True}
+if DATABASE_URL.startswith("postgresql"):
+    engine_options.update(pool_size=SQL_POOL_SIZE, max_overflow=SQL_MAX_OVERFLOW)
+
+# Crea el motor asíncrono de la base de datos.
+engine = create_async_engine(DATABASE_URL, **engine_options)
+
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def create_db_and_tables():
+    """Crea todas las tablas definidas en models.py si no existen."""
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
@@ -0,0 +1,66 @@
+"""Exporta las sesiones de entrenamiento a formato columnar y las analiza.
+
+`export` vuelca la tabla sesiones_entrenamiento a un directorio con una
+array .npy por columna. `stats` abre esa exportación con memory-mapping y
+calcula el resumen por deporte y, opcionalmente, las estadísticas de un
+atleta, sin cargar las columnas completas en memoria ni tocar la base de
+datos; sirve para recorridos históricos grandes.
+
+Uso:
+    python export_training.py export /datos/entrenamientos
+    python export_training.py stats /datos/entrenamientos --usuario ana
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+
+import training
+from database_sql import DATABASE_URL
+from models import SesionEntrenamiento
+
+# Filas que se leen de la base de datos por tramo.
+CHUNK_ROWS = 100_000
+
+
+def export(directory: str):
+    engine = create_engine(DATABASE_URL.replace("+asyncpg", "").replace("+aiosqlite", ""))
+    store = training.TrainingStore()
+    query = select(SesionEntrenamiento.usuario, SesionEntrenamiento.deporte,
+                   SesionEntrenamiento.duracion_segundos, SesionEntrenamiento.fecha).order_by(SesionEntrenamiento.id)
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(query)
+        for rows in result.partitions():
+            store.extend(rows)
+    training.export_columnar(store, directory)
+    print(f"{len(store):,} sesiones exportadas a {directory} en {time.perf_counter() - started:.1f} s")
+
+
+def stats(directory: str, usuario=None):
+    started = time.perf_counter()
+    store = training.load_columnar(directory, mmap=True)
+    result = {"deportes": training.sport_stats(store)}
+    if usuario:
+        today = training.day_number(datetime.utcnow())
+        result["atleta"] = training.athlete_stats(store, usuario, today)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"{len(store):,} sesiones analizadas en {time.perf_counter() - started:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("export", "stats"))
+    parser.add_argument("directory")
+    parser.add_argument("--usuario")
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.directory)
+    else:
+        stats(args.directory, args.usuario)
+
+
+if __name__ == "__main__":
+    main()
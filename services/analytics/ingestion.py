@@ -0,0 +1,172 @@
+from sqlalchemy import insert
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import time
+
+import rollups
+from models import EVENT_COLUMNS, EventoAnalitica
+
+logger = logging.getLogger("analytics.ingestion")
+
+# Eventos que caben en memoria a la espera de volcarse. Con el buffer lleno la
+# ingesta responde 429 en lugar de crecer sin límite.
+INGEST_BUFFER_SIZE = int(os.getenv("INGEST_BUFFER_SIZE", "100000"))
+
+# Se vuelca en cuanto hay INGEST_BATCH_SIZE eventos o cada INGEST_FLUSH_INTERVAL
+# segundos, lo que ocurra antes.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "1.0"))
+
+# Cada cuántos segundos se borran los rollups caducados (ver rollups.RETENTION).
+ROLLUP_PURGE_INTERVAL = float(os.getenv("ROLLUP_PURGE_INTERVAL", "300"))
+
+
+class RingBuffer:
+    """Cola circular de capacidad fija.
+
+    A diferencia de un deque con maxlen no sobrescribe los elementos más
+    antiguos: si no hay sitio para todo el lote, no se añade nada.
+    """
+
+    __slots__ = ("_slots", "_capacity", "_head", "_size")
+
+    def __init__(self, capacity: int):
+        self._slots = [None] * capacity
+        self._capacity = capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def free(self) -> int:
+        return self._capacity - self._size
+
+    def push_many(self, items) -> bool:
+        if len(items) > self.free():
+            return False
+        tail = (self._head + self._size) % self._capacity
+        for item in items:
+            self._slots[tail] = item
+            tail += 1
+            if tail == self._capacity:
+                tail = 0
+        self._size += len(items)
+        return True
+
+    def pop_many(self, max_items: int) -> list:
+        count = min(max_items, self._size)
+        items = []
+        for _ in range(count):
+            items.append(self._slots[self._head])
+            self._slots[self._head] = None
+            self._head += 1
+            if self._head == self._capacity:
+                self._head = 0
+        self._size -= count
+        return items
+
+
+class Ingestor:
+    """Acumula eventos en un RingBuffer y los escribe en lotes.
+
+    Todo ocurre en el event loop del servicio, así que el buffer no necesita
+    locks. En PostgreSQL cada lote se escribe con COPY; en otros motores con un
+    INSERT de varias filas. Los rollups se actualizan en la misma transacción,
+    así nunca cuentan eventos que no llegaron a guardarse.
+    """
+
+    def __init__(self, session_factory, capacity: int = INGEST_BUFFER_SIZE,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.buffer = RingBuffer(capacity)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._last_purge = time.monotonic()
+        self.stats = {
+            "accepted": 0, "rejected": 0, "written": 0, "batches": 0, "dropped": 0, "errors": 0, "purged": 0,
+        }
+
+    def offer(self, rows: list) -> bool:
+        """Encola las filas; devuelve False (sin encolar ninguna) si no caben."""
+        if not self.buffer.push_many(rows):
+            self.stats["rejected"] += len(rows)
+            return False
+        self.stats["accepted"] += len(rows)
+        if len(self.buffer) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def run(self):
+        """Tarea de fondo que vuelca el buffer por tamaño o por tiempo.
+
+        Cada ROLLUP_PURGE_INTERVAL segundos borra además los rollups caducados.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_purge >= ROLLUP_PURGE_INTERVAL:
+                    await self.purge()
+            except Exception:
+                logger.exception("Error al volcar eventos de analítica")
+                # Espera un intervalo antes de reintentar para no saturar la base de datos.
+                await asyncio.sleep(self.flush_interval)
+
+    async def purge(self):
+        """Borra los periodos de minuto y hora que ya pasaron su retención."""
+        self._last_purge = time.monotonic()
+        async with self.session_factory() as session:
+            connection = await session.connection()
+            self.stats["purged"] += await rollups.purge_expired(connection, datetime.utcnow())
+            await session.commit()
+
+    async def flush(self):
+        """Vuelca todo lo acumulado en lotes de `batch_size`."""
+        async with self._flush_lock:
+            while len(self.buffer):
+                rows = self.buffer.pop_many(self.batch_size)
+                try:
+                    await self._write(rows)
+                except Exception:
+                    self.stats["errors"] += 1
+                    # Se devuelven al buffer si caben; si no, se pierden y se cuentan.
+                    if not self.buffer.push_many(rows):
+                        self.stats["dropped"] += len(rows)
+                    raise
+                self.stats["written"] += len(rows)
+                self.stats["batches"] += 1
+
+    async def _write(self, rows: list):
+        async with self.session_factory() as session:
+            connection = await session.connection()
+            if connection.dialect.name == "postgresql":
+                # El adaptador de asyncpg abre la transacción con la primera
+                # sentencia que envía SQLAlchemy; sin esta, el COPY iría fuera
+                # de ella y quedaría confirmado aunque fallen los rollups.
+                await connection.exec_driver_sql("SELECT 1")
+                raw = await connection.get_raw_connection()
+                records = [row[:4] + (json.dumps(row[4]) if row[4] is not None else None,) + row[5:] for row in rows]
+                await raw.driver_connection.copy_records_to_table(
+                    EventoAnalitica.__tablename__, records=records, columns=EVENT_COLUMNS,
+                )
+            else:
+                await connection.execute(insert(EventoAnalitica), [dict(zip(EVENT_COLUMNS, row)) for row in rows])
+            await rollups.apply_batch(connection, rows)
+            await session.commit()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "buffered": len(self.buffer), "capacity": self.buffer.capacity}
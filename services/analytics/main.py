@@ -1,11 +1,69 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import asyncio
 import os
 
-app = FastAPI(title="Analytics Service")
+import rollups
+import training
+from database_sql import SessionLocal, create_db_and_tables, engine, get_db
+from ingestion import Ingestor
+from models import EventoIngesta, SesionCreate, SesionEntrenamiento, to_utc_naive
+
+# Líneas máximas de un lote NDJSON.
+INGEST_MAX_BATCH_LINES = int(os.getenv("INGEST_MAX_BATCH_LINES", "10000"))
+
+ingestor = Ingestor(SessionLocal)
+
+# Sesiones de entrenamiento en columnas de NumPy. Se cargan al arrancar y se
+# amplían con cada POST /entrenamientos (el servicio corre en un solo worker).
+training_store = training.TrainingStore()
+
+
+async def load_training_sessions():
+    global training_store
+    training_store = training.TrainingStore()
+    async with SessionLocal() as db:
+        result = await db.stream(
+            select(SesionEntrenamiento.usuario, SesionEntrenamiento.deporte,
+                   SesionEntrenamiento.duracion_segundos, SesionEntrenamiento.fecha)
+            .order_by(SesionEntrenamiento.id)
+        )
+        async for rows in result.partitions(10_000):
+            training_store.extend(rows)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await create_db_and_tables()
+    await load_training_sessions()
+    flusher = asyncio.create_task(ingestor.run())
+    yield
+    flusher.cancel()
+    # Último volcado para no perder los eventos que quedan en el buffer.
+    await ingestor.flush()
+    await engine.dispose()
+
+
+app = FastAPI(title="Analytics Service", lifespan=lifespan)
 
 router = APIRouter()
 
 
+def enqueue(rows: list):
+    if not ingestor.offer(rows):
+        raise HTTPException(
+            status_code=429,
+            detail="Buffer de ingesta lleno, reintenta más tarde",
+            headers={"Retry-After": str(max(int(ingestor.flush_interval), 1))},
+        )
+
+
 @app.get("/")
 def read_root():
     return {"message": "Servicio de Analytics en funcionamiento."}
@@ -14,24 +72,124 @@ def read_root():
 @app.get("/health")
 def health_check():
     """Endpoint de salud para verificar el estado del servicio."""
-    return {"status": "ok", "service": "analytics"}
+    return {"status": "ok", "service": "analytics", "ingesta": ingestor.snapshot()}
+
+
+@router.post("/eventos", status_code=202)
+async def ingest_evento(evento: EventoIngesta):
+    """Registra un evento de actividad. Se escribe en la base de datos por lotes."""
+    enqueue([evento.to_row(datetime.utcnow())])
+    return {"message": "Evento aceptado", "data": {"aceptados": 1}}
+
+
+@router.post("/eventos/lote", status_code=202)
+async def ingest_lote(request: Request):
+    """Registra un lote de eventos en formato NDJSON (un objeto JSON por línea).
+
+    El lote se acepta o se rechaza completo: si alguna línea no es válida se
+    responde 422 y si no cabe en el buffer 429.
+    """
+    body = await request.body()
+    lines = [line for line in body.splitlines() if line.strip()]
+    if len(lines) > INGEST_MAX_BATCH_LINES:
+        raise HTTPException(status_code=413, detail=f"Máximo {INGEST_MAX_BATCH_LINES} eventos por lote")
+
+    recibido = datetime.utcnow()
+    rows = []
+    for number, line in enumerate(lines, start=1):
+        try:
+            rows.append(EventoIngesta.model_validate_json(line).to_row(recibido))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Línea {number} inválida: {e.errors(include_url=False)}")
+    enqueue(rows)
+    return {"message": "Lote aceptado", "data": {"aceptados": len(rows)}}
 
 
 @router.get("/metricas")
-async def get_metricas():
-    """Retorna eventos registrados por los clientes (sin datos de ejemplo)."""
-    return {"data": [], "message": "Eventos registrados"}
+async def get_metricas(
+    granularidad: str = Query("hora", pattern="^(minuto|hora|dia)$"),
+    dimension: str = Query("total", pattern="^(total|deporte|usuario)$"),
+    clave: str = "",
+    tipo: Optional[str] = None,
+    limit: int = Query(24, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Serie de eventos por periodo leída de los rollups.
+
+    `dimension` + `clave` eligen la serie (por ejemplo deporte=Running o
+    usuario=ana); `tipo` filtra por tipo de evento. Los minutos y las horas
+    solo se conservan durante su periodo de retención (rollups.RETENTION).
+    """
+    if dimension != "total" and not clave:
+        raise HTTPException(status_code=400, detail="La dimensión requiere una clave")
+    if (granularidad, dimension) in rollups.SKIPPED_SERIES:
+        raise HTTPException(status_code=400, detail=f"No hay serie por {dimension} con granularidad {granularidad}")
+    data = await rollups.series(db, granularidad, dimension, clave if dimension != "total" else "", tipo, limit)
+    return {
+        "data": {"granularidad": granularidad, "dimension": dimension, "clave": clave, "series": data},
+        "message": "Métricas de eventos",
+    }
 
 
 @router.get("/reportes")
-async def get_reportes():
-    """Resumen agregado (vacío por defecto)."""
-    return {"data": {"total_eventos": 0, "proximos": 0}, "message": "Resumen de eventos"}
+async def get_reportes(db: AsyncSession = Depends(get_db)):
+    """Resumen agregado leído de los rollups (no recorre la tabla de eventos)."""
+    now = datetime.utcnow()
+    por_tipo = await rollups.total_events(db)
+    data = {
+        "total_eventos": sum(por_tipo.values()),
+        "proximos": await rollups.upcoming_events(db, now.date()),
+        "eventos_hoy": await rollups.events_in_period(db, "dia", rollups.truncate(now, "dia")),
+        "eventos_esta_hora": await rollups.events_in_period(db, "hora", rollups.truncate(now, "hora")),
+        "por_tipo": por_tipo,
+    }
+    return {"data": data, "message": "Resumen de eventos"}
+
+
+@router.post("/entrenamientos", status_code=201)
+async def registrar_entrenamiento(sesion: SesionCreate, db: AsyncSession = Depends(get_db)):
+    """Registra una sesión de entrenamiento con sus campos tipados."""
+    fila = SesionEntrenamiento(
+        usuario=sesion.usuario,
+        deporte=sesion.deporte,
+        duracion_segundos=sesion.duracion_segundos,
+        sensacion=sesion.sensacion,
+        fecha=to_utc_naive(sesion.fecha) if sesion.fecha else datetime.utcnow(),
+    )
+    db.add(fila)
+    await db.commit()
+    training_store.append(fila.usuario, fila.deporte, fila.duracion_segundos, fila.fecha)
+    # También cuenta en los rollups como evento "entrenamiento" (valor en minutos).
+    # Si el buffer está lleno se omite: la sesión ya está guardada.
+    ingestor.offer([EventoIngesta(
+        tipo="entrenamiento", usuario=fila.usuario, deporte=fila.deporte,
+        valor=round(fila.duracion_segundos / 60, 2), fecha=fila.fecha,
+    ).to_row(datetime.utcnow())])
+    return {"message": "Entrenamiento registrado", "data": {"id": fila.id}}
+
+
+@router.get("/entrenamientos/atletas/{usuario}")
+async def get_estadisticas_atleta(
+    usuario: str,
+    semanas: int = Query(training.DEFAULT_WEEKS, ge=1, le=104),
+    ventana: int = Query(training.DEFAULT_WINDOW, ge=1, le=90),
+):
+    """Totales, percentiles, volumen semanal, rachas y media móvil de un atleta."""
+    today = training.day_number(datetime.utcnow())
+    data = training.athlete_stats(training_store, usuario, today, semanas, ventana)
+    return {"data": data, "message": "Estadísticas de entrenamiento"}
+
+
+@router.get("/entrenamientos/deportes")
+async def get_estadisticas_deportes():
+    """Resumen de duración de los entrenamientos por deporte."""
+    return {"data": training.sport_stats(training_store), "message": "Estadísticas por deporte"}
 
 
 @router.post("/analizar")
 async def analizar_datos(datos: dict):
-    """Analizar datos proporcionados."""
+    """Analizar datos proporcionados. Se registran como un evento de tipo "analisis"."""
+    enqueue([EventoIngesta(tipo="analisis", datos=datos).to_row(datetime.utcnow())])
     return {"message": "Análisis completado", "data": datos}
 
 
@@ -1,51 +1,122 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, JSON, String, UniqueConstraint
 from sqlalchemy.orm import declarative_base
-from datetime import datetime
+from datetime import datetime, timezone
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 # Define la base declarativa
 Base = declarative_base()
 
-# TODO: Crea tus modelos de datos aquí.
-# Cada clase de modelo representa una tabla en tu base de datos.
-# Debes renombrar YourModel por el nombre de la Clase según el servicio
-class YourModel(Base):
+
+class EventoAnalitica(Base):
+    """Evento de actividad recibido por el endpoint de ingesta.
+
+    Es una tabla de solo inserción: los eventos se escriben por lotes desde el
+    buffer de ingesta (ver ingestion.py) y nunca se actualizan.
     """
-    Plantilla de modelo de datos para un recurso.
-    Ajusta esta clase según los requisitos de tu tema.
+    __tablename__ = "eventos_analitica"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    tipo = Column(String(50), nullable=False)
+    usuario = Column(String(150))
+    deporte = Column(String(100))
+    valor = Column(Float)
+    datos = Column(JSON)
+    fecha = Column(DateTime, nullable=False)
+    recibido = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_eventos_analitica_fecha", "fecha"),
+    )
+
+    def __repr__(self):
+        return f"<EventoAnalitica(id={self.id}, tipo='{self.tipo}')>"
+
+
+class Rollup(Base):
+    """Agregado precalculado de eventos por periodo y dimensión.
+
+    Se actualiza de forma incremental con cada lote que escribe la ingesta
+    (ver rollups.py), así los reportes leen unas pocas filas en lugar de
+    recorrer la tabla de eventos.
     """
-    __tablename__ = "[nombre_de_tu_tabla]"
+    __tablename__ = "rollups_eventos"
 
-    # Columnas de la tabla
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    granularidad = Column(String(10), nullable=False)
+    dimension = Column(String(20), nullable=False)
+    clave = Column(String(150), nullable=False, default="")
+    periodo = Column(DateTime, nullable=False)
+    tipo = Column(String(50), nullable=False)
+    eventos = Column(BigInteger, nullable=False, default=0)
+    valor_total = Column(Float, nullable=False, default=0.0)
 
-    # TODO: Agrega más columnas según sea necesario.
-    # Por ejemplo:
-    # is_active = Column(Boolean, default=True)
-    # foreign_key_id = Column(Integer, ForeignKey("otra_tabla.id"))
+    # La restricción única es la clave del upsert y también el índice de las
+    # consultas: granularidad + dimensión + clave fijas y rango de periodos.
+    __table_args__ = (
+        UniqueConstraint("granularidad", "dimension", "clave", "periodo", "tipo", name="uq_rollups_eventos"),
+        # Para borrar los periodos caducados (ver rollups.RETENTION).
+        Index("ix_rollups_eventos_granularidad_periodo", "granularidad", "periodo"),
+    )
 
     def __repr__(self):
-        return f"<YourModel(id={self.id}, name='{self.name}')>"
+        return f"<Rollup({self.granularidad}, {self.dimension}={self.clave!r}, {self.periodo}, {self.tipo})>"
+
+
+class SesionEntrenamiento(Base):
+    """Sesión registrada con el temporizador de entrenamientos del frontend.
+
+    Se guarda con columnas tipadas (no como el texto de la publicación) para
+    poder calcular estadísticas; en memoria se mantiene en formato columnar
+    (ver training.py).
+    """
+    __tablename__ = "sesiones_entrenamiento"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    usuario = Column(String(150), nullable=False)
+    deporte = Column(String(100), nullable=False)
+    duracion_segundos = Column(Integer, nullable=False)
+    sensacion = Column(String(200))
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_sesiones_entrenamiento_usuario_fecha", "usuario", "fecha"),
+    )
+
+    def __repr__(self):
+        return f"<SesionEntrenamiento(id={self.id}, usuario='{self.usuario}', deporte='{self.deporte}')>"
+
+
+# Orden de las columnas en los lotes que se vuelcan a la base de datos.
+EVENT_COLUMNS = ("tipo", "usuario", "deporte", "valor", "datos", "fecha", "recibido")
+
+
+def to_utc_naive(fecha: datetime) -> datetime:
+    # Las columnas son TIMESTAMP sin zona: todo se guarda en UTC.
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+# Modelos Pydantic para validar la entrada de los endpoints.
 
-# TODO: Define los modelos Pydantic para la validación de datos.
-# Estos modelos se usarán en los endpoints de FastAPI para validar la entrada y salida.
+class EventoIngesta(BaseModel):
+    tipo: str
+    usuario: Optional[str] = None
+    deporte: Optional[str] = None
+    valor: Optional[float] = None
+    datos: Optional[dict] = None
+    fecha: Optional[datetime] = None
 
-class YourModelBase(BaseModel):
-    name: str
-    description: Optional[str] = None
-    # TODO: Agrega los campos que se necesitan para crear o actualizar un recurso.
+    def to_row(self, recibido: datetime) -> tuple:
+        fecha = to_utc_naive(self.fecha) if self.fecha else recibido
+        return (self.tipo, self.usuario, self.deporte, self.valor, self.datos, fecha, recibido)
 
-class YourModelCreate(YourModelBase):
-    pass
 
-class YourModelRead(YourModelBase):
-    id: int
-    created_at: datetime
-    
-    class Config:
-        orm_mode = True # Habilita la compatibilidad con ORM
+class SesionCreate(BaseModel):
+    usuario: str
+    deporte: str = "Entrenamiento"
+    duracion_segundos: int = Field(gt=0)
+    sensacion: Optional[str] = None
+    fecha: Optional[datetime] = None
@@ -0,0 +1,105 @@
+"""Reconstruye los rollups de analytics a partir de la tabla de eventos.
+
+Borra los rollups y reprocesa el histórico por días en paralelo: cada worker
+lee los eventos de un rango de días en streaming, los agrega en memoria por
+tramos y los suma a los rollups con el mismo upsert que usa la ingesta, de
+modo que los periodos que comparten varios workers ("total" y la agenda) se
+acumulan correctamente.
+
+Al terminar borra los periodos de minuto y hora que ya superan su retención
+(rollups.RETENTION), igual que hace la ingesta periódicamente.
+
+Conviene ejecutarlo con la ingesta detenida: los lotes que se escriban
+mientras tanto se sumarían a unos rollups a medio reconstruir.
+
+Uso:
+    python rebuild_rollups.py --workers 4 --days-per-task 7
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, func, select
+
+import rollups
+from database_sql import DATABASE_URL
+from models import Base, EventoAnalitica, Rollup
+
+# Eventos que un worker agrega antes de escribir, para acotar la memoria.
+CHUNK_ROWS = 50_000
+
+# Los workers usan drivers síncronos: cada proceso tiene su propio motor.
+SYNC_DATABASE_URL = DATABASE_URL.replace("+asyncpg", "").replace("+aiosqlite", "")
+
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(SYNC_DATABASE_URL)
+    return _engine
+
+
+def rebuild_range(bounds) -> int:
+    """Agrega los eventos con fecha en [inicio, fin) y los suma a los rollups."""
+    start, end = bounds
+    engine = get_engine()
+    statement = rollups.upsert_statement(engine.dialect.name)
+    columns = [getattr(EventoAnalitica, name) for name in ("tipo", "usuario", "deporte", "valor", "datos", "fecha")]
+    query = select(*columns).where(EventoAnalitica.fecha >= start, EventoAnalitica.fecha < end)
+
+    processed = 0
+    with engine.connect() as reader:
+        result = reader.execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(query)
+        for rows in result.partitions():
+            deltas = rollups.aggregate(rows)
+            with engine.begin() as writer:
+                writer.execute(statement, rollups.upsert_params(deltas))
+            processed += len(rows)
+    return processed
+
+
+def day_ranges(first: datetime, last: datetime, days_per_task: int) -> list:
+    start = rollups.truncate(first, "dia")
+    ranges = []
+    while start <= last:
+        end = start + timedelta(days=days_per_task)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--days-per-task", type=int, default=1, help="Días de eventos que procesa cada tarea")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        first, last = connection.execute(select(func.min(EventoAnalitica.fecha), func.max(EventoAnalitica.fecha))).one()
+        connection.execute(delete(Rollup))
+    if first is None:
+        print("No hay eventos que procesar.")
+        return
+    engine.dispose()  # Los procesos hijos abren sus propias conexiones.
+
+    ranges = day_ranges(first, last, args.days_per_task)
+    print(f"Reconstruyendo rollups de {first:%Y-%m-%d} a {last:%Y-%m-%d} en {len(ranges)} tareas con {args.workers} workers")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        total = sum(executor.map(rebuild_range, ranges))
+    elapsed = time.perf_counter() - started
+    print(f"{total:,} eventos procesados en {elapsed:.1f} s ({total / elapsed if elapsed else 0:,.0f} eventos/s)")
+
+    # Los minutos y horas del histórico que ya pasaron su retención no se conservan.
+    with get_engine().begin() as connection:
+        purged = sum(connection.execute(statement).rowcount or 0 for statement in rollups.purge_statements(datetime.utcnow()))
+    print(f"{purged:,} filas de rollup caducadas eliminadas")
+
+
+if __name__ == "__main__":
+    main()
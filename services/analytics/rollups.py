@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import os
+
+from sqlalchemy import delete, func, select
+
+from models import Rollup
+
+# Granularidades de los rollups. "total" es un único periodo con el acumulado
+# histórico, para que el total de eventos sea la lectura de una fila.
+GRANULARITIES = ("minuto", "hora", "dia", "total")
+TOTAL_PERIOD = datetime(1970, 1, 1)
+
+# Dimensiones: el total global, por deporte, por usuario y la "agenda", que
+# cuenta los eventos deportivos creados desde /analizar por el día en que se
+# celebran (sirve para saber cuántos quedan por delante).
+DIMENSIONS = ("total", "deporte", "usuario", "agenda")
+
+KEY_COLUMNS = ("granularidad", "dimension", "clave", "periodo", "tipo")
+
+# Series que no se guardan: por usuario y minuto habría casi una fila por evento.
+SKIPPED_SERIES = {("minuto", "usuario")}
+
+# Cuánto se conservan los periodos de las granularidades finas; los días y el
+# total se guardan siempre. purge_statements() borra lo que haya caducado.
+RETENTION = {
+    "minuto": timedelta(hours=float(os.getenv("ROLLUP_MINUTE_RETENTION_HOURS", "48"))),
+    "hora": timedelta(days=float(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "90"))),
+}
+
+# Días hacia delante que cuenta "proximos" en /reportes: la consulta lee como
+# mucho una fila de la agenda por día de este horizonte.
+AGENDA_HORIZON_DAYS = int(os.getenv("ROLLUP_AGENDA_HORIZON_DAYS", "365"))
+
+
+def truncate(fecha: datetime, granularidad: str) -> datetime:
+    if granularidad == "minuto":
+        return fecha.replace(second=0, microsecond=0)
+    if granularidad == "hora":
+        return fecha.replace(minute=0, second=0, microsecond=0)
+    if granularidad == "dia":
+        return fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+    return TOTAL_PERIOD
+
+
+def agenda_date(datos):
+    """Día de celebración de un evento deportivo, si el payload lo incluye."""
+    if not isinstance(datos, dict) or not datos.get("fecha"):
+        return None
+    try:
+        return datetime.combine(date.fromisoformat(str(datos["fecha"])[:10]), datetime.min.time())
+    except ValueError:
+        return None
+
+
+def aggregate(rows, deltas=None) -> dict:
+    """Agrega filas (tipo, usuario, deporte, valor, datos, fecha, ...) en deltas de rollup.
+
+    Devuelve un dict clave -> [eventos, valor_total], con la clave en el orden
+    de KEY_COLUMNS. Si se pasa `deltas` se acumula sobre él.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0.0])
+    for tipo, usuario, deporte, valor, datos, fecha, *_ in rows:
+        valor = valor or 0.0
+        for granularidad in GRANULARITIES:
+            periodo = truncate(fecha, granularidad)
+            for dimension, clave in (("total", ""), ("deporte", deporte), ("usuario", usuario)):
+                if clave is None or (granularidad, dimension) in SKIPPED_SERIES:
+                    continue
+                delta = deltas[(granularidad, dimension, clave, periodo, tipo)]
+                delta[0] += 1
+                delta[1] += valor
+        if tipo == "analisis":
+            celebracion = agenda_date(datos)
+            if celebracion is not None:
+                deltas[("dia", "agenda", "", celebracion, tipo)][0] += 1
+    return deltas
+
+
+def upsert_statement(dialect_name: str):
+    """INSERT ... ON CONFLICT que suma los deltas a las filas existentes."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(Rollup.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={
+            "eventos": Rollup.__table__.c.eventos + statement.excluded.eventos,
+            "valor_total": Rollup.__table__.c.valor_total + statement.excluded.valor_total,
+        },
+    )
+
+
+def upsert_params(deltas: dict) -> list:
+    # Claves ordenadas: dos escritores concurrentes bloquean las filas en el
+    # mismo orden y no pueden entrar en deadlock.
+    return [
+        {**dict(zip(KEY_COLUMNS, key)), "eventos": value[0], "valor_total": value[1]}
+        for key, value in sorted(deltas.items())
+    ]
+
+
+async def apply_batch(connection, rows):
+    """Actualiza los rollups con un lote recién escrito, en la misma transacción."""
+    deltas = aggregate(rows)
+    if deltas:
+        await connection.execute(upsert_statement(connection.dialect.name), upsert_params(deltas))
+
+
+def purge_statements(now: datetime) -> list:
+    """DELETE de los periodos caducados de cada granularidad con retención."""
+    return [
+        delete(Rollup).where(Rollup.granularidad == granularidad, Rollup.periodo < truncate(now - keep, granularidad))
+        for granularidad, keep in RETENTION.items()
+    ]
+
+
+async def purge_expired(connection, now: datetime) -> int:
+    """Borra los rollups caducados; devuelve cuántas filas se eliminaron."""
+    deleted = 0
+    for statement in purge_statements(now):
+        deleted += (await connection.execute(statement)).rowcount or 0
+    return deleted
+
+
+# ==================== Consultas ====================
+
+async def total_events(db) -> dict:
+    """Eventos históricos por tipo: una fila por tipo del periodo "total"."""
+    result = await db.execute(
+        select(Rollup.tipo, Rollup.eventos).where(
+            Rollup.granularidad == "total", Rollup.dimension == "total",
+            Rollup.clave == "", Rollup.periodo == TOTAL_PERIOD,
+        )
+    )
+    return dict(result.all())
+
+
+async def events_in_period(db, granularidad: str, periodo: datetime) -> int:
+    return await db.scalar(
+        select(func.coalesce(func.sum(Rollup.eventos), 0)).where(
+            Rollup.granularidad == granularidad, Rollup.dimension == "total",
+            Rollup.clave == "", Rollup.periodo == periodo,
+        )
+    )
+
+
+async def upcoming_events(db, today: date) -> int:
+    """Eventos deportivos de la agenda que se celebran en los próximos AGENDA_HORIZON_DAYS días."""
+    start = datetime.combine(today, datetime.min.time())
+    return await db.scalar(
+        select(func.coalesce(func.sum(Rollup.eventos), 0)).where(
+            Rollup.granularidad == "dia", Rollup.dimension == "agenda", Rollup.clave == "",
+            Rollup.periodo >= start, Rollup.periodo < start + timedelta(days=AGENDA_HORIZON_DAYS),
+        )
+    )
+
+
+async def series(db, granularidad: str, dimension: str, clave: str, tipo=None, limit: int = 24) -> list:
+    """Últimos `limit` periodos de una serie, en orden cronológico."""
+    eventos = func.sum(Rollup.eventos).label("eventos")
+    query = select(Rollup.periodo, eventos, func.sum(Rollup.valor_total).label("valor_total")).where(
+        Rollup.granularidad == granularidad, Rollup.dimension == dimension, Rollup.clave == clave,
+    )
+    if tipo:
+        query = query.where(Rollup.tipo == tipo)
+    query = query.group_by(Rollup.periodo).order_by(Rollup.periodo.desc()).limit(limit)
+    rows = (await db.execute(query)).all()
+    return [
+        {"periodo": periodo.isoformat(), "eventos": total, "valor_total": round(valor or 0.0, 3)}
+        for periodo, total, valor in reversed(rows)
+    ]
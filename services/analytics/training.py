@@ -0,0 +1,223 @@
+from datetime import date, datetime
+import json
+import os
+
+import numpy as np
+
+# Semanas de volumen y días de media móvil que devuelven las estadísticas por atleta.
+DEFAULT_WEEKS = 12
+DEFAULT_WINDOW = 7
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(value) -> int:
+    """Días desde 1970-01-01 (la columna `dia` guarda la fecha como entero)."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def day_to_iso(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+class Categories:
+    """Codifica textos repetidos (usuarios, deportes) como enteros consecutivos."""
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.codes = {name: code for code, name in enumerate(self.names)}
+
+    def encode(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self.codes[name] = code
+        return code
+
+    def __len__(self):
+        return len(self.names)
+
+
+class TrainingStore:
+    """Sesiones de entrenamiento en columnas tipadas, una array de NumPy por campo.
+
+    Las columnas crecen duplicando su capacidad, así añadir una sesión es O(1)
+    amortizado. Las estadísticas trabajan sobre vistas de las columnas con
+    operaciones vectorizadas, sin recorrer las sesiones en Python.
+    """
+
+    # `deporte` es texto libre: con int16 el deporte 32.768 ya no cabría.
+    DTYPES = {"usuario": np.int32, "deporte": np.int32, "duracion": np.int32, "dia": np.int32}
+
+    def __init__(self, capacity: int = 1024):
+        self.usuarios = Categories()
+        self.deportes = Categories()
+        self._arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.DTYPES.items()}
+        self._size = 0
+
+    @classmethod
+    def from_columns(cls, columns: dict, usuarios, deportes) -> "TrainingStore":
+        """Crea el almacén sobre arrays existentes (por ejemplo, memory-mapped)."""
+        store = cls(capacity=0)
+        store.usuarios = Categories(usuarios)
+        store.deportes = Categories(deportes)
+        store._arrays = dict(columns)
+        store._size = len(columns["duracion"])
+        return store
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = len(self._arrays["duracion"])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, array in self._arrays.items():
+            # Con el tipo actual: una exportación antigua (deporte en int16) se amplía aquí.
+            grown = np.empty(capacity, dtype=self.DTYPES[name])
+            grown[:self._size] = array[:self._size]
+            self._arrays[name] = grown
+
+    def append(self, usuario: str, deporte: str, duracion: int, fecha):
+        self._reserve(1)
+        index = self._size
+        self._arrays["usuario"][index] = self.usuarios.encode(usuario)
+        self._arrays["deporte"][index] = self.deportes.encode(deporte)
+        self._arrays["duracion"][index] = duracion
+        self._arrays["dia"][index] = day_number(fecha)
+        self._size += 1
+
+    def extend(self, rows):
+        """Añade filas (usuario, deporte, duracion, fecha) de una vez."""
+        rows = list(rows)
+        self._reserve(len(rows))
+        start, end = self._size, self._size + len(rows)
+        self._arrays["usuario"][start:end] = [self.usuarios.encode(row[0]) for row in rows]
+        self._arrays["deporte"][start:end] = [self.deportes.encode(row[1]) for row in rows]
+        self._arrays["duracion"][start:end] = [row[2] for row in rows]
+        self._arrays["dia"][start:end] = [day_number(row[3]) for row in rows]
+        self._size = end
+
+    def columns(self) -> dict:
+        return {name: array[:self._size] for name, array in self._arrays.items()}
+
+
+# ==================== Estadísticas ====================
+
+def duration_summary(duracion) -> dict:
+    if not len(duracion):
+        return {"sesiones": 0, "total_segundos": 0, "media_segundos": 0.0, "p50_segundos": 0.0, "p90_segundos": 0.0}
+    p50, p90 = np.percentile(duracion, [50, 90])
+    return {
+        "sesiones": int(len(duracion)),
+        "total_segundos": int(duracion.sum(dtype=np.int64)),
+        "media_segundos": round(float(duracion.mean()), 1),
+        "p50_segundos": round(float(p50), 1),
+        "p90_segundos": round(float(p90), 1),
+    }
+
+
+def weekly_volume(dia, duracion, today: int, weeks: int = DEFAULT_WEEKS) -> list:
+    """Segundos entrenados en cada una de las últimas `weeks` semanas (lunes a domingo)."""
+    # 1970-01-01 fue jueves: sumar 3 días alinea las semanas con el lunes.
+    week = (dia + 3) // 7
+    first_week = (today + 3) // 7 - weeks + 1
+    offset = week - first_week
+    mask = (offset >= 0) & (offset < weeks)
+    totals = np.bincount(offset[mask], weights=duracion[mask], minlength=weeks)
+    return [
+        {"semana": day_to_iso((first_week + index) * 7 - 3), "segundos": int(total)}
+        for index, total in enumerate(totals)
+    ]
+
+
+def streaks(dia, today: int) -> dict:
+    """Racha actual y racha máxima de días consecutivos con algún entrenamiento.
+
+    La racha actual sigue viva si el último entrenamiento fue hoy o ayer.
+    """
+    days = np.unique(dia)
+    if not len(days):
+        return {"actual": 0, "maxima": 0}
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(days) - 1]))
+    lengths = ends - starts + 1
+    current = int(lengths[-1]) if days[-1] >= today - 1 else 0
+    return {"actual": current, "maxima": int(lengths.max())}
+
+
+def moving_average(dia, duracion, today: int, days: int = 28, window: int = DEFAULT_WINDOW) -> list:
+    """Media móvil de `window` días del tiempo entrenado, para los últimos `days` días."""
+    start = today - days - window + 2
+    offset = dia - start
+    mask = (offset >= 0) & (offset < days + window - 1)
+    daily = np.bincount(offset[mask], weights=duracion[mask], minlength=days + window - 1)
+    cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+    averages = (cumulative[window:] - cumulative[:-window]) / window
+    first_day = start + window - 1
+    return [
+        {"dia": day_to_iso(first_day + index), "media_segundos": round(float(value), 1)}
+        for index, value in enumerate(averages)
+    ]
+
+
+def athlete_stats(store: TrainingStore, usuario: str, today: int,
+                  weeks: int = DEFAULT_WEEKS, window: int = DEFAULT_WINDOW) -> dict:
+    code = store.usuarios.codes.get(usuario)
+    columns = store.columns()
+    mask = columns["usuario"] == code if code is not None else np.zeros(len(store), dtype=bool)
+    dia = columns["dia"][mask]
+    duracion = columns["duracion"][mask]
+
+    deportes = columns["deporte"][mask]
+    por_deporte = np.bincount(deportes, weights=duracion, minlength=len(store.deportes))
+    return {
+        "usuario": usuario,
+        "resumen": duration_summary(duracion),
+        "por_deporte": {store.deportes.names[index]: int(por_deporte[index]) for index in np.flatnonzero(por_deporte)},
+        "volumen_semanal": weekly_volume(dia, duracion, today, weeks),
+        "rachas": streaks(dia, today),
+        "media_movil": moving_average(dia, duracion, today, window=window),
+    }
+
+
+def sport_stats(store: TrainingStore) -> dict:
+    """Resumen por deporte: se ordena una vez por (deporte, duración) y se trocea."""
+    columns = store.columns()
+    deporte, duracion = columns["deporte"], columns["duracion"]
+    if not len(deporte):
+        return {}
+    order = np.lexsort((duracion, deporte))
+    sorted_sport = deporte[order]
+    boundaries = np.flatnonzero(np.diff(sorted_sport)) + 1
+    groups = np.split(duracion[order], boundaries)
+    codes = sorted_sport[np.concatenate(([0], boundaries))]
+    return {store.deportes.names[code]: duration_summary(group) for code, group in zip(codes, groups)}
+
+
+# ==================== Formato columnar en disco ====================
+
+def export_columnar(store: TrainingStore, directory: str):
+    """Guarda cada columna como .npy y las categorías en meta.json."""
+    os.makedirs(directory, exist_ok=True)
+    for name, array in store.columns().items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as meta:
+        json.dump({"sesiones": len(store), "usuarios": store.usuarios.names, "deportes": store.deportes.names}, meta)
+
+
+def load_columnar(directory: str, mmap: bool = True) -> TrainingStore:
+    """Abre una exportación; con `mmap` las columnas se leen del disco bajo demanda."""
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as meta:
+        metadata = json.load(meta)
+    columns = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        for name in TrainingStore.DTYPES
+    }
+    return TrainingStore.from_columns(columns, metadata["usuarios"], metadata["deportes"])
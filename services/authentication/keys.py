@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from jwt.algorithms import OKPAlgorithm
+
+# Segundos que una clave firma tokens antes de rotarla por una nueva.
+KEY_ROTATION_INTERVAL = int(os.getenv("AUTH_KEY_ROTATION_INTERVAL", "86400"))
+
+# Vida de los tokens emitidos. Una clave retirada se sigue publicando este
+# tiempo para que los tokens que firmó puedan verificarse hasta que caduquen.
+TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", "3600"))
+
+# Cada cuánto releen las claves de Redis las réplicas que no rotaron.
+KEYRING_REFRESH = float(os.getenv("AUTH_KEYRING_REFRESH", "30"))
+
+ALGORITHM = "EdDSA"
+
+
+class SigningKey:
+    __slots__ = ("kid", "private_key", "created")
+
+    def __init__(self, kid: str, private_key: Ed25519PrivateKey, created: float):
+        self.kid = kid
+        self.private_key = private_key
+        self.created = created
+
+    @classmethod
+    def generate(cls) -> "SigningKey":
+        return cls(uuid.uuid4().hex[:16], Ed25519PrivateKey.generate(), time.time())
+
+    def to_json(self) -> str:
+        pem = self.private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        return json.dumps({"kid": self.kid, "pem": pem.decode("ascii"), "created": self.created})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SigningKey":
+        data = json.loads(raw)
+        return cls(data["kid"], serialization.load_pem_private_key(data["pem"].encode("ascii"), None), data["created"])
+
+    def public_jwk(self) -> dict:
+        jwk = OKPAlgorithm.to_jwk(self.private_key.public_key(), as_dict=True)
+        return {**jwk, "kid": self.kid, "alg": ALGORITHM, "use": "sig"}
+
+
+class KeyRing:
+    """Claves de firma Ed25519 con rotación periódica.
+
+    Solo la clave activa firma; las retiradas se conservan mientras puedan
+    quedar tokens vigentes firmados con ellas. Con Redis las claves se
+    comparten entre réplicas del servicio y solo una rota a la vez; sin Redis
+    viven en memoria y se regeneran al reiniciar. Ese Redis guarda las claves
+    privadas: no debe ser accesible para el gateway ni para otros servicios.
+    """
+
+    def __init__(self, redis_client=None, prefix: str = "auth:"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.keys = {}
+        self.active_kid = None
+        self.loaded_at = 0.0
+        self.lock = asyncio.Lock()
+
+    @property
+    def _keys_key(self) -> str:
+        return f"{self.prefix}claves"
+
+    @property
+    def _active_key(self) -> str:
+        return f"{self.prefix}clave_activa"
+
+    @property
+    def storage_keys(self) -> tuple:
+        """Claves de Redis en las que el llavero guarda su estado."""
+        return (self._keys_key, self._active_key, f"{self.prefix}rotando")
+
+    async def load(self):
+        if self.redis is not None:
+            await self._reload()
+        self.loaded_at = time.monotonic()
+        if self.active_kid not in self.keys:
+            await self.rotate()
+
+    async def active(self) -> SigningKey:
+        """Clave con la que firmar; rota si ha cumplido su intervalo."""
+        if self.redis is not None and time.monotonic() - self.loaded_at > KEYRING_REFRESH:
+            await self.load()
+        key = self.keys[self.active_kid]
+        if time.time() - key.created > KEY_ROTATION_INTERVAL:
+            async with self.lock:
+                if self.active_kid == key.kid:
+                    await self.rotate()
+            key = self.keys[self.active_kid]
+        return key
+
+    async def _reload(self):
+        stored = await self.redis.hgetall(self._keys_key)
+        self.keys = {kid: SigningKey.from_json(raw) for kid, raw in stored.items()}
+        self.active_kid = await self.redis.get(self._active_key)
+
+    async def rotate(self) -> SigningKey:
+        if self.redis is None:
+            key = SigningKey.generate()
+            self._activate(key)
+            return key
+
+        lock_key = f"{self.prefix}rotando"
+        # Evita que dos réplicas roten a la vez; la que pierde se queda
+        # con la clave que haya publicado la otra.
+        while not await self.redis.set(lock_key, "1", nx=True, ex=10):
+            await asyncio.sleep(0.1)
+            await self._reload()
+            if self.active_kid in self.keys:
+                return self.keys[self.active_kid]
+        try:
+            # Con el lock tomado se vuelve a leer la clave activa: si otra
+            # réplica ya rotó entre nuestra lectura y el lock, se usa la suya.
+            await self._reload()
+            key = self.keys.get(self.active_kid)
+            if key is not None and time.time() - key.created <= KEY_ROTATION_INTERVAL:
+                return key
+            key = SigningKey.generate()
+            expired = self._activate(key)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self._keys_key, key.kid, key.to_json())
+                if expired:
+                    pipe.hdel(self._keys_key, *expired)
+                pipe.set(self._active_key, key.kid)
+                await pipe.execute()
+            return key
+        finally:
+            await self.redis.delete(lock_key)
+
+    def _activate(self, key: SigningKey) -> list:
+        """Pone `key` como activa y descarta las claves caducadas; devuelve sus kids."""
+        self.keys[key.kid] = key
+        self.active_kid = key.kid
+        expired = self._expired_kids()
+        for kid in expired:
+            del self.keys[kid]
+        return expired
+
+    def _expired_kids(self) -> list:
+        # Una clave deja de firmar cuando se crea la siguiente, como muy tarde
+        # KEY_ROTATION_INTERVAL después de la suya; sus tokens duran TOKEN_TTL más.
+        limit = time.time() - KEY_ROTATION_INTERVAL - TOKEN_TTL - 60
+        return [kid for kid, key in self.keys.items() if kid != self.active_kid and key.created < limit]
+
+    def get(self, kid: str):
+        return self.keys.get(kid)
+
+    def jwks(self) -> dict:
+        """Claves públicas vigentes en formato JWKS."""
+        return {"keys": [key.public_jwk() for key in self.keys.values()]}
@@ -1,10 +1,86 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, APIRouter, Header, HTTPException
+from typing import Optional
+import hmac
 import os
 
-app = FastAPI(title="Authentication Service")
+from keys import KeyRing
+from passwords import PasswordPool, PoolSaturated
+from tokens import InvalidToken, MemoryDenylist, RedisDenylist, decode_token, issue_token
+from users import build_user_store
+
+# Con REDIS_URL la denylist se comparte entre réplicas y con el API Gateway,
+# que verifica los tokens sin llamar a este servicio.
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Las claves privadas de firma van en un Redis aparte, al que el gateway no
+# tiene acceso; el gateway solo recibe las claves públicas (GET /jwks). Sin
+# AUTH_KEYS_REDIS_URL cada réplica genera sus propias claves en memoria.
+AUTH_KEYS_REDIS_URL = os.getenv("AUTH_KEYS_REDIS_URL")
+
+# Longitud mínima de las contraseñas nuevas.
+PASSWORD_MIN_LENGTH = int(os.getenv("PASSWORD_MIN_LENGTH", "8"))
+
+# Secreto para las operaciones de administración (rotar claves). Sin él están desactivadas.
+ADMIN_TOKEN = os.getenv("AUTH_ADMIN_TOKEN")
+
+
+def build_redis_client(url: Optional[str]):
+    if not url:
+        return None
+    import redis.asyncio as redis
+
+    return redis.from_url(url, decode_responses=True)
+
+
+redis_client = build_redis_client(REDIS_URL)
+keys_redis_client = build_redis_client(AUTH_KEYS_REDIS_URL)
+keyring = KeyRing(keys_redis_client)
+denylist = RedisDenylist(redis_client) if redis_client is not None else MemoryDenylist()
+users = build_user_store(redis_client)
+password_pool = PasswordPool()
+# Hash con el que se compara la contraseña de un usuario inexistente, para que
+# la respuesta tarde lo mismo exista o no.
+dummy_hash = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global dummy_hash
+    if redis_client is not None and AUTH_KEYS_REDIS_URL != REDIS_URL:
+        # Claves privadas que versiones anteriores guardaban en el Redis compartido.
+        await redis_client.delete(*keyring.storage_keys)
+    await keyring.load()
+    password_pool.start()
+    dummy_hash = await password_pool.hash(os.urandom(16).hex())
+    yield
+    password_pool.stop()
+    for client in (redis_client, keys_redis_client):
+        if client is not None:
+            await client.aclose()
+
+
+app = FastAPI(title="Authentication Service", lifespan=lifespan)
 
 router = APIRouter()
 
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+
+async def validate(token: str) -> dict:
+    try:
+        claims = await decode_token(keyring, token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=f"Token inválido: {e}")
+    if await denylist.is_revoked(claims["jti"]):
+        raise HTTPException(status_code=401, detail="Token revocado")
+    return claims
+
 @app.get("/")
 def read_root():
     return {"message": "Servicio de Autenticación en funcionamiento."}
@@ -12,27 +88,77 @@ def read_root():
 @app.get("/health")
 def health_check():
     """Endpoint de salud para verificar el estado del servicio."""
-    return {"status": "ok", "service": "authentication"}
+    return {"status": "ok", "service": "authentication", "hashing": password_pool.snapshot()}
+
+@app.get("/.well-known/jwks.json")
+def well_known_jwks():
+    return keyring.jwks()
+
+# Endpoints de autenticación
+async def run_hashing(operation, *args):
+    try:
+        return await operation(*args)
+    except PoolSaturated:
+        raise HTTPException(status_code=503, detail="Servicio saturado, inténtalo de nuevo", headers={"Retry-After": "1"})
 
-# Endpoints de ejemplo para autenticación
 @router.post("/login")
 async def login(credentials: dict):
-    """Iniciar sesión."""
-    return {"message": "Login exitoso", "token": "example_token"}
+    """Iniciar sesión. Devuelve un token firmado con la clave activa."""
+    usuario = credentials.get("username")
+    password = credentials.get("password") or ""
+    if not usuario:
+        raise HTTPException(status_code=400, detail="Falta el nombre de usuario")
+    user = await users.get(usuario)
+    valid, new_hash = await run_hashing(password_pool.verify, user["password_hash"] if user else dummy_hash, password)
+    if not user or not valid:
+        raise HTTPException(status_code=401, detail="Credenciales inválidas")
+    if new_hash:
+        # El coste configurado ha cambiado: se guarda el hash recalculado.
+        await users.update_password_hash(usuario, new_hash)
+    return {"message": "Login exitoso", **await issue_token(keyring, usuario)}
 
 @router.post("/register")
 async def register(user_data: dict):
     """Registrar un nuevo usuario."""
-    return {"message": "Usuario registrado exitosamente", "data": user_data}
+    usuario = user_data.get("username")
+    password = user_data.get("password") or ""
+    if not usuario:
+        raise HTTPException(status_code=400, detail="Falta el nombre de usuario")
+    if len(password) < PASSWORD_MIN_LENGTH:
+        raise HTTPException(status_code=400, detail=f"La contraseña debe tener al menos {PASSWORD_MIN_LENGTH} caracteres")
+    if await users.get(usuario):
+        raise HTTPException(status_code=409, detail="El usuario ya existe")
+    password_hash = await run_hashing(password_pool.hash, password)
+    if not await users.create(usuario, {"username": usuario, "email": user_data.get("email"), "password_hash": password_hash}):
+        raise HTTPException(status_code=409, detail="El usuario ya existe")
+    return {"message": "Usuario registrado exitosamente", "data": {"username": usuario, "email": user_data.get("email")}}
 
 @router.post("/logout")
-async def logout():
-    """Cerrar sesión."""
+async def logout(authorization: Optional[str] = Header(None)):
+    """Cerrar sesión. Revoca el token hasta su expiración."""
+    token = bearer_token(authorization)
+    if token:
+        claims = await validate(token)
+        await denylist.revoke(claims["jti"], claims["exp"])
     return {"message": "Logout exitoso"}
 
 @router.get("/verify")
 async def verify_token(token: str):
-    """Verificar un token."""
-    return {"message": "Token válido", "token": token}
+    """Verificar un token. El gateway los verifica por su cuenta con /jwks."""
+    claims = await validate(token)
+    return {"message": "Token válido", "data": claims}
+
+@router.get("/jwks")
+def get_jwks():
+    """Claves públicas con las que verificar los tokens."""
+    return keyring.jwks()
+
+@router.post("/claves/rotar")
+async def rotar_claves(x_admin_token: Optional[str] = Header(None)):
+    """Fuerza la rotación de la clave de firma (p. ej. si se ha filtrado)."""
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Operación no permitida")
+    key = await keyring.rotate()
+    return {"message": "Clave rotada", "data": {"kid": key.kid}}
 
 app.include_router(router)
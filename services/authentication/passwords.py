@@ -0,0 +1,108 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+# Coste de Argon2id: iteraciones, memoria en KiB y paralelismo. Al cambiarlos,
+# los hashes antiguos se recalculan en el siguiente login correcto.
+PASSWORD_TIME_COST = int(os.getenv("PASSWORD_TIME_COST", "3"))
+PASSWORD_MEMORY_COST = int(os.getenv("PASSWORD_MEMORY_COST", "65536"))
+PASSWORD_PARALLELISM = int(os.getenv("PASSWORD_PARALLELISM", "1"))
+
+# Pool donde se calculan los hashes, fuera del bucle de eventos: "process"
+# (por defecto) o "thread". Cada hash ocupa un núcleo y PASSWORD_MEMORY_COST de RAM.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# Hashes en cola o en curso como máximo; por encima se responde 503 en lugar
+# de acumular logins que tardarían segundos en atenderse.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+_hasher = None
+
+
+def get_hasher() -> PasswordHasher:
+    # Uno por proceso: en el pool de procesos cada worker crea el suyo.
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(
+            time_cost=PASSWORD_TIME_COST,
+            memory_cost=PASSWORD_MEMORY_COST,
+            parallelism=PASSWORD_PARALLELISM,
+        )
+    return _hasher
+
+
+def hash_password(password: str) -> str:
+    return get_hasher().hash(password)
+
+
+def verify_password(stored_hash: str, password: str):
+    """Devuelve (válida, hash_nuevo); hash_nuevo solo si el coste ha cambiado."""
+    hasher = get_hasher()
+    try:
+        hasher.verify(stored_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False, None
+    if hasher.check_needs_rehash(stored_hash):
+        return True, hasher.hash(password)
+    return True, None
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class PasswordPool:
+    """Calcula y verifica hashes en un pool acotado sin bloquear el bucle de eventos."""
+
+    def __init__(self, kind: str = PASSWORD_HASH_EXECUTOR, workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.kind = kind
+        self.workers = max(workers, 1)
+        self.max_pending = max_pending
+        self.executor = None
+        self.pending = 0
+        self.stats = {"hashes": 0, "verificaciones": 0, "rehashes": 0, "rechazadas_por_saturacion": 0}
+
+    def start(self):
+        executor_class = ThreadPoolExecutor if self.kind == "thread" else ProcessPoolExecutor
+        self.executor = executor_class(max_workers=self.workers)
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def _run(self, function, *args):
+        if self.pending >= self.max_pending:
+            self.stats["rechazadas_por_saturacion"] += 1
+            raise PoolSaturated()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        self.stats["hashes"] += 1
+        return await self._run(hash_password, password)
+
+    async def verify(self, stored_hash: str, password: str):
+        self.stats["verificaciones"] += 1
+        valid, new_hash = await self._run(verify_password, stored_hash, password)
+        if new_hash:
+            self.stats["rehashes"] += 1
+        return valid, new_hash
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "executor": self.kind,
+            "workers": self.workers,
+            "pendientes": self.pending,
+            "coste": {"time_cost": PASSWORD_TIME_COST, "memory_cost": PASSWORD_MEMORY_COST,
+                      "parallelism": PASSWORD_PARALLELISM},
+        }
@@ -0,0 +1,90 @@
+import os
+import time
+import uuid
+
+import jwt
+
+from keys import ALGORITHM, TOKEN_TTL, KeyRing
+
+# Emisor que se firma en los tokens; el gateway lo comprueba.
+TOKEN_ISSUER = os.getenv("AUTH_TOKEN_ISSUER", "red-social-deportistas")
+
+# Canal pub/sub por el que se avisa a los gateways de cada token revocado y
+# prefijo de las claves de la denylist (una por jti, con TTL hasta su expiración).
+REVOCATION_CHANNEL = "auth:revocaciones"
+REVOKED_PREFIX = "auth:revocados:"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+async def issue_token(keyring: KeyRing, usuario: str) -> dict:
+    key = await keyring.active()
+    now = int(time.time())
+    claims = {
+        "sub": usuario,
+        "iss": TOKEN_ISSUER,
+        "iat": now,
+        "exp": now + TOKEN_TTL,
+        "jti": uuid.uuid4().hex,
+    }
+    token = jwt.encode(claims, key.private_key, algorithm=ALGORITHM, headers={"kid": key.kid})
+    return {"token": token, "token_type": "bearer", "expires_in": TOKEN_TTL}
+
+
+async def decode_token(keyring: KeyRing, token: str) -> dict:
+    """Valida firma, emisor y expiración. Lanza InvalidToken si algo falla."""
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+    key = keyring.get(kid)
+    if key is None and keyring.redis is not None:
+        # Puede haberla creado otra réplica después de nuestra última lectura.
+        await keyring.load()
+        key = keyring.get(kid)
+    if key is None:
+        raise InvalidToken("Clave de firma desconocida")
+    try:
+        return jwt.decode(
+            token,
+            key.private_key.public_key(),
+            algorithms=[ALGORITHM],
+            issuer=TOKEN_ISSUER,
+            options={"require": ["exp", "iat", "sub", "jti"]},
+        )
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+
+
+class MemoryDenylist:
+    """Tokens revocados de este proceso, hasta que caducan."""
+
+    def __init__(self):
+        self.revoked = {}
+
+    async def revoke(self, jti: str, expires_at: float):
+        now = time.time()
+        self.revoked = {key: exp for key, exp in self.revoked.items() if exp > now}
+        self.revoked[jti] = expires_at
+
+    async def is_revoked(self, jti: str) -> bool:
+        return self.revoked.get(jti, 0) > time.time()
+
+
+class RedisDenylist:
+    """Denylist compartida: una clave por token revocado que expira con él."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def revoke(self, jti: str, expires_at: float):
+        ttl = max(int(expires_at - time.time()), 1)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(REVOKED_PREFIX + jti, "1", ex=ttl)
+            pipe.publish(REVOCATION_CHANNEL, jti)
+            await pipe.execute()
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await self.client.exists(REVOKED_PREFIX + jti))
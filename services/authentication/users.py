@@ -0,0 +1,46 @@
+import json
+
+
+class MemoryUserStore:
+    """Usuarios de este proceso; se pierden al reiniciar."""
+
+    def __init__(self):
+        self.users = {}
+
+    async def create(self, usuario: str, datos: dict) -> bool:
+        if usuario in self.users:
+            return False
+        self.users[usuario] = datos
+        return True
+
+    async def get(self, usuario: str):
+        return self.users.get(usuario)
+
+    async def update_password_hash(self, usuario: str, password_hash: str):
+        if usuario in self.users:
+            self.users[usuario]["password_hash"] = password_hash
+
+
+class RedisUserStore:
+    """Usuarios en un hash de Redis, compartidos entre réplicas."""
+
+    def __init__(self, client, key: str = "auth:usuarios"):
+        self.client = client
+        self.key = key
+
+    async def create(self, usuario: str, datos: dict) -> bool:
+        return bool(await self.client.hsetnx(self.key, usuario, json.dumps(datos)))
+
+    async def get(self, usuario: str):
+        raw = await self.client.hget(self.key, usuario)
+        return json.loads(raw) if raw else None
+
+    async def update_password_hash(self, usuario: str, password_hash: str):
+        datos = await self.get(usuario)
+        if datos is not None:
+            datos["password_hash"] = password_hash
+            await self.client.hset(self.key, usuario, json.dumps(datos))
+
+
+def build_user_store(redis_client=None):
+    return RedisUserStore(redis_client) if redis_client is not None else MemoryUserStore()
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import logging
+import os
+
+from sqlalchemy import delete, select, update
+
+from models import Asistencia, MeGusta, Publicacion
+
+logger = logging.getLogger("data-management.counters")
+
+# Cada cuántos segundos se vuelcan los contadores de Redis a PostgreSQL y
+# cuántas publicaciones u operaciones de like se procesan por vuelta.
+COUNTER_FLUSH_INTERVAL = float(os.getenv("COUNTER_FLUSH_INTERVAL", "5"))
+COUNTER_FLUSH_BATCH = int(os.getenv("COUNTER_FLUSH_BATCH", "1000"))
+
+# Publicaciones con contadores modificados desde el último volcado.
+DIRTY_PUBLICATIONS_KEY = "contadores:pendientes"
+# Likes y unlikes pendientes de escribir en la tabla me_gusta.
+PENDING_LIKES_KEY = "likes:pendientes"
+# Altas y bajas de asistencia pendientes de escribir en la tabla asistencias.
+PENDING_ATTENDANCE_KEY = "asistencias:pendientes"
+# Marca de que los sets de likes y asistentes ya se cargaron desde SQL.
+LIKES_SYNC_KEY = "likes:sincronizado"
+LIKES_SYNC_BATCH = int(os.getenv("LIKES_SYNC_BATCH", "5000"))
+
+# Like o unlike en un solo paso: el set de usuarios, el contador, la marca de
+# publicación modificada y la operación pendiente cambian juntos o no cambian.
+# Devuelve el total nuevo, o nil si el set ya estaba en ese estado.
+# KEYS: set de likes, hash de contadores, pendientes de volcar, likes pendientes.
+# ARGV: usuario, likes en SQL, +1/-1, id de la publicación, operación en JSON.
+LIKE_SCRIPT = """
+local changed
+if ARGV[3] == "1" then
+    changed = redis.call("SADD", KEYS[1], ARGV[1])
+else
+    changed = redis.call("SREM", KEYS[1], ARGV[1])
+end
+if changed == 0 then
+    return false
+end
+redis.call("HSETNX", KEYS[2], "likes", ARGV[2])
+local total = redis.call("HINCRBY", KEYS[2], "likes", tonumber(ARGV[3]))
+redis.call("SADD", KEYS[3], ARGV[4])
+redis.call("RPUSH", KEYS[4], ARGV[5])
+return total
+"""
+
+# Alta o baja de asistencia: el set y la operación pendiente cambian juntos.
+# Devuelve {cambió (0/1), total de asistentes}.
+# KEYS: set de asistentes, asistencias pendientes. ARGV: usuario, "1"/"0", operación en JSON.
+ATTENDANCE_SCRIPT = """
+local changed
+if ARGV[2] == "1" then
+    changed = redis.call("SADD", KEYS[1], ARGV[1])
+else
+    changed = redis.call("SREM", KEYS[1], ARGV[1])
+end
+if changed == 1 then
+    redis.call("RPUSH", KEYS[2], ARGV[3])
+end
+return {changed, redis.call("SCARD", KEYS[1])}
+"""
+
+# Prefijo de los canales pub/sub de los que el servicio de notificaciones
+# retransmite a los clientes conectados (SSE). El pub/sub de Redis no depende
+# de la base de datos, así que llega aunque cada servicio use un índice distinto.
+PUSH_CHANNEL_PREFIX = "push:"
+
+
+def publication_counters_key(publicacion_id) -> str:
+    return f"publicacion:{publicacion_id}:contadores"
+
+
+def publication_likes_key(publicacion_id) -> str:
+    return f"publicacion:{publicacion_id}:likes"
+
+
+def event_attendees_key(evento_id) -> str:
+    return f"evento:{evento_id}:asistentes"
+
+
+async def publish_push(redis, topic: str, evento: str, datos: dict):
+    """Publica un cambio para los clientes suscritos a `topic` (p. ej. "publicacion:12")."""
+    await redis.publish(PUSH_CHANNEL_PREFIX + topic, json.dumps({"evento": evento, "datos": datos}))
+
+
+async def change_like(redis, publicacion: Publicacion, usuario: str, like: bool):
+    """Da o quita el like de forma atómica. Devuelve el total o None si no cambió nada.
+
+    El set de usuarios garantiza un like por usuario; el contador se
+    inicializa con el valor de SQL si Redis aún no lo tiene.
+    """
+    delta = 1 if like else -1
+    operation = json.dumps({"publicacion_id": publicacion.id, "usuario": usuario, "like": like})
+    total = await redis.eval(
+        LIKE_SCRIPT, 4,
+        publication_likes_key(publicacion.id), publication_counters_key(publicacion.id),
+        DIRTY_PUBLICATIONS_KEY, PENDING_LIKES_KEY,
+        usuario, publicacion.likes_count, delta, publicacion.id, operation,
+    )
+    if total is None:
+        return None
+    await publish_push(redis, f"publicacion:{publicacion.id}", "contadores",
+                       {"publicacion_id": publicacion.id, "likes": total, "delta": {"likes": delta}})
+    return total
+
+
+async def add_like(redis, publicacion: Publicacion, usuario: str):
+    """Registra el like. Devuelve el total o None si ya existía."""
+    return await change_like(redis, publicacion, usuario, True)
+
+
+async def remove_like(redis, publicacion: Publicacion, usuario: str):
+    """Quita el like. Devuelve el total o None si el usuario no había dado like."""
+    return await change_like(redis, publicacion, usuario, False)
+
+
+async def _load_sets(redis, session_factory, model, parent_column, key_for) -> int:
+    """Añade a los sets de Redis las filas (padre, usuario) de `model`, por lotes de id."""
+    last_id = 0
+    total = 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(model.id, parent_column, model.usuario)
+                .where(model.id > last_id)
+                .order_by(model.id)
+                .limit(LIKES_SYNC_BATCH)
+            )).all()
+        if not rows:
+            return total
+        async with redis.pipeline(transaction=False) as pipe:
+            for _, parent_id, usuario in rows:
+                pipe.sadd(key_for(parent_id), usuario)
+            await pipe.execute()
+        total += len(rows)
+        last_id = rows[-1][0]
+
+
+async def sync_likes_from_db(redis, session_factory):
+    """Carga en los sets de Redis los likes y asistencias que ya estaban en SQL.
+
+    Sin esto, quien dio like antes de que existieran los sets podría volver a
+    sumarlo. Solo lo hace la primera réplica que arranca sin la marca; después
+    los sets son la referencia y las tablas se actualizan desde ellos.
+    """
+    if not await redis.set(LIKES_SYNC_KEY, "1", nx=True):
+        return
+    try:
+        likes = await _load_sets(redis, session_factory, MeGusta, MeGusta.publicacion_id, publication_likes_key)
+        attendance = await _load_sets(redis, session_factory, Asistencia, Asistencia.evento_id, event_attendees_key)
+    except BaseException as e:
+        # Sin la marca, la próxima réplica que arranque lo vuelve a intentar.
+        await redis.delete(LIKES_SYNC_KEY)
+        if not isinstance(e, Exception):
+            raise
+        logger.exception("No se pudieron cargar los likes y asistencias en Redis")
+        return
+    logger.info("Cargados en Redis: %d likes y %d asistencias", likes, attendance)
+
+
+async def add_comment(redis, publicacion: Publicacion) -> int:
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hsetnx(publication_counters_key(publicacion.id), "comentarios", publicacion.comments_count)
+        pipe.hincrby(publication_counters_key(publicacion.id), "comentarios", 1)
+        pipe.sadd(DIRTY_PUBLICATIONS_KEY, publicacion.id)
+        _, total, _ = await pipe.execute()
+    await publish_push(redis, f"publicacion:{publicacion.id}", "contadores",
+                       {"publicacion_id": publicacion.id, "comentarios": total, "delta": {"comentarios": 1}})
+    return total
+
+
+async def get_publication_counters(redis, publicacion_ids) -> dict:
+    """Lee los contadores de varias publicaciones en un único viaje a Redis.
+
+    Devuelve {id: {"likes": n, "comentarios": n}} solo para las publicaciones
+    que tienen contadores en Redis; para el resto vale el valor de SQL.
+    """
+    publicacion_ids = list(publicacion_ids)
+    if not publicacion_ids:
+        return {}
+    async with redis.pipeline(transaction=False) as pipe:
+        for publicacion_id in publicacion_ids:
+            pipe.hmget(publication_counters_key(publicacion_id), "likes", "comentarios")
+        results = await pipe.execute()
+
+    counters = {}
+    for publicacion_id, (likes, comentarios) in zip(publicacion_ids, results):
+        values = {}
+        if likes is not None:
+            values["likes"] = int(likes)
+        if comentarios is not None:
+            values["comentarios"] = int(comentarios)
+        if values:
+            counters[publicacion_id] = values
+    return counters
+
+
+def apply_counters(data: dict, counters: dict) -> dict:
+    data.update(counters.get(data["id"], {}))
+    return data
+
+
+async def toggle_attendance(redis, evento_id, usuario: str, attending: bool) -> int:
+    """Marca o desmarca la asistencia a un evento y devuelve el total de asistentes.
+
+    La tabla asistencias se actualiza después en bloque (write-behind).
+    """
+    operation = json.dumps({"evento_id": evento_id, "usuario": usuario, "asiste": attending})
+    changed, total = await redis.eval(
+        ATTENDANCE_SCRIPT, 2, event_attendees_key(evento_id), PENDING_ATTENDANCE_KEY,
+        usuario, "1" if attending else "0", operation,
+    )
+    if changed:
+        await publish_push(redis, f"evento:{evento_id}", "asistentes",
+                           {"evento_id": evento_id, "asistentes": total, "delta": 1 if attending else -1})
+    return total
+
+
+async def get_attendee_counts(redis, evento_ids, usuario=None) -> dict:
+    """Total de asistentes (y si `usuario` asiste) de varios eventos en un solo viaje."""
+    evento_ids = list(evento_ids)
+    if not evento_ids:
+        return {}
+    async with redis.pipeline(transaction=False) as pipe:
+        for evento_id in evento_ids:
+            pipe.scard(event_attendees_key(evento_id))
+            if usuario:
+                pipe.sismember(event_attendees_key(evento_id), usuario)
+        results = await pipe.execute()
+
+    step = 2 if usuario else 1
+    counts = {}
+    for index, evento_id in enumerate(evento_ids):
+        entry = {"asistentes": results[index * step]}
+        if usuario:
+            entry["asistiendo"] = bool(results[index * step + 1])
+        counts[evento_id] = entry
+    return counts
+
+
+async def pop_pending(redis, key: str) -> list:
+    """Saca de la lista `key` hasta COUNTER_FLUSH_BATCH operaciones pendientes."""
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.lrange(key, 0, COUNTER_FLUSH_BATCH - 1)
+        pipe.ltrim(key, COUNTER_FLUSH_BATCH, -1)
+        pending, _ = await pipe.execute()
+    return pending
+
+
+def last_states(pending: list, parent_field: str, state_field: str) -> dict:
+    # Solo importa el último estado de cada par (padre, usuario).
+    states = {}
+    for raw in pending:
+        operation = json.loads(raw)
+        states[(operation[parent_field], operation["usuario"])] = operation[state_field]
+    return states
+
+
+async def flush_counters(redis, session_factory) -> int:
+    """Vuelca a PostgreSQL los contadores modificados, los likes y las asistencias pendientes.
+
+    Devuelve el número de publicaciones actualizadas.
+    """
+    publicacion_ids = await redis.spop(DIRTY_PUBLICATIONS_KEY, COUNTER_FLUSH_BATCH) or []
+    rows = []
+    if publicacion_ids:
+        async with redis.pipeline(transaction=False) as pipe:
+            for publicacion_id in publicacion_ids:
+                pipe.hmget(publication_counters_key(publicacion_id), "likes", "comentarios")
+            results = await pipe.execute()
+        for publicacion_id, (likes, comentarios) in zip(publicacion_ids, results):
+            values = {"id": int(publicacion_id)}
+            if likes is not None:
+                values["likes_count"] = int(likes)
+            if comentarios is not None:
+                values["comments_count"] = int(comentarios)
+            if len(values) > 1:
+                rows.append(values)
+
+    pending = await pop_pending(redis, PENDING_LIKES_KEY)
+    likes = last_states(pending, "publicacion_id", "like")
+    pending_attendance = await pop_pending(redis, PENDING_ATTENDANCE_KEY)
+    attendance = last_states(pending_attendance, "evento_id", "asiste")
+
+    if not rows and not likes and not attendance:
+        return 0
+
+    try:
+        async with session_factory() as db:
+            # Se agrupan por columnas para poder usar executemany.
+            for columns in {tuple(sorted(row)) for row in rows}:
+                batch = [row for row in rows if tuple(sorted(row)) == columns]
+                await db.execute(update(Publicacion), batch)
+            for publicacion_id, usuario in likes:
+                await db.execute(
+                    delete(MeGusta).where(MeGusta.publicacion_id == publicacion_id, MeGusta.usuario == usuario)
+                )
+            db.add_all(
+                MeGusta(publicacion_id=publicacion_id, usuario=usuario)
+                for (publicacion_id, usuario), liked in likes.items()
+                if liked
+            )
+            for evento_id, usuario in attendance:
+                await db.execute(
+                    delete(Asistencia).where(Asistencia.evento_id == evento_id, Asistencia.usuario == usuario)
+                )
+            db.add_all(
+                Asistencia(evento_id=evento_id, usuario=usuario)
+                for (evento_id, usuario), attends in attendance.items()
+                if attends
+            )
+            await db.commit()
+    except Exception:
+        # Se devuelve el trabajo a Redis para reintentarlo en la siguiente vuelta.
+        if publicacion_ids:
+            await redis.sadd(DIRTY_PUBLICATIONS_KEY, *publicacion_ids)
+        if pending:
+            await redis.lpush(PENDING_LIKES_KEY, *reversed(pending))
+        if pending_attendance:
+            await redis.lpush(PENDING_ATTENDANCE_KEY, *reversed(pending_attendance))
+        raise
+    return len(rows)
+
+
+async def run_counter_flusher(redis, session_factory):
+    """Tarea de fondo (write-behind) que vuelca los contadores periódicamente."""
+    while True:
+        await asyncio.sleep(COUNTER_FLUSH_INTERVAL)
+        try:
+            await flush_counters(redis, session_factory)
+        except Exception:
+            logger.exception("Error al volcar los contadores a la base de datos")
@@ -1,13 +1,24 @@
 import redis
+import redis.asyncio as redis_async
 import os
 
 # Obtén la URL de la base de datos de las variables de entorno
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis-db:6379/0")
 
+# Cliente asíncrono compartido por las rutas (mantiene su propio pool de conexiones).
+_async_client = None
+
 # Crea el cliente de Redis
 def get_redis_client():
     return redis.from_url(REDIS_URL)
 
+# Devuelve el cliente asíncrono de Redis, para usar desde rutas async sin bloquear el event loop.
+def get_async_redis_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = redis_async.from_url(REDIS_URL, decode_responses=True)
+    return _async_client
+
 # Ejemplo de uso:
 # redis_client = get_redis_client()
 # redis_client.set("my_key", "my_value")
@@ -1,32 +1,90 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import logging
 import os
+import random
+import time
 
-# TODO: Importa la base declarativa del archivo models.py
-# from .models import Base
+from models import Base
+
+logger = logging.getLogger("data-management.sql")
 
 # Obtiene la URL de la base de datos de las variables de entorno.
-# Asegúrate de que esta variable esté definida en el archivo docker-compose.yml.
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Si no está definida se construye con las variables DB_* de docker-compose.yml.
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"postgresql://{os.getenv('DB_USER', 'deportistas_user')}:{os.getenv('DB_PASSWORD', 'deportistas_pass')}"
+    f"@{os.getenv('DB_HOST', 'db')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'deportistas_db')}"
+)
+
+# Las rutas son asíncronas: se usa el driver asyncpg para no bloquear el event loop.
+# Cualquier URL de PostgreSQL (postgres://, postgresql://, postgresql+psycopg2://...)
+# se pasa a ese driver.
+_url = make_url(DATABASE_URL)
+if _url.drivername.split("+")[0] in ("postgres", "postgresql"):
+    DATABASE_URL = _url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+# Pool de conexiones.
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "10"))
+SQL_MAX_OVERFLOW = int(os.getenv("SQL_MAX_OVERFLOW", "20"))
+SQL_POOL_TIMEOUT = float(os.getenv("SQL_POOL_TIMEOUT", "30"))
+SQL_POOL_RECYCLE = int(os.getenv("SQL_POOL_RECYCLE", "1800"))
+SQL_POOL_PRE_PING = os.getenv("SQL_POOL_PRE_PING", "true").lower() == "true"
+
+# Registro de sentencias. SQL_ECHO=true muestra todas (solo para debug); en su
+# lugar se registran las consultas que tardan más de SQL_SLOW_QUERY_MS, con una
+# fracción de muestreo SQL_SLOW_QUERY_SAMPLE_RATE (0 desactiva el registro).
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SQL_SLOW_QUERY_SAMPLE_RATE", "1.0"))
+
+# Caché de sentencias preparadas de asyncpg (por conexión) y caché de SQL
+# compilado de SQLAlchemy (por motor).
+SQL_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("SQL_PREPARED_STATEMENT_CACHE_SIZE", "500"))
+SQL_COMPILED_CACHE_SIZE = int(os.getenv("SQL_COMPILED_CACHE_SIZE", "1000"))
 
-# Crea el motor de la base de datos.
-# El argumento echo=True muestra todas las sentencias SQL ejecutadas (útil para debug).
-engine = create_engine(DATABASE_URL, echo=True)
+engine_options = {
+    "echo": SQL_ECHO,
+    "pool_pre_ping": SQL_POOL_PRE_PING,
+    "pool_recycle": SQL_POOL_RECYCLE,
+    "query_cache_size": SQL_COMPILED_CACHE_SIZE,
+}
+if DATABASE_URL.startswith("postgresql"):
+    engine_options.update(
+        pool_size=SQL_POOL_SIZE,
+        max_overflow=SQL_MAX_OVERFLOW,
+        pool_timeout=SQL_POOL_TIMEOUT,
+        connect_args={"prepared_statement_cache_size": SQL_PREPARED_STATEMENT_CACHE_SIZE},
+    )
+
+# Crea el motor asíncrono de la base de datos.
+engine = create_async_engine(DATABASE_URL, **engine_options)
 
 # Configura la sesión de la base de datos.
-# Esta clase creará nuevas sesiones de base de datos.
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Esta clase creará nuevas sesiones asíncronas de base de datos.
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+if SQL_SLOW_QUERY_MS > 0 and SQL_SLOW_QUERY_SAMPLE_RATE > 0:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        context.query_started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context.query_started_at) * 1000
+        if elapsed_ms >= SQL_SLOW_QUERY_MS and random.random() < SQL_SLOW_QUERY_SAMPLE_RATE:
+            logger.warning("Consulta lenta (%.1f ms): %s", elapsed_ms, statement)
+
 
 # Función para crear todas las tablas en la base de datos.
-def create_db_and_tables():
+async def create_db_and_tables():
     """Crea todas las tablas definidas en models.py si no existen."""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
 
 # Define la dependencia para la sesión de la base de datos.
 # Esta función se usará en los endpoints de FastAPI para obtener una sesión de DB.
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
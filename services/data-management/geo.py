@@ -0,0 +1,108 @@
+import heapq
+import logging
+import os
+from datetime import date, timedelta
+from itertools import islice
+from operator import itemgetter
+
+logger = logging.getLogger("data-management.geo")
+
+# Radio máximo (km) y ventana de fechas máxima (días) de una búsqueda de eventos cercanos.
+GEO_MAX_RADIUS_KM = float(os.getenv("EVENT_GEO_MAX_RADIUS_KM", "200"))
+GEO_MAX_WINDOW_DAYS = int(os.getenv("EVENT_GEO_MAX_WINDOW_DAYS", "90"))
+
+# Días que se conserva el índice de un día ya pasado; después Redis lo borra solo.
+GEO_RETENTION_DAYS = int(os.getenv("EVENT_GEO_RETENTION_DAYS", "365"))
+
+# Eventos leídos por consulta al volcar la base de datos en el índice.
+GEO_SYNC_BATCH = int(os.getenv("EVENT_GEO_SYNC_BATCH", "5000"))
+
+# Marca de que el índice ya se volcó desde la base de datos (si Redis se vacía,
+# desaparece con él y la siguiente réplica que arranque lo vuelve a llenar).
+GEO_SYNC_KEY = "eventos:geo:sincronizado"
+
+
+# Cada día tiene su propio índice geográfico (un sorted set con geohash, el
+# tipo GEO de Redis): una búsqueda solo consulta los días de su ventana, y en
+# cada uno GEOSEARCH recorre las celdas que cubren el radio, no todos los eventos.
+
+def day_key(fecha: date) -> str:
+    return f"eventos:geo:{fecha.isoformat()}"
+
+
+def _expire_at(fecha: date) -> int:
+    return int((fecha - date(1970, 1, 1) + timedelta(days=GEO_RETENTION_DAYS + 1)).total_seconds())
+
+
+def _add(pipe, evento_id: int, fecha: date, latitud: float, longitud: float):
+    key = day_key(fecha)
+    pipe.geoadd(key, [longitud, latitud, evento_id])
+    pipe.expireat(key, _expire_at(fecha))
+
+
+async def index_event(redis, evento_id: int, fecha: date, latitud: float, longitud: float):
+    async with redis.pipeline(transaction=False) as pipe:
+        _add(pipe, evento_id, fecha, latitud, longitud)
+        await pipe.execute()
+
+
+async def nearby(redis, latitud: float, longitud: float, radio_km: float, desde: date, hasta: date, limit: int) -> list:
+    """Ids de los eventos a menos de `radio_km` entre `desde` y `hasta`, del más cercano al más lejano.
+
+    Devuelve tuplas (id, distancia_km). Cada día aporta como mucho `limit`
+    eventos ya ordenados por distancia y se mezclan sin reordenar todo.
+    """
+    days = [desde + timedelta(days=offset) for offset in range((hasta - desde).days + 1)]
+    async with redis.pipeline(transaction=False) as pipe:
+        for day in days:
+            pipe.geosearch(
+                day_key(day), longitude=longitud, latitude=latitud, radius=radio_km, unit="km",
+                sort="ASC", count=limit, withdist=True,
+            )
+        per_day = await pipe.execute()
+    merged = heapq.merge(*per_day, key=itemgetter(1))
+    return [(int(member), distance) for member, distance in islice(merged, limit)]
+
+
+async def sync_from_db(redis, session_factory, evento_model):
+    """Vuelca en el índice los eventos con coordenadas guardados en la base de datos.
+
+    Solo lo hace la primera réplica que arranca con el índice vacío; los
+    eventos nuevos se indexan al crearlos.
+    """
+    from sqlalchemy import select
+
+    if not await redis.set(GEO_SYNC_KEY, "1", nx=True):
+        return
+    oldest = date.today() - timedelta(days=GEO_RETENTION_DAYS)
+    last_id = 0
+    total = 0
+    try:
+        while True:
+            async with session_factory() as db:
+                rows = (await db.execute(
+                    select(evento_model.id, evento_model.fecha, evento_model.latitud, evento_model.longitud)
+                    .where(
+                        evento_model.id > last_id,
+                        evento_model.latitud.is_not(None),
+                        evento_model.fecha >= oldest,
+                    )
+                    .order_by(evento_model.id)
+                    .limit(GEO_SYNC_BATCH)
+                )).all()
+            if not rows:
+                break
+            async with redis.pipeline(transaction=False) as pipe:
+                for row in rows:
+                    _add(pipe, row.id, row.fecha, row.latitud, row.longitud)
+                await pipe.execute()
+            total += len(rows)
+            last_id = rows[-1].id
+    except BaseException as e:
+        # Sin la marca, la próxima réplica que arranque lo vuelve a intentar.
+        await redis.delete(GEO_SYNC_KEY)
+        if not isinstance(e, Exception):
+            raise
+        logger.exception("No se pudo cargar el índice geográfico de eventos")
+        return
+    logger.info("Índice geográfico de eventos cargado: %d eventos", total)
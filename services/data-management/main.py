@@ -1,10 +1,112 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from contextlib import asynccontextmanager
+
+from datetime import date, timedelta
+from fastapi import FastAPI, APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+import asyncio
+import base64
 import os
 
-app = FastAPI(title="Data Management Service")
+import counters
+import geo
+import timelines
+from search import SearchService
+from database_redis import get_async_redis_client
+from database_sql import SessionLocal, create_db_and_tables, engine, get_db
+from models import (
+    AsistenciaCreate,
+    AsistenciaUpdate,
+    Comentario,
+    ComentarioCreate,
+    Evento,
+    EventoCreate,
+    MeGustaCreate,
+    Perfil,
+    PerfilUpdate,
+    Publicacion,
+    PublicacionCreate,
+    SeguimientoCreate,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await create_db_and_tables()
+    redis = get_async_redis_client()
+    flusher = asyncio.create_task(counters.run_counter_flusher(redis, SessionLocal))
+    # El índice se llena en segundo plano: el servicio arranca sin esperar a
+    # indexar todo lo que ya hay en la base de datos.
+    search_service.start()
+    geo_sync = asyncio.create_task(geo.sync_from_db(redis, SessionLocal, Evento))
+    likes_sync = asyncio.create_task(counters.sync_likes_from_db(redis, SessionLocal))
+    yield
+    likes_sync.cancel()
+    geo_sync.cancel()
+    await search_service.stop()
+    flusher.cancel()
+    # Último volcado para no perder los contadores acumulados al apagar.
+    await counters.flush_counters(redis, SessionLocal)
+    await engine.dispose()
+
+
+app = FastAPI(title="Data Management Service", lifespan=lifespan)
+
+# Índice de búsqueda de texto de publicaciones y eventos (ver search.py).
+search_service = SearchService(get_async_redis_client(), SessionLocal, Publicacion, Evento)
 
 router = APIRouter()
 
+# Tamaño de página por defecto y máximo de los listados paginados.
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def parse_ids(ids: str) -> list:
+    try:
+        return [int(value) for value in ids.split(",") if value.strip()][:MAX_PAGE_SIZE]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Lista de ids inválida")
+
+
+def acting_user(x_usuario: Optional[str], claimed: Optional[str] = None) -> str:
+    """Usuario que hace la petición, según el token que verificó el gateway.
+
+    El cliente puede seguir enviando su usuario en el cuerpo o en la query,
+    pero solo se acepta si coincide con la cabecera X-Usuario.
+    """
+    if not x_usuario:
+        raise HTTPException(status_code=401, detail="Se requiere un token de acceso")
+    if claimed and claimed != x_usuario:
+        raise HTTPException(status_code=403, detail="No puedes actuar en nombre de otro usuario")
+    return x_usuario
+
+
+async def get_publicacion_or_404(db: AsyncSession, publicacion_id: int) -> Publicacion:
+    publicacion = await db.get(Publicacion, publicacion_id)
+    if publicacion is None:
+        raise HTTPException(status_code=404, detail="Publicación no encontrada")
+    return publicacion
+
+
+async def get_evento_or_404(db: AsyncSession, evento_id: int) -> Evento:
+    evento = await db.get(Evento, evento_id)
+    if evento is None:
+        raise HTTPException(status_code=404, detail="Evento no encontrado")
+    return evento
+
 
 @app.get("/")
 def read_root():
@@ -18,21 +120,405 @@ def health_check():
 
 
 @router.get("/deportistas")
-async def get_deportistas():
-    """Retorna publicaciones almacenadas por clientes externos (sin datos ficticios)."""
-    return {"data": [], "message": "Publicaciones disponibles"}
+async def get_deportistas(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    autor: Optional[str] = None,
+    deporte: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Retorna una página de publicaciones, de la más nueva a la más antigua.
+
+    La paginación es por cursor (keyset): `next_cursor` codifica el id de la
+    última publicación devuelta y la siguiente página empieza justo después,
+    sin recorrer las anteriores como haría un offset. Se puede filtrar por
+    autor o por deporte.
+    """
+    query = select(Publicacion)
+    if autor:
+        query = query.where(Publicacion.autor == autor)
+    if deporte:
+        query = query.where(Publicacion.deporte == deporte)
+    if cursor:
+        query = query.where(Publicacion.id < decode_cursor(cursor))
+
+    # Se pide una fila de más para saber si existe una página siguiente.
+    rows = (await db.scalars(query.order_by(Publicacion.id.desc()).limit(limit + 1))).all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].id) if len(rows) > limit else None
+    # Los contadores vivos de toda la página se leen de Redis en un solo viaje.
+    live = await counters.get_publication_counters(get_async_redis_client(), [row.id for row in page])
+    data = [counters.apply_counters(row.to_dict(), live) for row in page]
+    return {"data": data, "next_cursor": next_cursor, "message": "Publicaciones disponibles"}
 
 
 @router.post("/deportistas")
-async def create_deportista(deportista: dict):
-    """Crear un nuevo registro (demo)."""
-    return {"message": "Publicación registrada (demo)", "data": deportista}
+async def create_deportista(
+    deportista: PublicacionCreate,
+    background_tasks: BackgroundTasks,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Crear un nuevo registro.
+
+    El autor es el usuario de la cabecera X-Usuario; la publicación se reparte
+    a los timelines de sus seguidores después de responder.
+    """
+    publicacion = Publicacion(**deportista.model_dump(exclude_none=True))
+    publicacion.autor = acting_user(x_usuario, deportista.autor)
+    publicacion.titulo = publicacion.titulo or "Publicación sin título"
+    publicacion.contenido = publicacion.contenido or ""
+    db.add(publicacion)
+    await db.commit()
+    await search_service.publish("publicacion", publicacion.id, {
+        "titulo": publicacion.titulo, "contenido": publicacion.contenido,
+        "deporte": publicacion.deporte, "fecha": publicacion.fecha,
+    })
+    background_tasks.add_task(timelines.fan_out, get_async_redis_client(), publicacion.autor, publicacion.id)
+    return {"message": "Publicación registrada", "data": publicacion.to_dict()}
+
+
+@router.get("/deportistas/{publicacion_id}")
+async def get_deportista(publicacion_id: int, db: AsyncSession = Depends(get_db)):
+    """Detalle de una publicación."""
+    publicacion = await get_publicacion_or_404(db, publicacion_id)
+    live = await counters.get_publication_counters(get_async_redis_client(), [publicacion_id])
+    return {"data": counters.apply_counters(publicacion.to_dict(), live)}
+
+
+@router.get("/contadores")
+async def get_contadores(ids: str):
+    """Likes y comentarios de varias publicaciones (ids separados por comas)."""
+    live = await counters.get_publication_counters(get_async_redis_client(), parse_ids(ids))
+    return {"data": {str(key): value for key, value in live.items()}, "message": "Contadores"}
+
+
+@router.post("/deportistas/{publicacion_id}/likes")
+async def like_deportista(
+    publicacion_id: int,
+    like: MeGustaCreate,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Registrar un like.
+
+    El like y el contador se actualizan de forma atómica en Redis; la tabla
+    me_gusta y likes_count se escriben después en bloque (write-behind).
+    """
+    usuario = acting_user(x_usuario, like.usuario)
+    publicacion = await get_publicacion_or_404(db, publicacion_id)
+    total = await counters.add_like(get_async_redis_client(), publicacion, usuario)
+    if total is None:
+        raise HTTPException(status_code=409, detail="Ya te gusta esta publicación")
+    return {"message": "Like registrado", "data": {**publicacion.to_dict(), "likes": total}}
+
+
+@router.delete("/deportistas/{publicacion_id}/likes")
+async def unlike_deportista(
+    publicacion_id: int,
+    usuario: Optional[str] = None,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Quitar un like y decrementar el contador de la publicación."""
+    usuario = acting_user(x_usuario, usuario)
+    publicacion = await get_publicacion_or_404(db, publicacion_id)
+    total = await counters.remove_like(get_async_redis_client(), publicacion, usuario)
+    if total is None:
+        raise HTTPException(status_code=404, detail="Like no encontrado")
+    return {"message": "Like eliminado", "data": {**publicacion.to_dict(), "likes": total}}
+
+
+@router.get("/deportistas/{publicacion_id}/comentarios")
+async def get_comentarios(
+    publicacion_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Comentarios de una publicación en orden de llegada, paginados por cursor."""
+    query = select(Comentario).where(Comentario.publicacion_id == publicacion_id)
+    if cursor:
+        query = query.where(Comentario.id > decode_cursor(cursor))
+    rows = (await db.scalars(query.order_by(Comentario.id).limit(limit + 1))).all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].id) if len(rows) > limit else None
+    return {"data": [row.to_dict() for row in page], "next_cursor": next_cursor, "message": "Comentarios"}
+
+
+@router.post("/deportistas/{publicacion_id}/comentarios")
+async def create_comentario(
+    publicacion_id: int,
+    comentario: ComentarioCreate,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Comentar una publicación e incrementar su contador de comentarios."""
+    autor = acting_user(x_usuario, comentario.autor)
+    publicacion = await get_publicacion_or_404(db, publicacion_id)
+    nuevo = Comentario(publicacion_id=publicacion_id, autor=autor, texto=comentario.texto)
+    db.add(nuevo)
+    await db.commit()
+    total = await counters.add_comment(get_async_redis_client(), publicacion)
+    return {"message": "Comentario registrado", "data": nuevo.to_dict(), "total": total}
+
+
+@router.post("/eventos")
+async def create_evento(datos: EventoCreate, x_usuario: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
+    """Registrar un evento organizado por el usuario de la cabecera X-Usuario.
+
+    Con fecha y coordenadas (latitud y longitud, juntas) aparece en /eventos/cercanos.
+    """
+    organizador = acting_user(x_usuario, datos.organizador)
+    if (datos.latitud is None) != (datos.longitud is None):
+        raise HTTPException(status_code=400, detail="Indica latitud y longitud, o ninguna de las dos")
+    evento = Evento(**datos.model_dump(exclude_none=True))
+    evento.organizador = organizador
+    evento.nombre = evento.nombre or "Evento deportivo"
+    evento.descripcion = evento.descripcion or ""
+    db.add(evento)
+    await db.commit()
+    if evento.fecha and evento.latitud is not None:
+        await geo.index_event(get_async_redis_client(), evento.id, evento.fecha, evento.latitud, evento.longitud)
+    await search_service.publish("evento", evento.id, {
+        "nombre": evento.nombre, "descripcion": evento.descripcion, "lugar": evento.lugar,
+        "deporte": evento.deporte, "fecha": evento.fecha,
+    })
+    return {"message": "Evento registrado", "data": evento.to_dict()}
+
+
+@router.get("/eventos/cercanos")
+async def get_eventos_cercanos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radio: float = Query(10, gt=0, le=geo.GEO_MAX_RADIUS_KM, description="Kilómetros"),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Eventos a menos de `radio` km de (lat, lon), del más cercano al más lejano.
+
+    Por defecto busca los de los próximos 30 días; la ventana `desde`-`hasta`
+    admite como mucho EVENT_GEO_MAX_WINDOW_DAYS días.
+    """
+    desde = desde or date.today()
+    hasta = hasta or desde + timedelta(days=30)
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="'hasta' no puede ser anterior a 'desde'")
+    if (hasta - desde).days >= geo.GEO_MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"La ventana de fechas no puede superar {geo.GEO_MAX_WINDOW_DAYS} días")
+
+    found = await geo.nearby(get_async_redis_client(), lat, lon, radio, desde, hasta, limit)
+    rows = {}
+    if found:
+        ids = [evento_id for evento_id, _ in found]
+        rows = {row.id: row for row in (await db.scalars(select(Evento).where(Evento.id.in_(ids)))).all()}
+    data = [
+        {**rows[evento_id].to_dict(), "distancia_km": round(distance, 2)}
+        for evento_id, distance in found if evento_id in rows
+    ]
+    return {"data": data, "message": "Eventos cercanos"}
+
+
+@router.get("/eventos/asistentes")
+async def get_asistentes(ids: str, x_usuario: Optional[str] = Header(None)):
+    """Asistentes de varios eventos (ids separados por comas) en una sola lectura.
+
+    `asistiendo` se calcula para el usuario de la cabecera X-Usuario.
+    """
+    counts = await counters.get_attendee_counts(get_async_redis_client(), parse_ids(ids), x_usuario)
+    return {"data": {str(key): value for key, value in counts.items()}, "message": "Asistentes"}
+
+
+@router.post("/eventos/{evento_id}/asistentes")
+async def asistir_evento(
+    evento_id: int,
+    asistencia: AsistenciaCreate,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Marcar la asistencia de un usuario a un evento."""
+    usuario = acting_user(x_usuario, asistencia.usuario)
+    await get_evento_or_404(db, evento_id)
+    total = await counters.toggle_attendance(get_async_redis_client(), evento_id, usuario, True)
+    return {"message": "Asistencia registrada", "data": {"asistentes": total, "asistiendo": True}}
+
+
+@router.put("/eventos/{evento_id}/asistentes")
+async def cambiar_asistencia(
+    evento_id: int,
+    asistencia: AsistenciaUpdate,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Fija si el usuario asiste o no al evento.
+
+    Es idempotente: repetir la petición (p. ej. un doble clic) deja el mismo
+    estado, así el cliente no necesita leer la asistencia antes de cambiarla.
+    """
+    usuario = acting_user(x_usuario)
+    await get_evento_or_404(db, evento_id)
+    total = await counters.toggle_attendance(get_async_redis_client(), evento_id, usuario, asistencia.asistiendo)
+    return {"message": "Asistencia actualizada", "data": {"asistentes": total, "asistiendo": asistencia.asistiendo}}
+
+
+@router.delete("/eventos/{evento_id}/asistentes")
+async def cancelar_asistencia(
+    evento_id: int,
+    usuario: Optional[str] = None,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Quitar la asistencia de un usuario a un evento."""
+    usuario = acting_user(x_usuario, usuario)
+    await get_evento_or_404(db, evento_id)
+    total = await counters.toggle_attendance(get_async_redis_client(), evento_id, usuario, False)
+    return {"message": "Asistencia cancelada", "data": {"asistentes": total, "asistiendo": False}}
+
+
+@router.post("/seguimientos")
+async def seguir_usuario(seguimiento: SeguimientoCreate, x_usuario: Optional[str] = Header(None)):
+    """Empezar a seguir a un usuario."""
+    seguidor = acting_user(x_usuario, seguimiento.seguidor)
+    if seguidor == seguimiento.seguido:
+        raise HTTPException(status_code=400, detail="No puedes seguirte a ti mismo")
+    total = await timelines.follow(get_async_redis_client(), seguidor, seguimiento.seguido)
+    return {"message": "Seguimiento registrado", "data": {"seguidores": total}}
+
+
+@router.delete("/seguimientos")
+async def dejar_de_seguir(
+    seguido: str,
+    background_tasks: BackgroundTasks,
+    seguidor: Optional[str] = None,
+    x_usuario: Optional[str] = Header(None),
+):
+    """Dejar de seguir a un usuario."""
+    seguidor = acting_user(x_usuario, seguidor)
+    redis = get_async_redis_client()
+    total = await timelines.unfollow(redis, seguidor, seguido)
+    if total < timelines.CELEBRITY_FOLLOWERS:
+        # Si era celebridad y ya no llega al umbral, vuelve al reparto en escritura.
+        background_tasks.add_task(timelines.demote, redis, seguido)
+    return {"message": "Seguimiento eliminado", "data": {"seguidores": total}}
+
+
+@router.get("/timeline/{usuario}")
+async def get_timeline(
+    usuario: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Feed personalizado: publicaciones propias y de los usuarios seguidos.
+
+    Los ids salen del timeline precalculado en Redis; solo se cargan de SQL
+    (por clave primaria) las publicaciones de la página. `siguiendo` es el
+    número de usuarios que sigue (con 0 el cliente puede mostrar el feed global).
+    """
+    redis = get_async_redis_client()
+    before = decode_cursor(cursor) if cursor else None
+    # Se pide un id de más para saber si existe una página siguiente.
+    ids = await timelines.read_timeline(redis, usuario, limit + 1, before)
+    page_ids = ids[:limit]
+    rows = (await db.scalars(select(Publicacion).where(Publicacion.id.in_(page_ids)))).all() if page_ids else []
+    by_id = {row.id: row for row in rows}
+    live = await counters.get_publication_counters(redis, page_ids)
+    data = [counters.apply_counters(by_id[publicacion_id].to_dict(), live) for publicacion_id in page_ids if publicacion_id in by_id]
+    next_cursor = encode_cursor(page_ids[-1]) if len(ids) > limit else None
+    siguiendo = await timelines.count_following(redis, usuario)
+    return {"data": data, "next_cursor": next_cursor, "siguiendo": siguiendo, "message": "Timeline"}
+
+
+@router.get("/perfiles")
+async def get_perfiles(usuarios: str, db: AsyncSession = Depends(get_db)):
+    """Perfiles de varios usuarios (separados por comas) en una sola consulta.
+
+    Los usuarios sin perfil no aparecen en la respuesta.
+    """
+    nombres = list(dict.fromkeys(value.strip() for value in usuarios.split(",") if value.strip()))[:MAX_PAGE_SIZE]
+    rows = (await db.scalars(select(Perfil).where(Perfil.usuario.in_(nombres)))).all() if nombres else []
+    return {"data": {row.usuario: row.to_dict() for row in rows}, "message": "Perfiles"}
+
+
+@router.get("/perfiles/{usuario}")
+async def get_perfil(usuario: str, db: AsyncSession = Depends(get_db)):
+    """Perfil de un usuario."""
+    perfil = await db.get(Perfil, usuario)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return {"data": perfil.to_dict()}
+
+
+@router.put("/perfiles/{usuario}")
+async def update_perfil(
+    usuario: str,
+    datos: PerfilUpdate,
+    x_usuario: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Crear o actualizar el perfil de un usuario (solo los campos enviados).
+
+    Cada usuario solo puede editar su propio perfil (cabecera X-Usuario).
+    """
+    if not x_usuario or x_usuario != usuario:
+        raise HTTPException(status_code=403, detail="Solo puedes editar tu propio perfil")
+    perfil = await db.get(Perfil, usuario)
+    if perfil is None:
+        perfil = Perfil(usuario=usuario)
+        db.add(perfil)
+    for campo, valor in datos.model_dump(exclude_unset=True).items():
+        setattr(perfil, campo, valor)
+    await db.commit()
+    await db.refresh(perfil)
+    return {"message": "Perfil actualizado", "data": perfil.to_dict()}
+
+
+@router.get("/buscar")
+async def buscar(
+    q: str = Query(..., min_length=1, max_length=200),
+    tipo: Optional[Literal["publicacion", "evento"]] = None,
+    deporte: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Busca publicaciones y eventos que contengan todas las palabras de `q`.
+
+    Los resultados van del más reciente al más antiguo y se pueden filtrar por
+    tipo, deporte y rango de fechas. `facetas` cuenta todos los resultados por
+    tipo, deporte y mes, para ofrecer esos filtros con su número de resultados.
+    """
+    found = await search_service.search(q, tipo, deporte, desde, hasta, limit, offset)
+
+    # Solo se leen de la base de datos los documentos de la página, una consulta por tipo.
+    ids_por_tipo = {"publicacion": [], "evento": []}
+    for kind, doc_id in found["resultados"]:
+        ids_por_tipo[kind].append(doc_id)
+    rows = {}
+    for kind, model in (("publicacion", Publicacion), ("evento", Evento)):
+        if ids_por_tipo[kind]:
+            for row in (await db.scalars(select(model).where(model.id.in_(ids_por_tipo[kind])))).all():
+                rows[kind, row.id] = row
+    data = [{"tipo": kind, **rows[kind, doc_id].to_dict()} for kind, doc_id in found["resultados"] if (kind, doc_id) in rows]
+    return {
+        "data": data,
+        "total": found["total"],
+        "facetas": found["facetas"],
+        # False mientras el índice se llena al arrancar: puede faltar algún resultado.
+        "completo": search_service.ready,
+        "message": "Resultados de la búsqueda",
+    }
 
 
 @router.get("/estadisticas")
-async def get_estadisticas():
-    """Obtener estadísticas (vacías por defecto)."""
-    return {"data": {"total_publicaciones": 0}, "message": "Estadísticas del feed"}
+async def get_estadisticas(db: AsyncSession = Depends(get_db)):
+    """Obtener estadísticas del feed."""
+    total = await db.scalar(select(func.count()).select_from(Publicacion))
+    return {"data": {"total_publicaciones": total}, "message": "Estadísticas del feed"}
 
 
 app.include_router(router)
@@ -1,51 +1,278 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import JSON, Column, Date, Float, Integer, String, Text, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base
-from datetime import datetime
+from datetime import date, datetime
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from urllib.parse import urlsplit
 
 # Define la base declarativa
 Base = declarative_base()
 
-# TODO: Crea tus modelos de datos aquí.
-# Cada clase de modelo representa una tabla en tu base de datos.
-# Debes renombrar YourModel por el nombre de la Clase según el servicio
-class YourModel(Base):
+
+class Publicacion(Base):
+    """Publicación del feed.
+
+    Los contadores de likes y comentarios están desnormalizados, así el feed
+    nunca necesita un COUNT(*) por fila. Los valores vivos están en Redis y se
+    vuelcan aquí periódicamente (ver counters.py).
+    """
+    __tablename__ = "publicaciones"
+
+    id = Column(Integer, primary_key=True)
+    titulo = Column(String(200), nullable=False)
+    contenido = Column(Text, nullable=False, default="")
+    autor = Column(String(150))
+    deporte = Column(String(100))
+    imagen = Column(String(500))
+    tipo = Column(String(50))
+    duracion = Column(String(20))
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
+    likes_count = Column(Integer, nullable=False, default=0)
+    comments_count = Column(Integer, nullable=False, default=0)
+
+    # El feed se pagina por id descendente (clave primaria). Los listados por
+    # autor y por deporte usan índices compuestos que terminan en id para
+    # resolver filtro + orden + cursor con un solo recorrido del índice.
+    __table_args__ = (
+        Index("ix_publicaciones_autor_id", "autor", "id"),
+        Index("ix_publicaciones_deporte_id", "deporte", "id"),
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "titulo": self.titulo,
+            "contenido": self.contenido,
+            "autor": self.autor,
+            "deporte": self.deporte,
+            "imagen": self.imagen,
+            "tipo": self.tipo,
+            "duracion": self.duracion,
+            "fecha": self.fecha.strftime("%Y-%m-%d %H:%M") if self.fecha else None,
+            "likes": self.likes_count,
+            "comentarios": self.comments_count,
+        }
+
+    def __repr__(self):
+        return f"<Publicacion(id={self.id}, titulo='{self.titulo}')>"
+
+
+class Evento(Base):
+    __tablename__ = "eventos"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(200), nullable=False)
+    descripcion = Column(Text, nullable=False, default="")
+    lugar = Column(String(200))
+    deporte = Column(String(100))
+    organizador = Column(String(150))
+    fecha = Column(Date)
+    latitud = Column(Float)
+    longitud = Column(Float)
+    creado = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "nombre": self.nombre,
+            "descripcion": self.descripcion,
+            "lugar": self.lugar,
+            "deporte": self.deporte,
+            "organizador": self.organizador,
+            "fecha": self.fecha.isoformat() if self.fecha else None,
+            "latitud": self.latitud,
+            "longitud": self.longitud,
+        }
+
+    def __repr__(self):
+        return f"<Evento(id={self.id}, nombre='{self.nombre}')>"
+
+
+class Comentario(Base):
+    __tablename__ = "comentarios"
+
+    id = Column(Integer, primary_key=True)
+    publicacion_id = Column(Integer, ForeignKey("publicaciones.id", ondelete="CASCADE"), nullable=False)
+    autor = Column(String(150), nullable=False)
+    texto = Column(Text, nullable=False)
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Comentarios de una publicación en orden de llegada.
+    __table_args__ = (
+        Index("ix_comentarios_publicacion_id", "publicacion_id", "id"),
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "autor": self.autor,
+            "texto": self.texto,
+            "fecha": self.fecha.strftime("%Y-%m-%d %H:%M") if self.fecha else None,
+        }
+
+    def __repr__(self):
+        return f"<Comentario(id={self.id}, publicacion_id={self.publicacion_id})>"
+
+
+class MeGusta(Base):
+    __tablename__ = "me_gusta"
+
+    id = Column(Integer, primary_key=True)
+    publicacion_id = Column(Integer, ForeignKey("publicaciones.id", ondelete="CASCADE"), nullable=False)
+    usuario = Column(String(150), nullable=False)
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Un usuario solo puede dar un like por publicación; la restricción única
+    # también sirve de índice para comprobarlo.
+    __table_args__ = (
+        UniqueConstraint("publicacion_id", "usuario", name="uq_me_gusta_publicacion_usuario"),
+    )
+
+    def __repr__(self):
+        return f"<MeGusta(publicacion_id={self.publicacion_id}, usuario='{self.usuario}')>"
+
+
+class Asistencia(Base):
+    """Asistencia de un usuario a un evento.
+
+    Los sets de Redis son la referencia en vivo; esta tabla se actualiza desde
+    ellos en bloque (write-behind, ver counters.py).
     """
-    Plantilla de modelo de datos para un recurso.
-    Ajusta esta clase según los requisitos de tu tema.
+    __tablename__ = "asistencias"
+
+    id = Column(Integer, primary_key=True)
+    evento_id = Column(Integer, ForeignKey("eventos.id", ondelete="CASCADE"), nullable=False)
+    usuario = Column(String(150), nullable=False)
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("evento_id", "usuario", name="uq_asistencias_evento_usuario"),
+    )
+
+    def __repr__(self):
+        return f"<Asistencia(evento_id={self.evento_id}, usuario='{self.usuario}')>"
+
+
+class Perfil(Base):
+    """Perfil público de un deportista, guardado una sola vez.
+
+    Las publicaciones y comentarios solo guardan el nombre de usuario del
+    autor; el nombre visible y la foto se resuelven con este perfil al mostrar.
     """
-    __tablename__ = "[nombre_de_tu_tabla]"
+    __tablename__ = "perfiles"
 
-    # Columnas de la tabla
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    usuario = Column(String(150), primary_key=True)
+    nombre = Column(String(150))
+    titular = Column(String(200))
+    deporte = Column(String(100))
+    nivel = Column(String(50))
+    ubicacion = Column(String(150))
+    bio = Column(Text)
+    foto_url = Column(String(500))
+    portada_url = Column(String(500))
+    web = Column(String(300))
+    instagram = Column(String(150))
+    twitter = Column(String(150))
+    intereses = Column(JSON)
+    actualizado = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # TODO: Agrega más columnas según sea necesario.
-    # Por ejemplo:
-    # is_active = Column(Boolean, default=True)
-    # foreign_key_id = Column(Integer, ForeignKey("otra_tabla.id"))
+    def to_dict(self) -> dict:
+        return {
+            "usuario": self.usuario,
+            "nombre": self.nombre,
+            "titular": self.titular,
+            "deporte": self.deporte,
+            "nivel": self.nivel,
+            "ubicacion": self.ubicacion,
+            "bio": self.bio,
+            "foto_url": self.foto_url,
+            "portada_url": self.portada_url,
+            "web": self.web,
+            "instagram": self.instagram,
+            "twitter": self.twitter,
+            "intereses": self.intereses or [],
+            "actualizado": self.actualizado.strftime("%Y-%m-%d %H:%M:%S") if self.actualizado else None,
+        }
 
     def __repr__(self):
-        return f"<YourModel(id={self.id}, name='{self.name}')>"
+        return f"<Perfil(usuario='{self.usuario}')>"
+
+
+# Modelos Pydantic para validar la entrada de los endpoints.
+
+class PublicacionCreate(BaseModel):
+    titulo: Optional[str] = None
+    contenido: Optional[str] = None
+    autor: Optional[str] = None
+    deporte: Optional[str] = None
+    imagen: Optional[str] = None
+    tipo: Optional[str] = None
+    duracion: Optional[str] = None
+
+
+class EventoCreate(BaseModel):
+    nombre: Optional[str] = None
+    descripcion: Optional[str] = None
+    lugar: Optional[str] = None
+    deporte: Optional[str] = None
+    organizador: Optional[str] = None
+    fecha: Optional[date] = None
+    latitud: Optional[float] = Field(None, ge=-90, le=90)
+    longitud: Optional[float] = Field(None, ge=-180, le=180)
+
+
+class ComentarioCreate(BaseModel):
+    autor: Optional[str] = None
+    texto: str
+
+
+# En publicaciones, comentarios, eventos, likes, asistencias y seguimientos el
+# usuario que actúa es el de la cabecera X-Usuario; el del cuerpo es opcional
+# y, si llega, debe coincidir.
+
+class MeGustaCreate(BaseModel):
+    usuario: Optional[str] = None
+
+
+class AsistenciaCreate(BaseModel):
+    usuario: Optional[str] = None
+
+
+class AsistenciaUpdate(BaseModel):
+    asistiendo: bool
+
 
-# TODO: Define los modelos Pydantic para la validación de datos.
-# Estos modelos se usarán en los endpoints de FastAPI para validar la entrada y salida.
+class SeguimientoCreate(BaseModel):
+    seguidor: Optional[str] = None
+    seguido: str
 
-class YourModelBase(BaseModel):
-    name: str
-    description: Optional[str] = None
-    # TODO: Agrega los campos que se necesitan para crear o actualizar un recurso.
 
-class YourModelCreate(YourModelBase):
-    pass
+class PerfilUpdate(BaseModel):
+    nombre: Optional[str] = None
+    titular: Optional[str] = None
+    deporte: Optional[str] = None
+    nivel: Optional[str] = None
+    ubicacion: Optional[str] = None
+    bio: Optional[str] = None
+    foto_url: Optional[str] = None
+    portada_url: Optional[str] = None
+    web: Optional[str] = None
+    instagram: Optional[str] = None
+    twitter: Optional[str] = None
+    intereses: Optional[List[str]] = None
 
-class YourModelRead(YourModelBase):
-    id: int
-    created_at: datetime
-    
-    class Config:
-        orm_mode = True # Habilita la compatibilidad con ORM
+    @field_validator("foto_url", "portada_url", "web")
+    @classmethod
+    def check_url(cls, value: Optional[str]) -> Optional[str]:
+        """Solo URLs http(s) sin comillas, paréntesis ni espacios: las
+        plantillas las insertan en atributos y en url('...') de CSS."""
+        if value is None or not value.strip():
+            return None
+        value = value.strip()
+        parts = urlsplit(value)
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ValueError("Debe ser una URL http(s)")
+        if any(char in value for char in "'\"()\\<> \t\r\n"):
+            raise ValueError("La URL contiene caracteres no permitidos")
+        return value
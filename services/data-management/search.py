@@ -0,0 +1,338 @@
+"""Índice invertido en memoria para buscar publicaciones y eventos.
+
+Cada réplica de data-management mantiene su propio índice: lo llena desde la
+base de datos al arrancar y lo actualiza con cada publicación o evento creado.
+Las altas se anuncian por Redis (SEARCH_CHANNEL) para que el resto de réplicas
+también las indexen.
+
+Los textos se analizan en español: minúsculas, sin palabras vacías, con la raíz
+de cada palabra (stemmer Snowball) y sin tildes, así que "carreras", "Carrera"
+y "carrera" encuentran lo mismo, igual que "montaña" y "montana".
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+import uuid
+from array import array
+from datetime import date, datetime
+
+import numpy as np
+import snowballstemmer
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("data-management.search")
+
+# Canal por el que las réplicas se avisan de los documentos nuevos.
+SEARCH_CHANNEL = "busqueda:documentos"
+
+# Filas leídas por consulta al reconstruir el índice desde la base de datos.
+SEARCH_LOAD_BATCH = int(os.getenv("SEARCH_LOAD_BATCH", "10000"))
+
+KINDS = ("publicacion", "evento")
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# Campos que se indexan de cada tipo de documento.
+FIELDS = {
+    "publicacion": ("titulo", "contenido", "deporte"),
+    "evento": ("nombre", "descripcion", "lugar", "deporte"),
+}
+
+STOPWORDS = frozenset("""
+    a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el ella ellas
+    ellos en entre era es esa ese eso esta estas este esto estos fue ha han hasta hay la las le les lo los me mi
+    mis mucho muchos muy mas nada ni no nos nosotros o os otra otras otro otros para pero poco por porque que
+    quien quienes se sin sobre son su sus si tambien te ti tu tus un una uno unos y ya yo
+""".split())
+
+WORD_RE = re.compile(r"\w+")
+
+_stemmer = snowballstemmer.stemmer("spanish")
+_terms = {}
+MAX_CACHED_TERMS = 200_000
+
+
+def fold(text: str) -> str:
+    """Quita tildes y diéresis (también la de la ñ)."""
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+
+def term(word: str):
+    """Término indexado de una palabra ya en minúsculas, o None si no se indexa."""
+    cached = _terms.get(word)
+    if cached is None:
+        if len(word) < 2 or fold(word) in STOPWORDS:
+            cached = ""
+        else:
+            cached = fold(_stemmer.stemWord(word))
+        if len(_terms) >= MAX_CACHED_TERMS:
+            _terms.clear()
+        _terms[word] = cached
+    return cached or None
+
+
+def analyze(text: str) -> list:
+    """Términos de un texto, sin repetir y en orden de aparición."""
+    terms = (term(word) for word in WORD_RE.findall(text.lower()))
+    return list(dict.fromkeys(value for value in terms if value))
+
+
+def sport_key(value: str) -> str:
+    return fold(value.strip().lower())
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+class SearchIndex:
+    """Índice invertido con facetas por tipo, deporte y mes.
+
+    Los documentos reciben un número interno creciente según llegan y cada
+    término guarda la lista ordenada de documentos que lo contienen (un
+    array de enteros, 4 bytes por aparición). Una búsqueda intersecta las
+    listas de sus términos empezando por la más corta, y el tipo y el deporte
+    se filtran igual, como términos especiales. Los resultados salen del más
+    reciente al más antiguo.
+
+    Los datos por documento (tipo, id, deporte, fecha) viven en arrays
+    paralelos; las intersecciones y las facetas se calculan con numpy sobre
+    esos mismos arrays, sin copiarlos. Los documentos en sí se leen de la base
+    de datos.
+
+    `add` y `search` se ejecutan en hilos del threadpool y se excluyen con
+    `lock`: un array con vistas de numpy vivas no puede crecer.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.kinds = bytearray()
+        self.ids = array("I")
+        # Códigos de deporte: texto libre, sin un límite de valores distintos.
+        self.sports = array("I")
+        self.days = array("I")
+        # Año * 12 + mes - 1, para la faceta por mes (0 si no tiene fecha).
+        self.months = array("H")
+        self.sport_codes = {}
+        self.sport_labels = [None]
+        self.seen = tuple(set() for _ in KINDS)
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _sport_code(self, label) -> int:
+        if not label or not label.strip():
+            return 0
+        key = sport_key(label)
+        code = self.sport_codes.get(key)
+        if code is None:
+            code = len(self.sport_labels)
+            self.sport_codes[key] = code
+            self.sport_labels.append(label.strip())
+        return code
+
+    def add(self, kind: str, doc_id: int, fields: dict) -> bool:
+        """Indexa un documento; devuelve False si ya estaba indexado."""
+        with self.lock:
+            return self._add(kind, doc_id, fields)
+
+    def add_many(self, kind: str, documents: list) -> int:
+        """Indexa una lista de (id, campos) con una sola toma del lock."""
+        with self.lock:
+            return sum(self._add(kind, doc_id, fields) for doc_id, fields in documents)
+
+    def _add(self, kind: str, doc_id: int, fields: dict) -> bool:
+        kind_code = KIND_CODES[kind]
+        if doc_id in self.seen[kind_code]:
+            return False
+        self.seen[kind_code].add(doc_id)
+
+        doc = len(self.ids)
+        text = " ".join(str(fields.get(name) or "") for name in FIELDS[kind])
+        terms = analyze(text)
+        terms.append(f"tipo:{kind}")
+        sport = self._sport_code(fields.get("deporte"))
+        if sport:
+            terms.append(f"deporte:{sport_key(fields['deporte'])}")
+        for value in terms:
+            postings = self.postings.get(value)
+            if postings is None:
+                postings = self.postings[value] = array("I")
+            postings.append(doc)
+
+        fecha = as_date(fields.get("fecha"))
+        self.kinds.append(kind_code)
+        self.ids.append(doc_id)
+        self.sports.append(sport)
+        self.days.append(fecha.toordinal() if fecha else 0)
+        self.months.append(fecha.year * 12 + fecha.month - 1 if fecha else 0)
+        return True
+
+    def _view(self, values, dtype):
+        # Vista sin copia sobre un array del índice. No debe sobrevivir a la
+        # búsqueda: un array con vistas vivas no puede crecer.
+        return np.frombuffer(values, dtype=dtype)
+
+    def _match(self, terms: list):
+        lists = sorted((self.postings.get(value, ()) for value in terms), key=len)
+        matches = np.array(lists[0], dtype=np.uint32)
+        for postings in lists[1:]:
+            if not len(matches):
+                break
+            postings = self._view(postings, np.uint32)
+            # Búsqueda binaria de cada candidato en la lista ordenada del término.
+            positions = np.searchsorted(postings, matches).clip(max=len(postings) - 1)
+            matches = matches[postings[positions] == matches]
+        return matches
+
+    def search(self, query: str, kind: str = None, deporte: str = None, desde: date = None, hasta: date = None,
+               limit: int = 20, offset: int = 0) -> dict:
+        """Documentos que contienen todas las palabras de `query`, con sus facetas.
+
+        Devuelve {"total", "resultados": [(tipo, id), ...], "facetas"}; las
+        facetas cuentan todos los resultados, no solo la página.
+        """
+        with self.lock:
+            return self._search(query, kind, deporte, desde, hasta, limit, offset)
+
+    def _search(self, query: str, kind: str, deporte: str, desde: date, hasta: date, limit: int, offset: int) -> dict:
+        terms = analyze(query)
+        if not terms or not len(self):
+            return {"total": 0, "resultados": [], "facetas": {"tipo": {}, "deporte": {}, "mes": {}}}
+        if kind:
+            terms.append(f"tipo:{kind}")
+        if deporte:
+            terms.append(f"deporte:{sport_key(deporte)}")
+        matches = self._match(terms)
+
+        if desde or hasta:
+            days = self._view(self.days, np.uint32)[matches]
+            first = desde.toordinal() if desde else 1
+            last = hasta.toordinal() if hasta else date.max.toordinal()
+            matches = matches[(days >= first) & (days <= last)]
+
+        end = max(len(matches) - offset, 0)
+        page = matches[max(end - limit, 0):end][::-1].tolist()
+        kinds = self.kinds
+        ids = self.ids
+        return {
+            "total": len(matches),
+            "resultados": [(KINDS[kinds[doc]], ids[doc]) for doc in page],
+            "facetas": self.facets(matches),
+        }
+
+    def facets(self, matches) -> dict:
+        kinds = np.bincount(self._view(self.kinds, np.uint8)[matches], minlength=len(KINDS))
+        sports = np.bincount(self._view(self.sports, np.uint32)[matches])
+        months = np.bincount(self._view(self.months, np.uint16)[matches])
+        return {
+            "tipo": {KINDS[code]: int(count) for code, count in enumerate(kinds) if count},
+            "deporte": {
+                self.sport_labels[code]: int(sports[code])
+                for code in np.argsort(-sports, kind="stable") if code and sports[code]
+            },
+            "mes": {
+                f"{code // 12:04d}-{code % 12 + 1:02d}": int(months[code])
+                for code in np.flatnonzero(months)[::-1] if code
+            },
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "documentos": len(self),
+            "terminos": len(self.postings),
+            "apariciones": sum(len(postings) for postings in self.postings.values()),
+        }
+
+
+class SearchService:
+    """Índice de búsqueda de la réplica, sincronizado con las demás por Redis."""
+
+    def __init__(self, redis_client, session_factory, publicacion_model, evento_model):
+        self.redis = redis_client
+        self.session_factory = session_factory
+        self.models = {"publicacion": publicacion_model, "evento": evento_model}
+        self.index = SearchIndex()
+        self.instance = uuid.uuid4().hex
+        self.ready = False
+        self.task = None
+
+    async def add(self, kind: str, doc_id: int, fields: dict):
+        # Fuera del event loop: puede esperar a que termine una búsqueda.
+        await run_in_threadpool(self.index.add, kind, doc_id, fields)
+
+    async def search(self, *args) -> dict:
+        return await run_in_threadpool(self.index.search, *args)
+
+    async def publish(self, kind: str, doc_id: int, fields: dict):
+        """Indexa un documento nuevo y lo anuncia al resto de réplicas."""
+        await self.add(kind, doc_id, fields)
+        message = json.dumps({"origen": self.instance, "tipo": kind, "id": doc_id, "campos": fields}, default=str)
+        try:
+            await self.redis.publish(SEARCH_CHANNEL, message)
+        except Exception:
+            logger.exception("No se pudo anunciar el documento %s %s", kind, doc_id)
+
+    async def load(self):
+        """Indexa lo que ya hay en la base de datos, por lotes ordenados por id."""
+        from sqlalchemy import select
+
+        for kind, model in self.models.items():
+            last_id = 0
+            while True:
+                async with self.session_factory() as db:
+                    rows = (await db.scalars(
+                        select(model).where(model.id > last_id).order_by(model.id).limit(SEARCH_LOAD_BATCH)
+                    )).all()
+                if not rows:
+                    break
+                documents = [(row.id, {name: getattr(row, name) for name in (*FIELDS[kind], "fecha")}) for row in rows]
+                await run_in_threadpool(self.index.add_many, kind, documents)
+                last_id = rows[-1].id
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(SEARCH_CHANNEL)
+                    # Lo creado antes de suscribirse (o mientras Redis no estaba
+                    # disponible) se lee de la base de datos; los repetidos se ignoran.
+                    await self.load()
+                    self.ready = True
+                    logger.info("Índice de búsqueda listo: %s", self.index.snapshot())
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        if data.get("origen") != self.instance:
+                            await self.add(data["tipo"], data["id"], data["campos"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error en el índice de búsqueda; se reintenta")
+                await asyncio.sleep(1)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def snapshot(self) -> dict:
+        return {**self.index.snapshot(), "listo": self.ready}
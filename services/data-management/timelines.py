@@ -0,0 +1,144 @@
+import os
+
+# Publicaciones que se guardan como máximo en cada timeline y en cada buzón de autor.
+TIMELINE_MAX_LENGTH = int(os.getenv("TIMELINE_MAX_LENGTH", "800"))
+
+# A partir de este número de seguidores el autor no reparte sus publicaciones
+# (fan-out on write): sus seguidores las leen de su buzón al pedir el feed.
+CELEBRITY_FOLLOWERS = int(os.getenv("TIMELINE_CELEBRITY_FOLLOWERS", "10000"))
+
+# Seguidores a los que se escribe por cada pipeline durante el reparto.
+FANOUT_CHUNK_SIZE = int(os.getenv("TIMELINE_FANOUT_CHUNK_SIZE", "1000"))
+
+# Publicaciones recientes que se copian al timeline al empezar a seguir a alguien.
+FOLLOW_BACKFILL = 50
+
+CELEBRITIES_KEY = "usuarios:celebridades"
+
+
+def timeline_key(usuario: str) -> str:
+    return f"usuario:{usuario}:timeline"
+
+
+def outbox_key(usuario: str) -> str:
+    return f"usuario:{usuario}:publicaciones"
+
+
+def followers_key(usuario: str) -> str:
+    return f"usuario:{usuario}:seguidores"
+
+
+def following_key(usuario: str) -> str:
+    return f"usuario:{usuario}:siguiendo"
+
+
+# Los timelines son sorted sets con el id de la publicación como score: el id
+# crece con el tiempo, así que ordenar por score es ordenar por antigüedad y el
+# cursor de paginación es el propio id.
+
+async def fan_out(redis, autor: str, publicacion_id: int):
+    """Reparte una publicación nueva a los timelines de los seguidores del autor."""
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in (outbox_key(autor), timeline_key(autor)):
+            pipe.zadd(key, {publicacion_id: publicacion_id})
+            pipe.zremrangebyrank(key, 0, -TIMELINE_MAX_LENGTH - 1)
+        pipe.sismember(CELEBRITIES_KEY, autor)
+        results = await pipe.execute()
+    if results[-1]:
+        return
+
+    await _push_to_followers(redis, autor, {publicacion_id: publicacion_id})
+
+
+async def _push_to_followers(redis, autor: str, publicaciones: dict):
+    chunk = []
+    async for seguidor in redis.sscan_iter(followers_key(autor), count=FANOUT_CHUNK_SIZE):
+        chunk.append(seguidor)
+        if len(chunk) >= FANOUT_CHUNK_SIZE:
+            await _push_to_timelines(redis, chunk, publicaciones)
+            chunk = []
+    if chunk:
+        await _push_to_timelines(redis, chunk, publicaciones)
+
+
+async def _push_to_timelines(redis, seguidores, publicaciones: dict):
+    async with redis.pipeline(transaction=False) as pipe:
+        for seguidor in seguidores:
+            pipe.zadd(timeline_key(seguidor), publicaciones)
+            pipe.zremrangebyrank(timeline_key(seguidor), 0, -TIMELINE_MAX_LENGTH - 1)
+        await pipe.execute()
+
+
+async def follow(redis, seguidor: str, seguido: str) -> int:
+    """Registra el seguimiento y copia las publicaciones recientes al timeline.
+
+    Devuelve el número de seguidores del usuario seguido.
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.sadd(followers_key(seguido), seguidor)
+        pipe.sadd(following_key(seguidor), seguido)
+        pipe.scard(followers_key(seguido))
+        pipe.zrevrange(outbox_key(seguido), 0, FOLLOW_BACKFILL - 1)
+        _, _, total, recientes = await pipe.execute()
+
+    if total >= CELEBRITY_FOLLOWERS:
+        await redis.sadd(CELEBRITIES_KEY, seguido)
+    elif recientes:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(timeline_key(seguidor), {publicacion_id: int(publicacion_id) for publicacion_id in recientes})
+            pipe.zremrangebyrank(timeline_key(seguidor), 0, -TIMELINE_MAX_LENGTH - 1)
+            await pipe.execute()
+    return total
+
+
+async def unfollow(redis, seguidor: str, seguido: str) -> int:
+    """Elimina el seguimiento y las publicaciones del usuario del timeline.
+
+    Devuelve el número de seguidores que le quedan al usuario seguido.
+    """
+    recientes = await redis.zrange(outbox_key(seguido), 0, -1)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.srem(followers_key(seguido), seguidor)
+        pipe.srem(following_key(seguidor), seguido)
+        if recientes:
+            pipe.zrem(timeline_key(seguidor), *recientes)
+        pipe.scard(followers_key(seguido))
+        results = await pipe.execute()
+    return results[-1]
+
+
+async def demote(redis, autor: str):
+    """Devuelve al reparto en escritura a un autor que bajó del umbral de celebridad.
+
+    Sus seguidores leían sus publicaciones del buzón; las recientes se copian a
+    sus timelines para que no desaparezcan del feed al dejar de leerlo.
+    """
+    if not await redis.srem(CELEBRITIES_KEY, autor):
+        return
+    recientes = await redis.zrevrange(outbox_key(autor), 0, FOLLOW_BACKFILL - 1)
+    if recientes:
+        await _push_to_followers(redis, autor, {publicacion_id: int(publicacion_id) for publicacion_id in recientes})
+
+
+async def count_following(redis, usuario: str) -> int:
+    return await redis.scard(following_key(usuario))
+
+
+async def read_timeline(redis, usuario: str, limit: int, before=None) -> list:
+    """Ids de publicaciones del timeline, de la más nueva a la más antigua.
+
+    Combina el timeline precalculado con los buzones de las celebridades que
+    sigue el usuario (modelo híbrido push/pull). El coste depende del tamaño de
+    la página y del número de celebridades seguidas, no del total de
+    publicaciones.
+    """
+    max_score = f"({before}" if before else "+inf"
+    celebridades = await redis.sinter(following_key(usuario), CELEBRITIES_KEY)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zrevrangebyscore(timeline_key(usuario), max_score, "-inf", start=0, num=limit)
+        for celebridad in celebridades:
+            pipe.zrevrangebyscore(outbox_key(celebridad), max_score, "-inf", start=0, num=limit)
+        results = await pipe.execute()
+
+    ids = {int(publicacion_id) for result in results for publicacion_id in result}
+    return sorted(ids, reverse=True)[:limit]
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("notifications.coalescing")
+
+# Segundos durante los que se agrupan las notificaciones de un mismo tipo y
+# objeto para un destinatario antes de enviar una sola.
+NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", "60"))
+
+# Tipos que se agrupan; el resto se encola tal cual.
+NOTIFY_COALESCE_TYPES = {
+    tipo.strip() for tipo in os.getenv("NOTIFY_COALESCE_TYPES", "like,comentario").split(",") if tipo.strip()
+}
+
+# Modos de entrega por usuario: inmediato (con la ventana de agrupación) o un
+# resumen por hora o por día.
+DIGEST_MODES = ("inmediato", "hora", "dia")
+
+# Cómo se describe cada tipo cuando se agrupan varias acciones.
+GROUP_TEXTS = {
+    "like": ("A {actor} y {otros} personas más les gusta tu publicación", "A {actores} les gusta tu publicación"),
+    "comentario": ("{actor} y {otros} personas más comentaron tu publicación", "{actores} comentaron tu publicación"),
+}
+DIGEST_NAMES = {"like": "me gusta", "comentario": "comentarios"}
+
+
+def digest_deadline(modo: str, now: datetime) -> datetime:
+    """Inicio de la siguiente hora o del día siguiente."""
+    if modo == "hora":
+        return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def group_message(group: dict) -> str:
+    total, actores, tipo = group["total"], group["actores"], group["tipo"]
+    if group.get("resumen"):
+        periodo = "la última hora" if group["resumen"] == "hora" else "el último día"
+        return f"Resumen de {periodo}: {total} {DIGEST_NAMES.get(tipo, tipo)}"
+    if total == 1 or not actores:
+        return group["mensaje"]
+    texts = GROUP_TEXTS.get(tipo)
+    if texts is None:
+        return f"{group['mensaje']} (y {total - 1} más)"
+    if len(actores) == total:
+        # Todos los autores caben en el mensaje: "Ana, Bea y Carlos".
+        return texts[1].format(actores=", ".join(actores[:-1]) + " y " + actores[-1])
+    return texts[0].format(actor=actores[0], otros=total - 1)
+
+
+class Coalescer:
+    """Agrupa notificaciones por destinatario, tipo y objeto.
+
+    La primera notificación de un grupo fija cuándo se enviará (al cerrar la
+    ventana o, con resumen por hora/día, al final del periodo); las siguientes
+    solo suman al contador. Así el número de entregas depende de los
+    destinatarios y no del número de acciones.
+    """
+
+    def __init__(self, backend, enqueue):
+        self.backend = backend
+        self.enqueue = enqueue
+        self.task = None
+        self.stats = {"agrupadas": 0, "grupos_enviados": 0}
+
+    def applies_to(self, tipo: str) -> bool:
+        return tipo in NOTIFY_COALESCE_TYPES
+
+    async def add(self, job: dict, actor=None, objeto=None):
+        modo = await self.backend.get_preference(job["usuario"]) or "inmediato"
+        if modo == "inmediato":
+            group_id = f"{job['canal']}|{job['usuario']}|{job['tipo']}|{objeto or ''}"
+            deadline = time.time() + NOTIFY_COALESCE_WINDOW
+        else:
+            # En un resumen se juntan todos los objetos del mismo tipo.
+            group_id = f"{job['canal']}|{job['usuario']}|{job['tipo']}|resumen:{modo}"
+            deadline = digest_deadline(modo, datetime.now(timezone.utc)).timestamp()
+        fields = {
+            "canal": job["canal"],
+            "usuario": job["usuario"],
+            "tipo": job["tipo"],
+            "mensaje": job["mensaje"],
+            "datos": json.dumps(job.get("datos") or {}),
+            "resumen": modo if modo != "inmediato" else "",
+        }
+        await self.backend.add_to_group(group_id, deadline, fields, actor)
+        self.stats["agrupadas"] += 1
+
+    async def flush_due(self) -> int:
+        groups = await self.backend.pop_due_groups(time.time())
+        for group in groups:
+            datos = json.loads(group.get("datos") or "{}")
+            datos["total"] = group["total"]
+            if group["actores"]:
+                datos["actores"] = group["actores"]
+            await self.enqueue({
+                "canal": group["canal"],
+                "usuario": group["usuario"],
+                "tipo": group["tipo"],
+                "mensaje": group_message(group),
+                "datos": datos,
+            })
+        self.stats["grupos_enviados"] += len(groups)
+        return len(groups)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(1)
+            try:
+                await self.flush_due()
+            except Exception:
+                logger.exception("Error al enviar las notificaciones agrupadas")
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import os
+import random
+
+import httpx
+
+logger = logging.getLogger("notifications.dispatch")
+
+# Workers (entregas simultáneas) por canal, p. ej. "inapp=50,push=20,email=5".
+# Cada canal tiene su propia cola y su propio grupo de workers, así un canal
+# lento no retrasa a los demás.
+NOTIFY_CHANNEL_CONCURRENCY = os.getenv("NOTIFY_CHANNEL_CONCURRENCY", "inapp=50,push=20,email=5")
+
+# Intentos por notificación antes de mandarla a la dlq y espera base entre
+# reintentos (exponencial con jitter, como mucho NOTIFY_RETRY_MAX_DELAY segundos).
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_RETRY_BACKOFF = float(os.getenv("NOTIFY_RETRY_BACKOFF", "1.0"))
+NOTIFY_RETRY_MAX_DELAY = float(os.getenv("NOTIFY_RETRY_MAX_DELAY", "300"))
+
+# Tiempo máximo de una entrega.
+NOTIFY_DELIVERY_TIMEOUT = float(os.getenv("NOTIFY_DELIVERY_TIMEOUT", "10"))
+
+# Cada cuántos segundos la réplica renueva su latido y busca trabajos de réplicas caídas.
+NOTIFY_HEARTBEAT_INTERVAL = float(os.getenv("NOTIFY_HEARTBEAT_INTERVAL", "10"))
+
+
+def parse_channel_limits(value: str) -> dict:
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            canal, limit = item.split("=", 1)
+            limits[canal.strip()] = max(int(limit), 1)
+    return limits
+
+
+CHANNEL_LIMITS = parse_channel_limits(NOTIFY_CHANNEL_CONCURRENCY)
+
+
+def retry_delay(intentos: int) -> float:
+    return random.uniform(0, min(NOTIFY_RETRY_MAX_DELAY, NOTIFY_RETRY_BACKOFF * (2 ** intentos)))
+
+
+class Dispatcher:
+    """Grupo de workers asíncronos que entregan las notificaciones encoladas.
+
+    Los canales "push" y "email" se entregan a un webhook configurable
+    (NOTIFY_PUSH_WEBHOOK_URL, NOTIFY_EMAIL_WEBHOOK_URL); sin webhook solo se
+    registran en el log. "inapp" se guarda en la bandeja del usuario y, si
+    hay un `hub`, se empuja a sus conexiones abiertas.
+    """
+
+    def __init__(self, backend, channel_limits: dict = None, hub=None):
+        self.backend = backend
+        self.hub = hub
+        self.channel_limits = channel_limits or CHANNEL_LIMITS
+        self.http = None
+        self.tasks = []
+        self.stopping = False
+        self.stats = {"entregadas": 0, "reintentadas": 0, "enviadas_a_dlq": 0}
+
+    @property
+    def channels(self):
+        return list(self.channel_limits)
+
+    async def start(self):
+        self.http = httpx.AsyncClient(timeout=NOTIFY_DELIVERY_TIMEOUT)
+        await self.backend.heartbeat()
+        await self._recover()
+        for canal, limit in self.channel_limits.items():
+            for _ in range(limit):
+                self.tasks.append(asyncio.create_task(self._worker(canal)))
+        self.tasks.append(asyncio.create_task(self._promoter()))
+        self.tasks.append(asyncio.create_task(self._keeper()))
+
+    async def stop(self):
+        self.stopping = True
+        pending = set(self.tasks)
+        # Se cancela de nuevo lo que siga vivo: una cancelación que llega justo
+        # cuando termina una espera puede perderse.
+        while pending:
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=1)
+        self.tasks = []
+        # Lo que los workers dejaron a medias vuelve a la cola para otra réplica.
+        try:
+            await self.backend.release(self.channels)
+        except Exception:
+            logger.exception("No se pudieron devolver a la cola las notificaciones reservadas")
+        if self.http is not None:
+            await self.http.aclose()
+
+    async def _worker(self, canal: str):
+        while not self.stopping:
+            try:
+                raw = await self.backend.reserve(canal)
+                if raw is not None:
+                    await self._process(canal, raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error en el worker de notificaciones del canal %s", canal)
+                await asyncio.sleep(1)
+
+    async def _process(self, canal: str, raw: str):
+        job = json.loads(raw)
+        try:
+            await asyncio.wait_for(self.deliver(job), NOTIFY_DELIVERY_TIMEOUT)
+        except Exception as e:
+            job["intentos"] = job.get("intentos", 0) + 1
+            job["ultimo_error"] = str(e) or e.__class__.__name__
+            if job["intentos"] >= NOTIFY_MAX_ATTEMPTS:
+                self.stats["enviadas_a_dlq"] += 1
+                logger.error("Notificación %s enviada a la dlq tras %d intentos: %s", job["id"], job["intentos"], e)
+                await self.backend.dead_letter(canal, raw, job)
+            else:
+                self.stats["reintentadas"] += 1
+                await self.backend.retry_later(canal, raw, job, retry_delay(job["intentos"]))
+            return
+        self.stats["entregadas"] += 1
+        await self.backend.ack(canal, raw)
+
+    async def _promoter(self):
+        while not self.stopping:
+            await asyncio.sleep(0.5)
+            try:
+                await self.backend.promote_due(self.channels)
+            except Exception:
+                logger.exception("Error al reprogramar los reintentos de notificaciones")
+
+    async def _recover(self):
+        recovered = await self.backend.recover(self.channels)
+        if recovered:
+            logger.warning("Recuperadas %d notificaciones que quedaron a medias", recovered)
+
+    async def _keeper(self):
+        while not self.stopping:
+            await asyncio.sleep(NOTIFY_HEARTBEAT_INTERVAL)
+            try:
+                await self.backend.heartbeat()
+                await self._recover()
+            except Exception:
+                logger.exception("Error al renovar el latido de la réplica de notificaciones")
+
+    async def deliver(self, job: dict):
+        notificacion = {
+            "id": job["id"],
+            "tipo": job["tipo"],
+            "mensaje": job["mensaje"],
+            "datos": job.get("datos") or {},
+            "fecha": job["creado"],
+        }
+        if job["canal"] == "inapp":
+            await self.backend.store_inbox(job["usuario"], notificacion)
+            if self.hub is not None:
+                # Ya está en la bandeja: si el aviso en vivo falla no se reintenta
+                # la entrega, el cliente la verá al recargar.
+                try:
+                    await self.hub.publish(f"usuario:{job['usuario']}", "notificacion", notificacion)
+                except Exception:
+                    logger.exception("No se pudo publicar la notificación %s en vivo", job["id"])
+            return
+        webhook = os.getenv(f"NOTIFY_{job['canal'].upper()}_WEBHOOK_URL")
+        if not webhook:
+            logger.info("Notificación %s por %s para %s: %s", job["id"], job["canal"], job["usuario"], job["mensaje"])
+            return
+        response = await self.http.post(webhook, json={**notificacion, "usuario": job["usuario"]})
+        response.raise_for_status()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "workers": self.channel_limits}
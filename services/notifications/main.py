@@ -1,10 +1,101 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import hmac
 import os
+import uuid
+
+from coalescing import DIGEST_MODES, Coalescer
+from dispatch import Dispatcher
+from models import NotificacionCreate, PreferenciaCreate, PushCreate
+from push import CLOSE, PushHub, parse_topics
+from queues import build_queue_backend
+
+# Credencial de los servicios internos para POST /publicar y las rutas /cola/*.
+# Sin ella esas rutas están desactivadas: los servicios publican directamente
+# en Redis (push:<tema>).
+NOTIFY_SERVICE_TOKEN = os.getenv("NOTIFY_SERVICE_TOKEN")
+
+queue_backend = build_queue_backend()
+push_hub = PushHub(getattr(queue_backend, "client", None))
+dispatcher = Dispatcher(queue_backend, hub=push_hub)
+
+
+def new_job(canal: str, usuario: str, tipo: str, mensaje: str, datos) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "canal": canal,
+        "usuario": usuario,
+        "tipo": tipo,
+        "mensaje": mensaje,
+        "datos": datos,
+        "creado": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "intentos": 0,
+    }
+
+
+async def enqueue_group(notificacion: dict):
+    await queue_backend.enqueue(new_job(**notificacion))
 
-app = FastAPI(title="Notifications Service")
+
+coalescer = Coalescer(queue_backend, enqueue_group)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    push_hub.start()
+    await dispatcher.start()
+    coalescer.start()
+    yield
+    await coalescer.stop()
+    await dispatcher.stop()
+    await push_hub.stop()
+
+
+app = FastAPI(title="Notifications Service", lifespan=lifespan)
 
 router = APIRouter()
 
+
+async def enqueue_notificacion(notificacion: NotificacionCreate, idempotency_key: Optional[str]) -> dict:
+    """Encola la notificación (o la suma a su grupo) y responde sin esperar a la entrega."""
+    if notificacion.canal not in dispatcher.channel_limits:
+        raise HTTPException(status_code=400, detail=f"Canal desconocido: {notificacion.canal}")
+    job = new_job(notificacion.canal, notificacion.usuario, notificacion.tipo, notificacion.mensaje, notificacion.datos)
+    idempotency_key = idempotency_key or notificacion.clave_idempotencia
+    if idempotency_key:
+        existing = await queue_backend.claim_idempotency_key(idempotency_key, job["id"])
+        if existing:
+            return {"id": existing, "duplicada": True, "agrupada": False}
+    try:
+        if coalescer.applies_to(job["tipo"]):
+            await coalescer.add(job, notificacion.actor, notificacion.objeto)
+            return {"id": job["id"], "duplicada": False, "agrupada": True}
+        await queue_backend.enqueue(job)
+    except BaseException:
+        # Sin encolar, la clave no puede quedar reservada: el reintento sería una "duplicada" perdida.
+        if idempotency_key:
+            await queue_backend.release_idempotency_key(idempotency_key, job["id"])
+        raise
+    return {"id": job["id"], "duplicada": False, "agrupada": False}
+
+
+def require_service_token(x_servicio_token: Optional[str]):
+    """Las rutas internas (publicar y administrar la cola) exigen NOTIFY_SERVICE_TOKEN."""
+    if not NOTIFY_SERVICE_TOKEN or not hmac.compare_digest(x_servicio_token or "", NOTIFY_SERVICE_TOKEN):
+        raise HTTPException(status_code=403, detail="Operación no permitida")
+
+
+def require_same_user(usuario: str, x_usuario: Optional[str]):
+    """La bandeja y las preferencias son privadas: solo las lee o cambia el
+    usuario cuyo token verificó el gateway (cabecera X-Usuario)."""
+    if not x_usuario or x_usuario != usuario:
+        raise HTTPException(status_code=403, detail="Solo puedes acceder a tus propias notificaciones")
+
+
 @app.get("/")
 def read_root():
     return {"message": "Servicio de Notificaciones en funcionamiento."}
@@ -14,20 +105,107 @@ def health_check():
     """Endpoint de salud para verificar el estado del servicio."""
     return {"status": "ok", "service": "notifications"}
 
-# Endpoints de ejemplo para notificaciones
 @router.get("/notificaciones")
-async def get_notificaciones():
-    """Obtener lista de notificaciones."""
-    return {"data": [], "message": "Lista de notificaciones"}
-
-@router.post("/notificaciones")
-async def create_notificacion(notificacion: dict):
-    """Crear una nueva notificación."""
-    return {"message": "Notificación creada exitosamente", "data": notificacion}
-
-@router.post("/enviar")
-async def enviar_notificacion(notificacion: dict):
-    """Enviar una notificación."""
-    return {"message": "Notificación enviada exitosamente", "data": notificacion}
+async def get_notificaciones(
+    usuario: str,
+    limit: int = Query(50, ge=1, le=200),
+    x_usuario: Optional[str] = Header(None),
+):
+    """Notificaciones in-app de un usuario, de la más nueva a la más antigua."""
+    require_same_user(usuario, x_usuario)
+    data = await queue_backend.inbox(usuario, limit)
+    return {"data": data, "message": "Lista de notificaciones"}
+
+@router.post("/notificaciones", status_code=202)
+async def create_notificacion(notificacion: NotificacionCreate, idempotency_key: Optional[str] = Header(None)):
+    """Crear una nueva notificación. Se entrega en segundo plano."""
+    data = await enqueue_notificacion(notificacion, idempotency_key)
+    return {"message": "Notificación encolada", "data": data}
+
+@router.post("/enviar", status_code=202)
+async def enviar_notificacion(notificacion: NotificacionCreate, idempotency_key: Optional[str] = Header(None)):
+    """Enviar una notificación. Se entrega en segundo plano."""
+    data = await enqueue_notificacion(notificacion, idempotency_key)
+    return {"message": "Notificación encolada", "data": data}
+
+@router.get("/preferencias/{usuario}")
+async def get_preferencia(usuario: str, x_usuario: Optional[str] = Header(None)):
+    """Modo de entrega de las notificaciones agrupables del usuario."""
+    require_same_user(usuario, x_usuario)
+    modo = await queue_backend.get_preference(usuario) or "inmediato"
+    return {"data": {"usuario": usuario, "resumen": modo}, "message": "Preferencias de notificación"}
+
+@router.put("/preferencias/{usuario}")
+async def set_preferencia(usuario: str, preferencia: PreferenciaCreate, x_usuario: Optional[str] = Header(None)):
+    """Elige entre notificaciones inmediatas (agrupadas por ventana) o un resumen por hora o por día."""
+    require_same_user(usuario, x_usuario)
+    if preferencia.resumen not in DIGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo de resumen inválido; usa uno de {', '.join(DIGEST_MODES)}")
+    await queue_backend.set_preference(usuario, preferencia.resumen)
+    return {"data": {"usuario": usuario, "resumen": preferencia.resumen}, "message": "Preferencias actualizadas"}
+
+async def event_stream(request: Request, subscriber):
+    try:
+        # retry: pide a EventSource que espere unos segundos antes de reconectar.
+        yield "retry: 3000\n\n"
+        while True:
+            message = await subscriber.queue.get()
+            if message is CLOSE or await request.is_disconnected():
+                break
+            yield message
+    finally:
+        push_hub.unsubscribe(subscriber)
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    topics: str = Query(..., description="Temas separados por comas, p. ej. usuario:ana,publicacion:12"),
+    x_usuario: Optional[str] = Header(None),
+):
+    """Server-Sent Events con las notificaciones y contadores de los temas pedidos.
+
+    Los temas usuario:<nombre> son privados: solo se sirven si el gateway
+    verificó el token de ese mismo usuario (cabecera X-Usuario).
+    """
+    topic_list = parse_topics(topics)
+    if not topic_list:
+        raise HTTPException(status_code=400, detail="Indica al menos un tema válido (usuario:, publicacion: o evento:)")
+    for topic in topic_list:
+        if topic.startswith("usuario:") and topic != f"usuario:{x_usuario}":
+            raise HTTPException(status_code=403, detail="Solo puedes suscribirte a tus propias notificaciones")
+    subscriber = push_hub.subscribe(topic_list)
+    return StreamingResponse(
+        event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/publicar", status_code=202)
+async def publicar(mensaje: PushCreate, x_servicio_token: Optional[str] = Header(None)):
+    """Publica un evento en vivo para los clientes suscritos a un tema (solo servicios internos)."""
+    require_service_token(x_servicio_token)
+    if parse_topics(mensaje.tema) != [mensaje.tema]:
+        raise HTTPException(status_code=400, detail="Tema inválido")
+    await push_hub.publish(mensaje.tema, mensaje.evento, mensaje.datos)
+    return {"message": "Evento publicado", "data": {"tema": mensaje.tema}}
+
+@router.get("/cola/estado")
+async def get_estado_cola(x_servicio_token: Optional[str] = Header(None)):
+    """Tamaño de las colas, reintentos y dlq, y contadores de entrega de este proceso (solo servicios internos)."""
+    require_service_token(x_servicio_token)
+    data = {
+        **await queue_backend.sizes(dispatcher.channels),
+        **dispatcher.snapshot(),
+        **coalescer.stats,
+        "push": push_hub.snapshot(),
+    }
+    return {"data": data, "message": "Estado de la cola"}
+
+@router.post("/cola/dlq/reintentar")
+async def reintentar_dlq(x_servicio_token: Optional[str] = Header(None)):
+    """Vuelve a encolar las notificaciones de la dlq con los intentos a cero (solo servicios internos)."""
+    require_service_token(x_servicio_token)
+    count = await queue_backend.requeue_dead_letters()
+    return {"message": "Notificaciones reencoladas", "data": {"reencoladas": count}}
 
 app.include_router(router)
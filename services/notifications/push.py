@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger("notifications.push")
+
+# Mensajes que pueden quedar pendientes por conexión. Un cliente que no los
+# consume a tiempo se desconecta (EventSource reconecta solo) en lugar de
+# acumular memoria.
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "64"))
+
+# Segundos entre comentarios de keep-alive; mantiene abiertas las conexiones
+# ociosas a través de proxies y del gateway.
+PUSH_HEARTBEAT = float(os.getenv("PUSH_HEARTBEAT", "15"))
+
+# Temas por conexión.
+PUSH_MAX_TOPICS = int(os.getenv("PUSH_MAX_TOPICS", "50"))
+
+# Prefijos de tema permitidos: notificaciones de un usuario, contadores de una
+# publicación y asistentes de un evento.
+TOPIC_PREFIXES = ("usuario:", "publicacion:", "evento:")
+
+# Canales pub/sub de Redis que se retransmiten (ver counters.py en data-management).
+PUSH_CHANNEL_PREFIX = "push:"
+
+HEARTBEAT = ": ping\n\n"
+CLOSE = object()
+
+
+def format_sse(evento: str, datos) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("queue", "topics")
+
+    def __init__(self, topics):
+        self.queue = asyncio.Queue(maxsize=PUSH_QUEUE_SIZE)
+        self.topics = topics
+
+
+class PushHub:
+    """Reparte mensajes a las conexiones SSE suscritas a cada tema.
+
+    Cada conexión es una cola pequeña; publicar en un tema formatea el
+    mensaje una sola vez y lo deja en la cola de cada suscriptor sin esperar.
+    Una conexión ociosa solo cuesta su cola y su generador: no hay un timer
+    por conexión, el keep-alive lo manda una única tarea para todas.
+
+    Con Redis, lo que se publica en los canales "push:<tema>" (desde este u
+    otro servicio o réplica) llega a los suscriptores de todos los procesos.
+    """
+
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+        self.topics = {}
+        self.subscribers = set()
+        self.tasks = []
+        self.stats = {"publicados": 0, "entregados": 0, "desconectados_por_lentitud": 0}
+
+    def subscribe(self, topics) -> Subscriber:
+        subscriber = Subscriber(topics)
+        self.subscribers.add(subscriber)
+        for topic in topics:
+            self.topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        for topic in subscriber.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+
+    async def publish(self, topic: str, evento: str, datos):
+        if self.redis is not None:
+            await self.redis.publish(PUSH_CHANNEL_PREFIX + topic, json.dumps({"evento": evento, "datos": datos}))
+        else:
+            self.fan_out(topic, format_sse(evento, datos))
+
+    def fan_out(self, topic: str, message: str):
+        self.stats["publicados"] += 1
+        for subscriber in list(self.topics.get(topic, ())):
+            try:
+                subscriber.queue.put_nowait(message)
+                self.stats["entregados"] += 1
+            except asyncio.QueueFull:
+                self.stats["desconectados_por_lentitud"] += 1
+                self._close(subscriber)
+
+    def _close(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(CLOSE)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(PUSH_HEARTBEAT)
+            for subscriber in list(self.subscribers):
+                if subscriber.queue.empty():
+                    subscriber.queue.put_nowait(HEARTBEAT)
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(PUSH_CHANNEL_PREFIX + "*")
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        topic = message["channel"][len(PUSH_CHANNEL_PREFIX):]
+                        if topic not in self.topics:
+                            continue
+                        payload = json.loads(message["data"])
+                        self.fan_out(topic, format_sse(payload["evento"], payload["datos"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error en la suscripción pub/sub; se reintenta")
+                await asyncio.sleep(1)
+
+    def start(self):
+        self.tasks.append(asyncio.create_task(self._heartbeat()))
+        if self.redis is not None:
+            self.tasks.append(asyncio.create_task(self._listen()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for subscriber in list(self.subscribers):
+            self._close(subscriber)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "conexiones": len(self.subscribers), "temas": len(self.topics)}
+
+
+def parse_topics(value: str) -> list:
+    topics = []
+    for topic in value.split(","):
+        topic = topic.strip()
+        if topic and topic.startswith(TOPIC_PREFIXES) and topic not in topics:
+            topics.append(topic)
+    return topics[:PUSH_MAX_TOPICS]
@@ -0,0 +1,364 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+import uuid
+from collections import deque
+
+# Si se define, la cola vive en Redis (sobrevive a reinicios y se comparte
+# entre réplicas); si no, se usa una cola en memoria pensada para desarrollo y pruebas.
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Segundos durante los que se recuerda una clave de idempotencia.
+IDEMPOTENCY_TTL = int(os.getenv("NOTIFY_IDEMPOTENCY_TTL", "86400"))
+
+# Notificaciones in-app que se guardan por usuario.
+INBOX_MAX = int(os.getenv("NOTIFY_INBOX_MAX", "200"))
+
+# Autores más recientes que se recuerdan en cada grupo de notificaciones agrupadas.
+GROUP_ACTORS = 3
+
+# Segundos sin latido tras los que una réplica se da por caída y otra devuelve
+# a la cola los trabajos que tenía reservados.
+INSTANCE_TTL = int(os.getenv("NOTIFY_INSTANCE_TTL", "30"))
+
+
+class MemoryQueueBackend:
+    """Cola en memoria del proceso con la misma interfaz que RedisQueueBackend.
+
+    No es durable: lo pendiente se pierde al reiniciar.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.retries = []
+        self.dead_letters = deque()
+        self.idempotency = {}
+        self.inboxes = {}
+        self.groups = {}
+        self.group_deadlines = []
+        self.preferences = {}
+
+    def _queue(self, canal: str) -> asyncio.Queue:
+        if canal not in self.queues:
+            self.queues[canal] = asyncio.Queue()
+        return self.queues[canal]
+
+    async def claim_idempotency_key(self, key: str, job_id: str):
+        """Reserva la clave para `job_id`. Devuelve el id anterior si ya estaba usada."""
+        now = time.monotonic()
+        existing = self.idempotency.get(key)
+        if existing and existing[1] > now:
+            return existing[0]
+        self.idempotency[key] = (job_id, now + IDEMPOTENCY_TTL)
+        return None
+
+    async def release_idempotency_key(self, key: str, job_id: str):
+        """Libera la clave si sigue reservada para `job_id` (el encolado falló)."""
+        existing = self.idempotency.get(key)
+        if existing and existing[0] == job_id:
+            del self.idempotency[key]
+
+    async def enqueue(self, job: dict):
+        self._queue(job["canal"]).put_nowait(json.dumps(job))
+
+    async def reserve(self, canal: str, timeout: float = 1.0):
+        # Aquí no hace falta timeout: la espera se cancela limpiamente al parar.
+        return await self._queue(canal).get()
+
+    async def ack(self, canal: str, raw: str):
+        pass
+
+    async def retry_later(self, canal: str, raw: str, job: dict, delay: float):
+        self.retries.append((time.time() + delay, canal, json.dumps(job)))
+
+    async def dead_letter(self, canal: str, raw: str, job: dict):
+        self.dead_letters.append(json.dumps(job))
+
+    async def promote_due(self, canales=()) -> int:
+        now = time.time()
+        due = [item for item in self.retries if item[0] <= now]
+        self.retries = [item for item in self.retries if item[0] > now]
+        for _, canal, raw in due:
+            self._queue(canal).put_nowait(raw)
+        return len(due)
+
+    async def heartbeat(self):
+        pass
+
+    async def recover(self, canales) -> int:
+        return 0
+
+    async def release(self, canales) -> int:
+        return 0
+
+    async def requeue_dead_letters(self) -> int:
+        count = 0
+        while self.dead_letters:
+            job = json.loads(self.dead_letters.popleft())
+            job["intentos"] = 0
+            self._queue(job["canal"]).put_nowait(json.dumps(job))
+            count += 1
+        return count
+
+    async def add_to_group(self, group_id: str, deadline: float, fields: dict, actor=None):
+        group = self.groups.get(group_id)
+        if group is None:
+            group = self.groups[group_id] = {"total": 0, "actores": []}
+            heapq.heappush(self.group_deadlines, (deadline, group_id))
+        group.update(fields)
+        group["total"] += 1
+        if actor:
+            if actor in group["actores"]:
+                group["actores"].remove(actor)
+            group["actores"] = [actor] + group["actores"][:GROUP_ACTORS - 1]
+
+    async def pop_due_groups(self, now: float) -> list:
+        due = []
+        while self.group_deadlines and self.group_deadlines[0][0] <= now:
+            _, group_id = heapq.heappop(self.group_deadlines)
+            group = self.groups.pop(group_id, None)
+            if group:
+                due.append(group)
+        return due
+
+    async def get_preference(self, usuario: str):
+        return self.preferences.get(usuario)
+
+    async def set_preference(self, usuario: str, modo: str):
+        self.preferences[usuario] = modo
+
+    async def store_inbox(self, usuario: str, notificacion: dict):
+        if usuario not in self.inboxes:
+            self.inboxes[usuario] = deque(maxlen=INBOX_MAX)
+        self.inboxes[usuario].appendleft(notificacion)
+
+    async def inbox(self, usuario: str, limit: int) -> list:
+        return list(self.inboxes.get(usuario, ()))[:limit]
+
+    async def sizes(self, canales) -> dict:
+        return {
+            "pendientes": {canal: self._queue(canal).qsize() for canal in canales},
+            "reintentos": len(self.retries),
+            "dlq": len(self.dead_letters),
+        }
+
+
+class RedisQueueBackend:
+    """Cola durable en Redis.
+
+    Cada canal tiene una lista de pendientes. Los workers reservan con BLMOVE,
+    que mueve el trabajo a la lista "procesando" de su réplica en la misma
+    operación. Cada réplica renueva un latido con TTL; si cae a mitad de una
+    entrega, otra réplica ve que su latido ha caducado y `recover` devuelve sus
+    trabajos a la cola. Los de réplicas vivas no se tocan. Los reintentos
+    esperan en un sorted set por hora de ejecución y los que agotan sus
+    intentos pasan a la lista dlq.
+    """
+
+    def __init__(self, url: str, prefix: str = "notificaciones:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.instance = uuid.uuid4().hex
+
+    def _pending(self, canal: str) -> str:
+        return f"{self.prefix}cola:{canal}"
+
+    def _processing(self, canal: str, instance: str = None) -> str:
+        return f"{self.prefix}procesando:{instance or self.instance}:{canal}"
+
+    def _heartbeat(self, instance: str) -> str:
+        return f"{self.prefix}instancia:{instance}"
+
+    def _retries(self, canal: str) -> str:
+        return f"{self.prefix}reintentos:{canal}"
+
+    def _inbox(self, usuario: str) -> str:
+        return f"usuario:{usuario}:notificaciones"
+
+    async def claim_idempotency_key(self, key: str, job_id: str):
+        key = f"{self.prefix}idem:{key}"
+        if await self.client.set(key, job_id, nx=True, ex=IDEMPOTENCY_TTL):
+            return None
+        return await self.client.get(key) or job_id
+
+    async def release_idempotency_key(self, key: str, job_id: str):
+        """Libera la clave si sigue reservada para `job_id` (el encolado falló)."""
+        from redis.exceptions import WatchError
+
+        key = f"{self.prefix}idem:{key}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            # WATCH: si otra petición la reservó entretanto, la transacción no se aplica.
+            await pipe.watch(key)
+            if await pipe.get(key) != job_id:
+                return
+            pipe.multi()
+            pipe.delete(key)
+            try:
+                await pipe.execute()
+            except WatchError:
+                pass
+
+    async def enqueue(self, job: dict):
+        await self.client.lpush(self._pending(job["canal"]), json.dumps(job))
+
+    async def reserve(self, canal: str, timeout: float = 1.0):
+        return await self.client.blmove(self._pending(canal), self._processing(canal), timeout, "RIGHT", "LEFT")
+
+    async def ack(self, canal: str, raw: str):
+        await self.client.lrem(self._processing(canal), 1, raw)
+
+    async def retry_later(self, canal: str, raw: str, job: dict, delay: float):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self._retries(canal), {json.dumps(job): time.time() + delay})
+            pipe.lrem(self._processing(canal), 1, raw)
+            await pipe.execute()
+
+    async def dead_letter(self, canal: str, raw: str, job: dict):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lpush(f"{self.prefix}dlq", json.dumps(job))
+            pipe.lrem(self._processing(canal), 1, raw)
+            await pipe.execute()
+
+    async def promote_due(self, canales=()) -> int:
+        """Devuelve a su cola los reintentos que ya han cumplido su espera.
+
+        ZPOPMIN es atómico, así que aunque haya varias réplicas promoviendo
+        cada reintento se encola una sola vez; si el primero aún no tocaba,
+        se vuelve a dejar en el sorted set.
+        """
+        promoted = 0
+        now = time.time()
+        for canal in canales:
+            while True:
+                popped = await self.client.zpopmin(self._retries(canal))
+                if not popped:
+                    break
+                raw, due = popped[0]
+                if due > now:
+                    await self.client.zadd(self._retries(canal), {raw: due})
+                    break
+                await self.client.lpush(self._pending(canal), raw)
+                promoted += 1
+        return promoted
+
+    async def heartbeat(self):
+        """Renueva el latido de esta réplica; hay que llamarlo antes de que caduque."""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self._heartbeat(self.instance), 1, ex=INSTANCE_TTL)
+            pipe.sadd(f"{self.prefix}instancias", self.instance)
+            await pipe.execute()
+
+    async def _requeue(self, instance: str, canales) -> int:
+        recovered = 0
+        for canal in canales:
+            # LMOVE es atómico: si dos réplicas recuperan a la vez, cada trabajo se mueve una vez.
+            while await self.client.lmove(self._processing(canal, instance), self._pending(canal), "RIGHT", "RIGHT"):
+                recovered += 1
+        return recovered
+
+    async def recover(self, canales) -> int:
+        """Devuelve a la cola los trabajos reservados por réplicas cuyo latido ha caducado."""
+        recovered = 0
+        for instance in await self.client.smembers(f"{self.prefix}instancias"):
+            if instance == self.instance or await self.client.exists(self._heartbeat(instance)):
+                continue
+            recovered += await self._requeue(instance, canales)
+            await self.client.srem(f"{self.prefix}instancias", instance)
+        return recovered
+
+    async def release(self, canales) -> int:
+        """Al parar: devuelve a la cola lo reservado por esta réplica y borra su latido."""
+        recovered = await self._requeue(self.instance, canales)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(self._heartbeat(self.instance))
+            pipe.srem(f"{self.prefix}instancias", self.instance)
+            await pipe.execute()
+        return recovered
+
+    async def requeue_dead_letters(self) -> int:
+        count = 0
+        while True:
+            raw = await self.client.rpop(f"{self.prefix}dlq")
+            if raw is None:
+                return count
+            job = json.loads(raw)
+            job["intentos"] = 0
+            await self.client.lpush(self._pending(job["canal"]), json.dumps(job))
+            count += 1
+
+    async def add_to_group(self, group_id: str, deadline: float, fields: dict, actor=None):
+        """Suma un evento al grupo; el primero fija la hora de envío (ZADD NX)."""
+        group_key = f"{self.prefix}grupo:{group_id}"
+        actors_key = f"{group_key}:actores"
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(group_key, mapping=fields)
+            pipe.hincrby(group_key, "total", 1)
+            if actor:
+                pipe.lrem(actors_key, 0, actor)
+                pipe.lpush(actors_key, actor)
+                pipe.ltrim(actors_key, 0, GROUP_ACTORS - 1)
+            pipe.zadd(f"{self.prefix}grupos", {group_id: deadline}, nx=True)
+            await pipe.execute()
+
+    async def pop_due_groups(self, now: float) -> list:
+        """Extrae los grupos cuya ventana ha terminado.
+
+        La lectura y el borrado de cada grupo van en una transacción: un evento
+        que llegue después crea un grupo nuevo con su propia ventana.
+        """
+        due = []
+        while True:
+            popped = await self.client.zpopmin(f"{self.prefix}grupos")
+            if not popped:
+                break
+            group_id, deadline = popped[0]
+            if deadline > now:
+                await self.client.zadd(f"{self.prefix}grupos", {group_id: deadline})
+                break
+            group_key = f"{self.prefix}grupo:{group_id}"
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hgetall(group_key)
+                pipe.lrange(f"{group_key}:actores", 0, -1)
+                pipe.delete(group_key, f"{group_key}:actores")
+                group, actors, _ = await pipe.execute()
+            if group:
+                due.append({**group, "total": int(group["total"]), "actores": actors})
+        return due
+
+    async def get_preference(self, usuario: str):
+        return await self.client.hget(f"{self.prefix}preferencias", usuario)
+
+    async def set_preference(self, usuario: str, modo: str):
+        await self.client.hset(f"{self.prefix}preferencias", usuario, modo)
+
+    async def store_inbox(self, usuario: str, notificacion: dict):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.lpush(self._inbox(usuario), json.dumps(notificacion))
+            pipe.ltrim(self._inbox(usuario), 0, INBOX_MAX - 1)
+            await pipe.execute()
+
+    async def inbox(self, usuario: str, limit: int) -> list:
+        return [json.loads(raw) for raw in await self.client.lrange(self._inbox(usuario), 0, limit - 1)]
+
+    async def sizes(self, canales) -> dict:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for canal in canales:
+                pipe.llen(self._pending(canal))
+            for canal in canales:
+                pipe.zcard(self._retries(canal))
+            pipe.llen(f"{self.prefix}dlq")
+            results = await pipe.execute()
+        canales = list(canales)
+        return {
+            "pendientes": dict(zip(canales, results[:len(canales)])),
+            "reintentos": sum(results[len(canales):-1]),
+            "dlq": results[-1],
+        }
+
+
+def build_queue_backend():
+    return RedisQueueBackend(REDIS_URL) if REDIS_URL else MemoryQueueBackend()